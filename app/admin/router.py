@@ -0,0 +1,114 @@
+import asyncio
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app import metrics, slow_queries
+from app.config import settings
+from app.database import pool_stats, replicas
+from app.metrics import TimedRoute
+from app.products.dao import product_cache, product_page_cache
+
+router = APIRouter(prefix="/admin", tags=["Admin"], route_class=TimedRoute)
+metrics_router = APIRouter(tags=["Admin"], route_class=TimedRoute)
+
+
+async def require_admin(authorization: Optional[str] = Header(None)):
+    """
+    Let a request through only if it carries ADMIN_SECRET as a bearer token.
+
+    Args:
+        authorization (Optional[str]): The Authorization header.
+
+    Raises:
+        HTTPException: 404 if ADMIN_SECRET is not set, 401 if the token is
+            missing or does not match.
+    """
+    if not settings.ADMIN_SECRET:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), settings.ADMIN_SECRET.encode()
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@router.get("/cache", dependencies=[Depends(require_admin)])
+async def get_cache_stats():
+    """
+    Get the counters of the in-process product caches of this worker.
+
+    Returns:
+        dict: The stats of the product and product page caches.
+    """
+    return {
+        "products": product_cache.stats(),
+        "product_pages": product_page_cache.stats(),
+    }
+
+
+@router.get("/pool", dependencies=[Depends(require_admin)])
+async def get_pool_stats():
+    """
+    Get the counters of the database connection pool of this worker.
+
+    Returns:
+        dict: The checked out and overflow connections, the checkout wait
+        times and the number of checkouts that timed out.
+    """
+    return pool_stats()
+
+
+@router.get("/replicas", dependencies=[Depends(require_admin)])
+async def get_replica_stats():
+    """
+    Get the health of the read replicas as last checked by this worker.
+
+    Returns:
+        list[dict]: The host, health and replication lag of each replica.
+    """
+    return replicas.stats()
+
+
+@router.get("/slow-queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries(limit: int = Query(50, ge=1)):
+    """
+    Get the statements of this worker that ran longer than SLOW_QUERY_THRESHOLD.
+
+    The plan of each distinct statement is captured with EXPLAIN the first
+    time it is slow; with SLOW_QUERY_EXPLAIN_ANALYZE, SELECTs that only read
+    tables are run again under EXPLAIN (ANALYZE, BUFFERS).
+
+    Args:
+        limit (int): The most entries to return.
+
+    Returns:
+        dict: The threshold, the latest entries with their route, duration
+        and redacted parameters, and the plans by statement fingerprint.
+    """
+    return slow_queries.report(limit)
+
+
+@metrics_router.get(
+    "/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_admin)]
+)
+async def get_metrics():
+    """
+    Get the request metrics of all workers in the Prometheus text format.
+
+    Per route: a latency histogram, the number of requests by status, and
+    the SQL statements, the time spent in them and the time spent waiting
+    for a pooled connection. The counters of the gunicorn workers are added
+    up through their snapshots in METRICS_DIR.
+
+    Returns:
+        str: The metrics page.
+    """
+    return PlainTextResponse(
+        metrics.render(await asyncio.to_thread(metrics.collect)),
+        media_type="text/plain; version=0.0.4",
+    )
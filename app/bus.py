@@ -0,0 +1,237 @@
+import asyncio
+import json
+import logging
+import random
+import uuid
+from typing import Callable, Optional
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import DATABASE_URL
+from app.models import ChangeCounter
+
+logger = logging.getLogger(__name__)
+
+# Identifies this worker, so that it skips its own events: it has already
+# applied them right after its commit.
+ORIGIN = uuid.uuid4().hex
+
+# Postgres rejects NOTIFY payloads of 8000 bytes and more.
+MAX_PAYLOAD = 7900
+
+handlers: dict[str, list[Callable[[Optional[list[int]]], None]]] = {}
+
+# The running listener of this worker, if any.
+listener: Optional["InvalidationListener"] = None
+
+
+def subscribe(table: str, handler: Callable[[Optional[list[int]]], None]):
+    """
+    Call `handler` whenever another worker changes rows of `table`.
+
+    Args:
+        table (str): The name of the changed table.
+        handler (Callable[[Optional[list[int]]], None]): Called with the ids
+            of the changed rows, or None if any row may have changed.
+    """
+    handlers.setdefault(table, []).append(handler)
+
+
+async def publish(db: AsyncSession, **changes: Optional[list[int]]):
+    """
+    Announce changed rows to the other workers and bump the change counters
+    of the changed tables.
+
+    The event is sent with NOTIFY inside the current transaction, so it is
+    delivered exactly when the transaction commits and dropped on rollback.
+    Both happen in one statement, which should be the last one before the
+    commit: the counter row stays locked until then.
+
+    Args:
+        db (AsyncSession): The database session of the write.
+        **changes (Optional[list[int]]): The changed ids per table name, or
+            None if any row of the table may have changed.
+    """
+    changes = {
+        table: None if ids is None else sorted(ids) for table, ids in changes.items()
+    }
+    payload = json.dumps({"origin": ORIGIN, "changes": changes})
+    if len(payload) > MAX_PAYLOAD:
+        payload = json.dumps(
+            {"origin": ORIGIN, "changes": dict.fromkeys(changes)}
+        )
+    # Writers bump one random shard of each counter, so that they rarely
+    # wait for each other; the shards are always locked in the same order.
+    bumped = (
+        pg_insert(ChangeCounter)
+        .values(
+            [
+                {
+                    "table_name": table,
+                    "shard": random.randrange(settings.CHANGE_COUNTER_SHARDS),
+                    "version": 1,
+                }
+                for table in sorted(changes)
+            ]
+        )
+        .on_conflict_do_update(
+            index_elements=[ChangeCounter.table_name, ChangeCounter.shard],
+            set_={"version": ChangeCounter.version + 1},
+        )
+        .cte("bumped")
+    )
+    await db.execute(
+        select(func.pg_notify(settings.CACHE_BUS_CHANNEL, payload)).add_cte(bumped)
+    )
+
+
+async def get_version(db: AsyncSession, table: str) -> int:
+    """
+    Get the change counter of a table.
+
+    The counter grows with every committed write published for the table,
+    so it changes whenever any row of it may have changed.
+
+    Args:
+        db (AsyncSession): The database session.
+        table (str): The table name.
+
+    Returns:
+        int: The current version of the table.
+    """
+    result = await db.execute(
+        select(func.coalesce(func.sum(ChangeCounter.version), 0)).where(
+            ChangeCounter.table_name == table
+        )
+    )
+    return result.scalar_one()
+
+
+def synced() -> bool:
+    """
+    Tell whether caches kept in sync by the bus can be used.
+
+    They can't while the listener of this worker is not connected: the
+    events sent in the meantime are lost.
+
+    Returns:
+        bool: False if a listener is running but not connected.
+    """
+    return listener is None or listener.connected.is_set()
+
+
+def flush():
+    """Tell every handler that any row may have changed."""
+    for table_handlers in handlers.values():
+        for handler in table_handlers:
+            handler(None)
+
+
+def apply(payload: str, origin: str = ORIGIN):
+    """
+    Pass a received event to the handlers of the changed tables.
+
+    Args:
+        payload (str): The NOTIFY payload written by `publish`.
+        origin (str): The origin of this worker; its own events are skipped.
+    """
+    event = json.loads(payload)
+    if event["origin"] == origin:
+        return
+    for table, ids in event["changes"].items():
+        for handler in handlers.get(table, ()):
+            handler(ids)
+
+
+class InvalidationListener:
+    """
+    Holds the LISTEN connection of one worker.
+
+    The connection is reopened after it drops. Events sent while it was
+    down are lost, so every handler is flushed when it drops and again once
+    it is back, and `synced` is False in the meantime.
+    """
+
+    def __init__(self, dsn: str = DATABASE_URL, origin: str = ORIGIN):
+        self.dsn = dsn.replace("postgresql+asyncpg://", "postgresql://")
+        self.origin = origin
+        self.connection: Optional[asyncpg.Connection] = None
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Open the LISTEN connection in the background and keep it open.
+
+        The worker starts without waiting for it; until it is connected,
+        `synced` is False.
+        """
+        global listener
+        listener = self
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Close the LISTEN connection."""
+        global listener
+        if listener is self:
+            listener = None
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            apply(payload, self.origin)
+        except (ValueError, KeyError, TypeError):
+            logger.exception("Invalid invalidation event: %r", payload)
+            flush()
+
+    async def _run(self):
+        while True:
+            lost = asyncio.Event()
+            try:
+                self.connection = await asyncpg.connect(
+                    self.dsn, timeout=settings.CACHE_BUS_CONNECT_TIMEOUT
+                )
+                self.connection.add_termination_listener(lambda connection: lost.set())
+                await self.connection.add_listener(
+                    settings.CACHE_BUS_CHANNEL, self._on_notification
+                )
+                # Also drops what was read before the first connection.
+                flush()
+                self.connected.set()
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(
+                            lost.wait(), settings.CACHE_BUS_PING_INTERVAL
+                        )
+                    except asyncio.TimeoutError:
+                        # Also notices half-open connections that never report an error.
+                        await self.connection.execute(
+                            "SELECT 1", timeout=settings.CACHE_BUS_CONNECT_TIMEOUT
+                        )
+            except asyncio.CancelledError:
+                if self.connection:
+                    await self.connection.close()
+                raise
+            except (
+                OSError,
+                asyncio.TimeoutError,
+                asyncpg.PostgresError,
+                asyncpg.InterfaceError,
+            ):
+                logger.warning("Invalidation listener lost its connection", exc_info=True)
+            self.connected.clear()
+            self.reconnects += 1
+            flush()
+            if self.connection:
+                self.connection.terminate()
+            self.connection = None
+            await asyncio.sleep(settings.CACHE_BUS_RECONNECT_DELAY)
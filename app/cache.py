@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    A bounded in-process LRU cache whose entries expire after `ttl` seconds.
+
+    Every invalidation bumps `generation`. A reader that captures the
+    generation before going to the database and passes it to `set` cannot
+    store a value that was read before a concurrent write was invalidated.
+    A `maxsize` of 0 disables the cache, and so does `enabled` while it
+    returns False.
+    """
+
+    def __init__(
+        self, maxsize: int, ttl: float, enabled: Callable[[], bool] = lambda: True
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value and mark it as recently used.
+
+        Args:
+            key (Hashable): The cache key.
+            default (Any): The value to return on a miss.
+
+        Returns:
+            Any: The cached value, or `default` if it is missing or expired.
+        """
+        entry = self._entries.get(key) if self.enabled() else None
+        if entry is None:
+            self.misses += 1
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """
+        Store a value, evicting the least recently used entries when full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+            generation (Optional[int]): The generation captured before the value
+                was read; the value is dropped if the cache was invalidated since.
+        """
+        if (
+            self.maxsize <= 0
+            or (generation is not None and generation != self.generation)
+            or not self.enabled()
+        ):
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable):
+        """Remove one entry, if present, and bump the generation."""
+        self.generation += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry and bump the generation."""
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: The hit, miss, eviction and expiration counts and the size.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -45,6 +45,87 @@ class Settings(BaseSettings):
         return f"postgresql+asyncpg://{self.TEST_DB_USER}:{self.TEST_DB_PASS}@\
 {self.TEST_DB_HOST}:{self.TEST_DB_PORT}/{self.TEST_DB_NAME}"
 
+    # Connections to Postgres that all gunicorn workers may open together,
+    # split evenly between WEB_CONCURRENCY workers.
+    DB_MAX_CONNECTIONS: int = 80
+    WEB_CONCURRENCY: int = 4
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    # Checks every connection with a round trip before it is handed out.
+    # Enable it when idle connections can be dropped by a firewall, a proxy
+    # or a database restart sooner than DB_POOL_RECYCLE replaces them.
+    DB_POOL_PRE_PING: bool = False
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PGBOUNCER: bool = False
+    DB_REPLICA_URLS: list[str] = []
+    DB_REPLICA_MAX_LAG: float = 10.0
+    DB_REPLICA_CHECK_INTERVAL: float = 5.0
+    DB_REPLICA_CHECK_TIMEOUT: float = 2.0
+    DB_READ_YOUR_WRITES_WINDOW: float = 5.0
+
+    @property
+    def DB_POOL_SIZE_PER_WORKER(self):
+        """
+        A computed property that returns the pool size of one worker.
+
+        Unless DB_POOL_SIZE is set, the worker's share of DB_MAX_CONNECTIONS
+        is used, leaving room for DB_MAX_OVERFLOW.
+
+        Returns:
+            int: The number of connections kept by the pool of a worker.
+        """
+        if self.DB_POOL_SIZE is not None:
+            return self.DB_POOL_SIZE
+        per_worker = self.DB_MAX_CONNECTIONS // self.WEB_CONCURRENCY
+        return max(1, per_worker - self.DB_MAX_OVERFLOW)
+
+    PRODUCTS_PAGE_DEFAULT_LIMIT: int = 50
+    PRODUCTS_PAGE_MAX_LIMIT: int = 500
+    ORDERS_EXPORT_CHUNK_SIZE: int = 1000
+    ORDERS_BATCH_MAX_SIZE: int = 10000
+    BULK_DELETE_MAX_SIZE: int = 10000
+    LOOKUP_MAX_IDS: int = 1000
+    ORDERS_EXPAND_JOINED_MAX: int = 1000
+    PRODUCT_MAX_STOCK_SHARDS: int = 64
+    PRODUCT_CACHE_SIZE: int = 10000
+    PRODUCT_PAGE_CACHE_SIZE: int = 1000
+    PRODUCT_CACHE_TTL: float = 30.0
+    # The /admin endpoints and /metrics need `Authorization: Bearer` with this
+    # value; unset, they answer 404.
+    ADMIN_SECRET: Optional[str] = None
+    CACHE_BUS_ENABLED: bool = True
+    CACHE_BUS_CHANNEL: str = "cache_invalidation"
+    CACHE_BUS_PING_INTERVAL: float = 10.0
+    CACHE_BUS_CONNECT_TIMEOUT: float = 5.0
+    CACHE_BUS_RECONNECT_DELAY: float = 1.0
+    CHANGE_COUNTER_SHARDS: int = 16
+    FAST_JSON: bool = False
+    METRICS_ENABLED: bool = True
+    METRICS_SERVER_TIMING: bool = False
+    # Shared by the gunicorn workers of one host to add up their metrics; without it,
+    # /metrics only reports the worker that answers.
+    METRICS_DIR: Optional[str] = None
+    METRICS_FLUSH_INTERVAL: float = 5.0
+    PROFILING_ENABLED: bool = False
+    # Requests with this value in the X-Profile header are profiled; unset,
+    # only the sampled background profiling runs.
+    PROFILING_SECRET: Optional[str] = None
+    PROFILING_FORMAT: Literal["pstats", "collapsed"] = "pstats"
+    PROFILING_SAMPLER_INTERVAL: float = 0.001
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_DIR: Optional[str] = None
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD: float = 0.5
+    SLOW_QUERY_LOG_SIZE: int = 200
+    SLOW_QUERY_EXPLAIN: bool = True
+    # Runs slow SELECTs that only read tables again under EXPLAIN ANALYZE, in
+    # a read-only transaction that is rolled back.
+    SLOW_QUERY_EXPLAIN_ANALYZE: bool = False
+    # Plans captured at a time, each on a pooled connection of its own.
+    SLOW_QUERY_EXPLAIN_CONCURRENCY: int = 1
+
     model_config = SettingsConfigDict(env_file=".env")
 
 
@@ -1,16 +1,119 @@
-from sqlalchemy import NullPool
+import asyncio
+import itertools
+import logging
+import math
+import time
+import uuid
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import NullPool, text
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
+from app.metrics import instrument_engine, record_pool_wait
+from app.slow_queries import watch_engine
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    The default async queue pool, counting how long checkouts wait and how
+    many of them time out.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds += waited
+            record_pool_wait(waited)
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self) -> dict:
+        """
+        Get the pool counters.
+
+        The wait time of a checkout includes opening a new connection when
+        the pool has none idle.
+
+        Returns:
+            dict: The pool size, the checked out and overflow connections and
+            the checkout wait times and timeouts.
+        """
+        return {
+            "pool": type(self).__name__,
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms_total": round(self.wait_seconds * 1000, 3),
+            "wait_ms_max": round(self.max_wait_seconds * 1000, 3),
+        }
+
+
+def engine_params() -> dict:
+    """
+    Build the `create_async_engine` arguments from the settings.
+
+    Returns:
+        dict: The pool and driver arguments.
+    """
+    statement_cache_size = (
+        0 if settings.DB_PGBOUNCER else settings.DB_STATEMENT_CACHE_SIZE
+    )
+    connect_args = {
+        # asyncpg's own cache and the one of the SQLAlchemy dialect.
+        "statement_cache_size": statement_cache_size,
+        "prepared_statement_cache_size": statement_cache_size,
+    }
+    if settings.DB_PGBOUNCER:
+        # In transaction mode PgBouncer may hand every transaction another
+        # server connection, so statement names must never be reused.
+        connect_args["prepared_statement_name_func"] = (
+            lambda: f"__asyncpg_{uuid.uuid4()}__"
+        )
+    if settings.MODE == "TEST":
+        return {"poolclass": NullPool, "connect_args": connect_args}
+    return {
+        "poolclass": InstrumentedPool,
+        "pool_size": settings.DB_POOL_SIZE_PER_WORKER,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
 
 if settings.MODE == "TEST":
     DATABASE_URL = settings.TEST_DATABASE_URL
-    DATABASE_PARAMS = {"poolclass": NullPool}
 else:
     DATABASE_URL = settings.DATABASE_URL
-    DATABASE_PARAMS = {}
+DATABASE_PARAMS = engine_params()
 
 engine = create_async_engine(DATABASE_URL, **DATABASE_PARAMS)
+instrument_engine(engine)
+if settings.SLOW_QUERY_LOG_ENABLED:
+    watch_engine(engine)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
 
@@ -18,12 +121,183 @@ class Base(DeclarativeBase):
     pass
 
 
-async def get_db():
+def pool_stats() -> dict:
+    """
+    Get the connection pool counters of this worker.
+
+    Returns:
+        dict: See `InstrumentedPool.stats`; only the pool class for others.
+    """
+    if isinstance(engine.pool, InstrumentedPool):
+        return engine.pool.stats()
+    return {"pool": type(engine.pool).__name__}
+
+
+# How far a replica is behind the primary, in seconds; 0 if it has replayed
+# everything it received, and for a server that is not a replica at all.
+REPLICA_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    """A read replica with its own engine and its last health check."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_async_engine(url, **DATABASE_PARAMS)
+        instrument_engine(self.engine)
+        if settings.SLOW_QUERY_LOG_ENABLED:
+            watch_engine(self.engine)
+        self.session_maker = async_sessionmaker(
+            self.engine, expire_on_commit=False, info={"replica": True}
+        )
+        self.healthy = False
+        self.lag: Optional[float] = None
+
+    async def check(self):
+        """Mark the replica healthy if it answers in time and does not lag too far."""
+        try:
+            self.lag = await asyncio.wait_for(
+                self._lag(), settings.DB_REPLICA_CHECK_TIMEOUT
+            )
+            self.healthy = self.lag <= settings.DB_REPLICA_MAX_LAG
+        except (OSError, asyncio.TimeoutError, SQLAlchemyError) as exc:
+            if self.healthy:
+                logger.warning("Replica %s is unavailable: %r", self.engine.url, exc)
+            self.healthy = False
+            self.lag = None
+
+    async def _lag(self) -> float:
+        async with self.engine.connect() as conn:
+            return float(await conn.scalar(REPLICA_LAG))
+
+
+class ReplicaSet:
+    """
+    Spreads reads round-robin over the healthy replicas, falling back to the
+    primary when there are none.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._turn = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def session_maker(self, pinned: bool = False) -> async_sessionmaker:
+        """
+        Choose where the next read goes.
+
+        Args:
+            pinned (bool): Whether the client must read from the primary.
+
+        Returns:
+            async_sessionmaker: The session factory of a healthy replica, or
+            of the primary.
+        """
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if pinned or not healthy:
+            return async_session_maker
+        return healthy[next(self._turn) % len(healthy)].session_maker
+
+    async def check(self):
+        """Run the health check of every replica."""
+        await asyncio.gather(*(replica.check() for replica in self.replicas))
+
+    async def start(self):
+        """Check the replicas now and then every DB_REPLICA_CHECK_INTERVAL seconds."""
+        if not self.replicas:
+            return
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the health checks and close the replica connections."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.DB_REPLICA_CHECK_INTERVAL)
+            await self.check()
+
+    def stats(self) -> list[dict]:
+        """
+        Get the state of every replica.
+
+        Returns:
+            list[dict]: The host, health and lag of each replica.
+        """
+        return [
+            {
+                "host": f"{replica.engine.url.host}:{replica.engine.url.port}",
+                "database": replica.engine.url.database,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag,
+            }
+            for replica in self.replicas
+        ]
+
+
+replicas = ReplicaSet(settings.DB_REPLICA_URLS)
+
+# Clients that have just written read from the primary until this cookie,
+# a unix timestamp, has passed, so that they see their own writes even
+# when the replicas lag behind.
+PIN_COOKIE = "read_primary_until"
+
+
+def is_pinned(request: Request) -> bool:
+    """
+    Check whether a client has written recently.
+
+    Args:
+        request (Request): The request of the client.
+
+    Returns:
+        bool: True if its reads must go to the primary.
+    """
+    try:
+        return float(request.cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_db(request: Request, response: Response):
     """
     FastAPI dependency that yields a database session.
 
     The session is automatically committed or rolled back at the end of the
-    request, depending on whether an exception was thrown.
+    request, depending on whether an exception was thrown. Requests that may
+    write pin the client to the primary for DB_READ_YOUR_WRITES_WINDOW seconds.
     """
+    if request.method not in ("GET", "HEAD", "OPTIONS") and replicas.replicas:
+        window = settings.DB_READ_YOUR_WRITES_WINDOW
+        response.set_cookie(
+            PIN_COOKIE,
+            str(math.ceil(time.time() + window)),
+            max_age=math.ceil(window),
+            httponly=True,
+        )
     async with async_session_maker() as session:
         yield session
+
+
+async def get_read_db(request: Request):
+    """
+    FastAPI dependency that yields a session for reads only.
+
+    The session is bound to a healthy replica, taken round-robin, or to the
+    primary if there is none or the client has written recently.
+    """
+    async with replicas.session_maker(is_pinned(request))() as session:
+        yield session
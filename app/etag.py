@@ -0,0 +1,35 @@
+from fastapi import Request
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag from version tokens.
+
+    Args:
+        *parts: The values that identify the version of the representation.
+
+    Returns:
+        str: The quoted entity tag.
+    """
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Check whether the client already holds the current representation.
+
+    Args:
+        request (Request): The request, possibly with an If-None-Match header.
+        etag (str): The ETag of the current representation.
+
+    Returns:
+        bool: True if the request can be answered with 304 Not Modified.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison.
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in tags
@@ -0,0 +1,92 @@
+from functools import lru_cache
+from typing import Optional
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+
+def parse_fields(
+    fields: Optional[str], model: type[BaseModel]
+) -> Optional[tuple[str, ...]]:
+    """
+    Parse a comma-separated `fields` query parameter against a response model.
+
+    `id` is always included, so that rows can still be told apart.
+
+    Args:
+        fields (Optional[str]): The parameter received from the client.
+        model (type[BaseModel]): The full response model.
+
+    Returns:
+        Optional[tuple[str, ...]]: The requested fields in the order of the
+        model, or None for every field.
+
+    Raises:
+        HTTPException: If a requested field does not exist.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    requested.add("id")
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+@lru_cache(maxsize=256)
+def sparse_model(model: type[BaseModel], fields: tuple[str, ...]) -> type[BaseModel]:
+    """
+    Build a copy of a response model with only some of its fields.
+
+    Models are built once per combination of fields and then reused.
+
+    Args:
+        model (type[BaseModel]): The full response model.
+        fields (tuple[str, ...]): The fields to keep, as returned by `parse_fields`.
+
+    Returns:
+        type[BaseModel]: The reduced model.
+    """
+    return create_model(
+        f"{model.__name__}[{','.join(fields)}]",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (model.model_fields[name].annotation, model.model_fields[name])
+            for name in fields
+        },
+    )
+
+
+@lru_cache(maxsize=256)
+def with_items(container: type[BaseModel], item: type[BaseModel]) -> type[BaseModel]:
+    """
+    Build a copy of a page or lookup result model whose `items` use another model.
+
+    Args:
+        container (type[BaseModel]): The model with an `items` list.
+        item (type[BaseModel]): The model of the items, usually a `sparse_model`.
+
+    Returns:
+        type[BaseModel]: The container model for those items.
+    """
+    return create_model(
+        f"{container.__name__}[{item.__name__}]",
+        __base__=container,
+        items=(list[item], ...),
+    )
+
+
+@lru_cache(maxsize=256)
+def list_adapter(item: type[BaseModel]) -> TypeAdapter:
+    """
+    Get a cached adapter that validates and encodes a list of `item` objects.
+
+    Args:
+        item (type[BaseModel]): The model of the list items.
+
+    Returns:
+        TypeAdapter: The adapter of `list[item]`.
+    """
+    return TypeAdapter(list[item])
@@ -0,0 +1,450 @@
+import asyncio
+import fcntl
+import functools
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# The upper bounds of the latency histogram buckets, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """What one request spent in the database, filled in by engine and pool hooks."""
+
+    __slots__ = (
+        "scope",
+        "started",
+        "statements",
+        "db_seconds",
+        "pool_wait_seconds",
+        "endpoint_done",
+    )
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.endpoint_done: Optional[float] = None
+
+    @property
+    def route(self) -> Optional[str]:
+        """The method and path template of the request, once it is routed."""
+        route = self.scope.get("route") if self.scope else None
+        return f"{self.scope['method']} {route.path}" if route is not None else None
+
+    def server_timing(self, now: float) -> str:
+        """
+        Build the Server-Timing header value of the request.
+
+        Args:
+            now (float): The `time.perf_counter()` when the response starts.
+
+        Returns:
+            str: The database, pool wait, serialization and total durations in ms.
+        """
+        timings = [
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.statements} statements"',
+            f"pool;dur={self.pool_wait_seconds * 1000:.2f}",
+        ]
+        if self.endpoint_done is not None:
+            timings.append(f"serialize;dur={(now - self.endpoint_done) * 1000:.2f}")
+        timings.append(f"total;dur={(now - self.started) * 1000:.2f}")
+        return ", ".join(timings)
+
+
+current: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "request_metrics", default=None
+)
+
+
+class RouteStats:
+    """The counters of one route in this worker."""
+
+    __slots__ = (
+        "buckets",
+        "count",
+        "seconds",
+        "statements",
+        "db_seconds",
+        "pool_wait_seconds",
+    )
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+
+routes: dict[tuple[str, str], RouteStats] = {}
+responses: dict[tuple[str, str, int], int] = {}
+
+
+def observe(
+    method: str, route: str, status: int, seconds: float, request: RequestMetrics
+):
+    """
+    Add a finished request to the counters of its route.
+
+    Args:
+        method (str): The HTTP method.
+        route (str): The path template of the matched route.
+        status (int): The response status code.
+        seconds (float): The time the request took.
+        request (RequestMetrics): What the request spent in the database.
+    """
+    stats = routes.get((method, route))
+    if stats is None:
+        stats = routes[method, route] = RouteStats()
+    for index, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            stats.buckets[index] += 1
+            break
+    stats.count += 1
+    stats.seconds += seconds
+    stats.statements += request.statements
+    stats.db_seconds += request.db_seconds
+    stats.pool_wait_seconds += request.pool_wait_seconds
+    responses[method, route, status] = responses.get((method, route, status), 0) + 1
+
+
+def record_pool_wait(seconds: float):
+    """Add the time a connection checkout waited to the current request."""
+    request = current.get()
+    if request is not None:
+        request.pool_wait_seconds += seconds
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if current.get() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    request = current.get()
+    started = getattr(context, "_metrics_started", None)
+    if request is not None and started is not None:
+        request.statements += 1
+        request.db_seconds += time.perf_counter() - started
+
+
+def instrument_engine(engine: AsyncEngine):
+    """
+    Count the statements of an engine and their time towards the current request.
+
+    Args:
+        engine (AsyncEngine): The engine to instrument.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_execute)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that times every HTTP request, counts it for its
+    route and adds the Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics(scope)
+        token = current.set(request)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.METRICS_SERVER_TIMING:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", request.server_timing(time.perf_counter())
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current.reset(token)
+            route = scope.get("route")
+            observe(
+                scope["method"],
+                route.path if route is not None else "<unmatched>",
+                status,
+                time.perf_counter() - request.started,
+                request,
+            )
+
+
+class TimedRoute(APIRoute):
+    """
+    An APIRoute that notes when its endpoint returns, so that the time until
+    the response starts counts as serialization.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        # include_router builds the route again from the wrapped endpoint.
+        if not getattr(endpoint, "timed", False):
+            endpoint = self._timed(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _timed(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                request = current.get()
+                if request is not None:
+                    request.endpoint_done = time.perf_counter()
+
+        timed.timed = True
+        return timed
+
+
+def snapshot() -> dict:
+    """
+    Get the counters of this worker in a form that can be stored as JSON.
+
+    Returns:
+        dict: The route counters and the response counts by status.
+    """
+    return {
+        "routes": [
+            [
+                method,
+                route,
+                stats.buckets,
+                stats.count,
+                stats.seconds,
+                stats.statements,
+                stats.db_seconds,
+                stats.pool_wait_seconds,
+            ]
+            # Copied first: snapshots are taken in threads while requests finish.
+            for (method, route), stats in list(routes.items())
+        ],
+        "responses": [
+            [method, route, status, count]
+            for (method, route, status), count in list(responses.items())
+        ],
+    }
+
+
+# The snapshot file of this worker, named after its pid and start time so
+# that a new worker which reuses the pid of an exited one gets its own file.
+_snapshot_name: Optional[str] = None
+# Where the counters of exited workers are added up.
+EXITED = "exited.json"
+
+
+def _own_snapshot() -> Path:
+    global _snapshot_name
+    pid = os.getpid()
+    # Workers forked from a preloaded master inherit the name of the master.
+    if _snapshot_name is None or not _snapshot_name.startswith(f"{pid}-"):
+        _snapshot_name = f"{pid}-{time.time_ns()}.json"
+    return Path(settings.METRICS_DIR) / _snapshot_name
+
+
+def _write(path: Path, counters: dict):
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(counters))
+    os.replace(temporary, path)
+
+
+def write_snapshot():
+    """Store the counters of this worker in METRICS_DIR, replacing its last snapshot."""
+    path = _own_snapshot()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write(path, snapshot())
+
+
+async def write_snapshots():
+    """Store the counters of this worker every METRICS_FLUSH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(write_snapshot)
+        except OSError:
+            logger.warning("Could not write the metrics snapshot", exc_info=True)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _exited(paths) -> list[Path]:
+    """Pick the worker snapshots whose worker is gone or was followed by a new one."""
+    workers = {}
+    for path in paths:
+        pid, _, started = path.stem.partition("-")
+        if pid.isdigit():
+            workers[path] = (int(pid), int(started or 0))
+    latest: dict[int, int] = {}
+    for pid, started in workers.values():
+        latest[pid] = max(latest.get(pid, started), started)
+    return [
+        path
+        for path, (pid, started) in workers.items()
+        if started < latest[pid] or not _alive(pid)
+    ]
+
+
+def _merge(workers) -> dict:
+    merged_routes: dict[tuple[str, str], list] = {}
+    merged_responses: dict[tuple[str, str, int], int] = {}
+    for worker in workers:
+        for method, route, buckets, *totals in worker["routes"]:
+            merged = merged_routes.setdefault(
+                (method, route), [[0] * len(BUCKETS)] + [0] * len(totals)
+            )
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            for index, total in enumerate(totals, start=1):
+                merged[index] += total
+        for method, route, status, count in worker["responses"]:
+            key = (method, route, status)
+            merged_responses[key] = merged_responses.get(key, 0) + count
+    return {
+        "routes": [
+            [method, route, *merged] for (method, route), merged in merged_routes.items()
+        ],
+        "responses": [[*key, count] for key, count in merged_responses.items()],
+    }
+
+
+def collect() -> dict:
+    """
+    Sum up the counters of every worker.
+
+    Without METRICS_DIR, only this worker is counted. Otherwise the snapshot
+    of this worker is refreshed and merged with those of the others. The
+    snapshots of workers that exited are added to EXITED and removed, so
+    that counters never drop. The workers must share a host, and collecting
+    takes a file lock; call it from a thread, not the event loop.
+
+    Returns:
+        dict: The merged counters, in the form of `snapshot`.
+    """
+    if not settings.METRICS_DIR:
+        return snapshot()
+    write_snapshot()
+    directory = Path(settings.METRICS_DIR)
+    # Collecting workers must not add the same exited snapshot twice.
+    with open(directory / "collect.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        workers = {}
+        for path in directory.glob("*.json"):
+            try:
+                workers[path] = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+        exited = _exited(workers)
+        if exited:
+            totals = [workers[path] for path in exited]
+            if directory / EXITED in workers:
+                totals.append(workers[directory / EXITED])
+            _write(directory / EXITED, _merge(totals))
+            for path in exited:
+                path.unlink()
+        return _merge(workers.values())
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+        + "}"
+    )
+
+
+def render(counters: dict) -> str:
+    """
+    Write counters in the Prometheus text exposition format.
+
+    Args:
+        counters (dict): The counters as returned by `collect`.
+
+    Returns:
+        str: The metrics page.
+    """
+    lines = [
+        "# HELP http_request_duration_seconds Time spent on requests, by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    totals = []
+    for (
+        method,
+        route,
+        buckets,
+        count,
+        seconds,
+        statements,
+        db_seconds,
+        pool_wait,
+    ) in sorted(counters["routes"], key=lambda entry: (entry[1], entry[0])):
+        cumulative = 0
+        for bound, observed in zip(BUCKETS, buckets):
+            cumulative += observed
+            labels = _labels(method=method, route=route, le=bound)
+            lines.append(f"http_request_duration_seconds_bucket{labels} {cumulative}")
+        labels = _labels(method=method, route=route, le="+Inf")
+        lines.append(f"http_request_duration_seconds_bucket{labels} {count}")
+        labels = _labels(method=method, route=route)
+        lines.append(f"http_request_duration_seconds_sum{labels} {seconds}")
+        lines.append(f"http_request_duration_seconds_count{labels} {count}")
+        totals.append((labels, statements, db_seconds, pool_wait))
+
+    for name, help, index in (
+        ("http_request_db_statements_total", "SQL statements run by requests.", 1),
+        ("http_request_db_seconds_total", "Time requests spent in SQL statements.", 2),
+        (
+            "http_request_pool_wait_seconds_total",
+            "Time requests waited for a connection.",
+            3,
+        ),
+    ):
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(f"{name}{total[0]} {total[index]}" for total in totals)
+
+    lines.append("# HELP http_requests_total Finished requests, by route and status.")
+    lines.append("# TYPE http_requests_total counter")
+    for method, route, status, count in sorted(
+        counters["responses"], key=lambda entry: (entry[1], entry[0], entry[2])
+    ):
+        labels = _labels(method=method, route=route, status=status)
+        lines.append(f"http_requests_total{labels} {count}")
+    return "\n".join(lines) + "\n"
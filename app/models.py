@@ -0,0 +1,11 @@
+from app.database import Base
+from sqlalchemy.orm import mapped_column, Mapped
+from sqlalchemy import BigInteger, Integer, String
+
+
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+
+    table_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
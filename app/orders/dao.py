@@ -1,107 +1,615 @@
+import datetime
+import random
+from decimal import Decimal
+from typing import NamedTuple, Optional
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import Integer, any_, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from app import bus
+from app.config import settings
 from app.orders.models import Order, OrderItem
-from app.products.models import Product
+from app.products.dao import ProductDAO
+from app.products.models import Product, ProductStockShard
 from app.orders.schemas import OrderCreateSchema
 
 
+class OrderItemRow(NamedTuple):
+    """A read-only order item, without ORM instrumentation."""
+
+    id: int
+    product_id: int
+    quantity: int
+
+
+class OrderItemProductRow(NamedTuple):
+    """The product of an expanded order item."""
+
+    id: int
+    name: str
+    price: Decimal
+
+
+class ExpandedOrderItemRow(NamedTuple):
+    """A read-only order item with its product embedded."""
+
+    id: int
+    product_id: int
+    quantity: int
+    product: OrderItemProductRow
+
+
+class OrderRow(NamedTuple):
+    """A read-only order with its items, without ORM instrumentation."""
+
+    id: int
+    date_created: datetime.datetime
+    status: str
+    items: list[OrderItemRow]
+
+
+order_columns = (Order.id, Order.date_created, Order.status)
+order_item_columns = (
+    OrderItem.id,
+    OrderItem.order_id,
+    OrderItem.product_id,
+    OrderItem.quantity,
+)
+
+
+async def _load_items(
+    db: AsyncSession, orders: dict[int, OrderRow], query, expand: bool = False
+):
+    """
+    Append the order items selected by `query` to their orders.
+
+    With `expand`, every item also gets its product through `OrderItem.product`.
+    For up to ORDERS_EXPAND_JOINED_MAX orders the products are joined into
+    the items query. For more orders, where the same products would be sent
+    for many items, they are loaded once each with one extra query instead.
+    """
+    if not expand:
+        for id, order_id, product_id, quantity in await db.execute(query):
+            orders[order_id].items.append(OrderItemRow(id, product_id, quantity))
+        return
+
+    if len(orders) <= settings.ORDERS_EXPAND_JOINED_MAX:
+        rows = await db.execute(
+            query.join(OrderItem.product).add_columns(Product.name, Product.price)
+        )
+        for id, order_id, product_id, quantity, name, price in rows:
+            orders[order_id].items.append(
+                ExpandedOrderItemRow(
+                    id,
+                    product_id,
+                    quantity,
+                    OrderItemProductRow(product_id, name, price),
+                )
+            )
+        return
+
+    items = (await db.execute(query)).all()
+    product_ids = sorted({item.product_id for item in items})
+    products = {
+        id: OrderItemProductRow(id, name, price)
+        for id, name, price in await db.execute(
+            select(Product.id, Product.name, Product.price).where(
+                Product.id == any_(literal(product_ids, ARRAY(Integer)))
+            )
+        )
+    }
+    for id, order_id, product_id, quantity in items:
+        # A product deleted between the two queries took its items with it.
+        if product_id in products:
+            orders[order_id].items.append(
+                ExpandedOrderItemRow(id, product_id, quantity, products[product_id])
+            )
+
+
+def _order_query(fields: Optional[tuple[str, ...]]):
+    """Select the order columns among `fields`, or all of them."""
+    if fields is None:
+        return select(*order_columns)
+    return select(*(column for column in order_columns if column.key in fields))
+
+
+async def _read_orders(db: AsyncSession, query) -> dict[int, OrderRow]:
+    """Run a query built by `_order_query`; the columns it left out are None."""
+    result = await db.execute(query)
+    if len(result.keys()) == len(order_columns):
+        return {
+            id: OrderRow(id, date_created, status, [])
+            for id, date_created, status in result
+        }
+    return {
+        row["id"]: OrderRow(row["id"], row.get("date_created"), row.get("status"), [])
+        for row in result.mappings()
+    }
+
+
+def _with_items(fields: Optional[tuple[str, ...]]) -> bool:
+    return fields is None or "items" in fields
+
+
+def _unnest(name: str, **columns: list[int]):
+    """
+    Build a CTE of integer rows from parallel lists bound as arrays, so that
+    the statement text does not depend on the number of rows.
+    """
+    return select(
+        *(
+            func.unnest(literal(values, ARRAY(Integer))).label(column)
+            for column, values in columns.items()
+        )
+    ).cte(name)
+
+
+def _drain(shards: list[tuple[int, int]], quantity: int) -> dict[int, int]:
+    """
+    Split a quantity over stock shards, emptying them in the given order.
+
+    Returns:
+        dict[int, int]: The quantity to take per shard.
+    """
+    takes = {}
+    for shard, available in shards:
+        if quantity and available:
+            takes[shard] = min(available, quantity)
+            quantity -= takes[shard]
+    return takes
+
+
 class OrderDAO:
     @staticmethod
     async def create_order(db: AsyncSession, order_data: OrderCreateSchema):
         """
         Create a new order and subtract the quantity from the products.
+
+        Everything happens in one transaction with a constant number of
+        statements: the order and all of its items are inserted in bulk, and
+        the stock of all products is checked and decremented by one
+        conditional update. Nothing is kept if the stock check fails.
         Args:
             db (AsyncSession): The database session.
             order_data (OrderCreateSchema): The order data to create the order with.
         Returns:
-            Order: The newly created order with the items.
+            dict: The newly created order with the items.
         Raises:
             HTTPException: If a product is not found or not enough in stock.
         """
-        new_order = Order(status=order_data.status)
-        db.add(new_order)
-        await db.commit()
-        await db.refresh(new_order)
+        try:
+            [order] = await OrderDAO._insert_orders(db, [order_data])
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=410, detail="Product not found")
 
+        # The stock is taken last so that the product rows stay locked only
+        # until the commit that follows.
+        demand = {}
         for item in order_data.items:
-            product = (
-                (await db.execute(select(Product).where(Product.id == item.product_id)))
-                .scalars()
-                .first()
-            )
+            demand[item.product_id] = demand.get(item.product_id, 0) + item.quantity
+        if demand:
+            await OrderDAO._take_stock(db, demand)
 
-            if not product:
-                raise HTTPException(status_code=410, detail="Product not found")
+        await bus.publish(db, products=list(demand), orders=[order["id"]])
+        await db.commit()
+        ProductDAO.invalidate(demand)
+        return order
 
-            if product.available < item.quantity:
-                raise HTTPException(
-                    status_code=400, detail="Not enough products in stock"
+    @staticmethod
+    async def create_orders(db: AsyncSession, orders: list[OrderCreateSchema]):
+        """
+        Create many orders at once, each of which succeeds or fails on its own.
+
+        The stock of every product in the batch is locked and read up front,
+        the orders are accepted in the given order while their demand fits the
+        remaining stock, and then the stock is decremented and the accepted
+        orders and items are inserted with set-based statements.
+        Args:
+            db (AsyncSession): The database session.
+            orders (list[OrderCreateSchema]): The orders to create.
+        Returns:
+            list[dict]: Per order, either the created `order` or an `error`.
+        """
+        product_ids = sorted({item.product_id for o in orders for item in o.items})
+        stock = dict(
+            (
+                await db.execute(
+                    select(Product.id, Product.available)
+                    .where(Product.id.in_(product_ids))
+                    .where(Product.stock_shards == 1)
+                    .order_by(Product.id)
+                    .with_for_update(key_share=True)
                 )
+            ).all()
+        )
+        shard_stock = {}
+        shard_rows = await db.execute(
+            select(
+                ProductStockShard.product_id,
+                ProductStockShard.shard,
+                ProductStockShard.available,
+            )
+            .where(ProductStockShard.product_id.in_(product_ids))
+            .order_by(ProductStockShard.product_id, ProductStockShard.shard)
+            .with_for_update(key_share=True)
+        )
+        for product_id, shard, available in shard_rows:
+            shard_stock.setdefault(product_id, []).append((shard, available))
+            stock[product_id] = stock.get(product_id, 0) + available
 
-            product.available -= item.quantity
-            db.add(product)
+        results = []
+        accepted = []
+        taken = {}
+        for order_data in orders:
+            demand = {}
+            for item in order_data.items:
+                demand[item.product_id] = demand.get(item.product_id, 0) + item.quantity
+            if any(product_id not in stock for product_id in demand):
+                results.append({"error": "Product not found"})
+            elif any(stock[id] < quantity for id, quantity in demand.items()):
+                results.append({"error": "Not enough products in stock"})
+            else:
+                for product_id, quantity in demand.items():
+                    stock[product_id] -= quantity
+                    taken[product_id] = taken.get(product_id, 0) + quantity
+                results.append(None)
+                accepted.append(order_data)
 
-            order_item = OrderItem(
-                order_id=new_order.id, product_id=item.product_id, quantity=item.quantity
+        plain = {id: quantity for id, quantity in taken.items() if id not in shard_stock}
+        if plain:
+            wanted = _unnest(
+                "wanted", product_id=list(plain), quantity=list(plain.values())
+            )
+            await db.execute(
+                update(Product)
+                .where(Product.id == wanted.c.product_id)
+                .values(available=Product.available - wanted.c.quantity)
+            )
+        shard_takes = [
+            (product_id, shard, quantity)
+            for product_id, shards in shard_stock.items()
+            if product_id in taken
+            for shard, quantity in _drain(shards, taken[product_id]).items()
+        ]
+        if shard_takes:
+            product_id, shard, quantity = (list(column) for column in zip(*shard_takes))
+            wanted = _unnest(
+                "wanted", product_id=product_id, shard=shard, quantity=quantity
+            )
+            await db.execute(
+                update(ProductStockShard)
+                .where(ProductStockShard.product_id == wanted.c.product_id)
+                .where(ProductStockShard.shard == wanted.c.shard)
+                .values(available=ProductStockShard.available - wanted.c.quantity)
             )
-            db.add(order_item)
 
+        created = await OrderDAO._insert_orders(db, accepted) if accepted else []
+        await bus.publish(
+            db, products=list(taken), orders=[order["id"] for order in created]
+        )
         await db.commit()
-        await db.refresh(new_order)
+        ProductDAO.invalidate(taken)
+        created = iter(created)
+        return [result or {"order": next(created)} for result in results]
+
+    @staticmethod
+    async def _insert_orders(db: AsyncSession, orders: list[OrderCreateSchema]):
+        """
+        Insert orders and all of their items with one multi-row insert each.
+        Args:
+            db (AsyncSession): The database session.
+            orders (list[OrderCreateSchema]): The orders to insert.
+        Returns:
+            list[dict]: The inserted orders with their items, in the given order.
+        """
+        created = (
+            await db.execute(
+                insert(Order).returning(
+                    Order.id,
+                    Order.date_created,
+                    Order.status,
+                    sort_by_parameter_order=True,
+                ),
+                [{"status": order_data.status} for order_data in orders],
+            )
+        ).all()
 
-        query = (
-            select(Order)
-            .where(Order.id == new_order.id)
-            .options(selectinload(Order.items))
+        rows = [
+            {
+                "order_id": order.id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+            }
+            for order, order_data in zip(created, orders)
+            for item in order_data.items
+        ]
+        items = {order.id: [] for order in created}
+        if rows:
+            inserted = await db.execute(
+                insert(OrderItem).returning(
+                    OrderItem.id,
+                    OrderItem.order_id,
+                    OrderItem.product_id,
+                    OrderItem.quantity,
+                    sort_by_parameter_order=True,
+                ),
+                rows,
+            )
+            for item in inserted:
+                items[item.order_id].append(
+                    {
+                        "id": item.id,
+                        "product_id": item.product_id,
+                        "quantity": item.quantity,
+                    }
+                )
+        return [{**order._asdict(), "items": items[order.id]} for order in created]
+
+    @staticmethod
+    async def _take_stock(db: AsyncSession, demand: dict[int, int]):
+        """
+        Atomically subtract the demanded quantities from the products.
+
+        The rows are locked in id order so that concurrent multi-item orders
+        cannot deadlock, and each row is only decremented if it still has
+        enough stock, so concurrent checkouts can never oversell. Sharded
+        products are handled afterwards, one at a time in id order.
+        Args:
+            db (AsyncSession): The database session.
+            demand (dict[int, int]): The quantity to take per product id.
+        Raises:
+            HTTPException: If a product is not found or not enough in stock.
+        """
+        wanted = _unnest(
+            "wanted", product_id=list(demand), quantity=list(demand.values())
         )
-        result = await db.execute(query)
-        return result.scalars().first()
+        locked = (
+            select(Product.id, wanted.c.quantity)
+            .join(wanted, wanted.c.product_id == Product.id)
+            .where(Product.stock_shards == 1)
+            .where(Product.available >= wanted.c.quantity)
+            .order_by(Product.id)
+            .with_for_update(of=Product, key_share=True)
+            .cte("locked")
+            .prefix_with("MATERIALIZED")
+        )
+        taken = await db.execute(
+            update(Product)
+            .where(Product.id == locked.c.id)
+            .where(Product.available >= locked.c.quantity)
+            .values(available=Product.available - locked.c.quantity)
+            .returning(Product.id)
+        )
+        unmet = set(demand) - set(taken.scalars())
+        if not unmet:
+            return
+
+        shards = dict(
+            (
+                await db.execute(
+                    select(Product.id, Product.stock_shards).where(Product.id.in_(unmet))
+                )
+            ).all()
+        )
+        for product_id in sorted(unmet):
+            if shards.get(product_id, 1) > 1 and await OrderDAO._take_sharded_stock(
+                db, product_id, demand[product_id], shards[product_id]
+            ):
+                continue
+            await db.rollback()
+            if product_id not in shards:
+                raise HTTPException(status_code=410, detail="Product not found")
+            raise HTTPException(status_code=400, detail="Not enough products in stock")
 
     @staticmethod
-    async def get_all_orders(db: AsyncSession):
-        """Get all orders with their items.
+    async def _take_sharded_stock(
+        db: AsyncSession, product_id: int, quantity: int, shards: int
+    ):
+        """
+        Subtract a quantity from the stock shards of a product.
+
+        A shard is picked at random and the ones after it are tried in turn,
+        skipping shards that are locked by other checkouts. If no single shard
+        can be taken right away, all shards are locked in order and drained
+        one after the other.
         Args:
             db (AsyncSession): The database session.
+            product_id (int): The product id.
+            quantity (int): The quantity to take.
+            shards (int): The number of shards of the product.
         Returns:
-            List[Order]: A list of orders with their items.
+            bool: True if the quantity was taken, False if not enough in stock.
+        """
+        start = random.randrange(shards)
+        pick = (
+            select(ProductStockShard.shard)
+            .where(ProductStockShard.product_id == product_id)
+            .where(ProductStockShard.available >= quantity)
+            .order_by(ProductStockShard.shard < start, ProductStockShard.shard)
+            .limit(1)
+            .with_for_update(key_share=True, skip_locked=True)
+            .scalar_subquery()
+        )
+        taken = await db.execute(
+            update(ProductStockShard)
+            .where(ProductStockShard.product_id == product_id)
+            .where(ProductStockShard.shard == pick)
+            .values(available=ProductStockShard.available - quantity)
+            .returning(ProductStockShard.shard)
+        )
+        if taken.first():
+            return True
+
+        stock = await db.execute(
+            select(ProductStockShard.shard, ProductStockShard.available)
+            .where(ProductStockShard.product_id == product_id)
+            .order_by(ProductStockShard.shard)
+            .with_for_update(key_share=True)
+        )
+        stock = stock.all()
+        if sum(available for _, available in stock) < quantity:
+            return False
+        takes = _drain(stock, quantity)
+
+        wanted = _unnest("wanted", shard=list(takes), quantity=list(takes.values()))
+        await db.execute(
+            update(ProductStockShard)
+            .where(ProductStockShard.product_id == product_id)
+            .where(ProductStockShard.shard == wanted.c.shard)
+            .values(available=ProductStockShard.available - wanted.c.quantity)
+        )
+        return True
+
+    @staticmethod
+    async def get_all_orders(
+        db: AsyncSession, expand: bool = False, fields: Optional[tuple[str, ...]] = None
+    ):
+        """Get all orders with their items as plain rows.
+        Args:
+            db (AsyncSession): The database session.
+            expand (bool): Embed the product of every item.
+            fields (Optional[tuple[str, ...]]): Only load these fields; they must
+                include `id`. The items are only loaded when `items` is among them.
+        Returns:
+            List[OrderRow]: A list of orders ordered by id, with their items.
+        """
+        orders = await _read_orders(db, _order_query(fields).order_by(Order.id))
+        if _with_items(fields):
+            await _load_items(
+                db, orders, select(*order_item_columns).order_by(OrderItem.id), expand
+            )
+        return list(orders.values())
+
+    @staticmethod
+    async def stream_orders(db: AsyncSession, chunk_size: int):
+        """Stream all orders with their items through a server-side cursor.
+        Args:
+            db (AsyncSession): The database session.
+            chunk_size (int): The number of orders fetched from the cursor at a time.
+        Yields:
+            List[OrderRow]: The next chunk of orders, each with its list of items.
         """
-        query = select(Order).options(selectinload(Order.items))
-        result = await db.execute(query)
-        return result.unique().scalars().all()
+        rows = await db.stream(
+            select(*order_columns)
+            .order_by(Order.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for chunk in rows.partitions():
+            orders = {
+                id: OrderRow(id, date_created, status, [])
+                for id, date_created, status in chunk
+            }
+            await _load_items(
+                db,
+                orders,
+                select(*order_item_columns)
+                .where(OrderItem.order_id.in_(orders))
+                .order_by(OrderItem.id),
+            )
+            yield list(orders.values())
 
     @staticmethod
-    async def get_order_by_id(db: AsyncSession, id: int):
+    async def get_order_by_id(
+        db: AsyncSession,
+        id: int,
+        expand: bool = False,
+        fields: Optional[tuple[str, ...]] = None,
+    ):
         
-        """Get an order by id with its items.
+        """Get an order by id with its items as a plain row.
         Args:
             db (AsyncSession): The database session.
             id (int): The order id.
+            expand (bool): Embed the product of every item.
+            fields (Optional[tuple[str, ...]]): Only load these fields; they must
+                include `id`. The items are only loaded when `items` is among them.
         Returns:
-            Order: The order with its items if found, otherwise None.
+            OrderRow: The order with its items if found, otherwise None.
         """
-        query = select(Order).where(Order.id == id).options(selectinload(Order.items))
-        result = await db.execute(query)
-        return result.unique().scalars().first()
+        orders = await _read_orders(db, _order_query(fields).where(Order.id == id))
+        if not orders:
+            return None
+        if _with_items(fields):
+            await _load_items(
+                db,
+                orders,
+                select(*order_item_columns)
+                .where(OrderItem.order_id == id)
+                .order_by(OrderItem.id),
+                expand,
+            )
+        return orders[id]
+
+    @staticmethod
+    async def get_orders_by_ids(
+        db: AsyncSession, ids: list[int], fields: Optional[tuple[str, ...]] = None
+    ):
+        """Get many orders by id with their items as plain rows, with two queries.
+        Args:
+            db (AsyncSession): The database session.
+            ids (list[int]): The order ids.
+            fields (Optional[tuple[str, ...]]): Only load these fields; they must
+                include `id`. The items are only loaded when `items` is among them.
+        Returns:
+            tuple[List[OrderRow], List[int]]: The orders found, in the order of
+            `ids` and without repeats, and the ids that were not found.
+        """
+        ids = list(dict.fromkeys(ids))
+        wanted = literal(ids, ARRAY(Integer))
+        orders = await _read_orders(
+            db, _order_query(fields).where(Order.id == any_(wanted))
+        )
+        if orders and _with_items(fields):
+            await _load_items(
+                db,
+                orders,
+                select(*order_item_columns)
+                .where(OrderItem.order_id == any_(literal(list(orders), ARRAY(Integer))))
+                .order_by(OrderItem.id),
+            )
+        return (
+            [orders[id] for id in ids if id in orders],
+            [id for id in ids if id not in orders],
+        )
+
+    @staticmethod
+    async def get_order_version(db: AsyncSession, id: int):
+        """Get the version of an order, which grows with every change to it.
+        Args:
+            db (AsyncSession): The database session.
+            id (int): The order id.
+        Returns:
+            int: The order version if found, otherwise None.
+        """
+        result = await db.execute(select(Order.version).where(Order.id == id))
+        return result.scalar_one_or_none()
 
     @staticmethod
     async def update_order_status(db: AsyncSession, id: int, status: str):
         
-        """Update an order status by id.
+        """Update an order status by id with one UPDATE ... RETURNING statement.
         Args:
             db (AsyncSession): The database session.
             id (int): The order id.
             status (str): The new order status.
         Returns:
-            Order: The updated order if found, otherwise None.
+            Row: The id, creation date and new status of the order if found,
+            otherwise None.
         """
-        order = await db.get(Order, id)
-        if not order:
+        result = await db.execute(
+            update(Order)
+            .where(Order.id == id)
+            .values(status=status, version=Order.version + 1)
+            .returning(Order.id, Order.date_created, Order.status)
+        )
+        order = result.first()
+        if order is None:
+            await db.rollback()
             return None
-        order.status = status
+        await bus.publish(db, orders=[id])
         await db.commit()
-        await db.refresh(order)
         return order
 
     @staticmethod
@@ -113,9 +621,28 @@ class OrderDAO:
         Returns:
             bool: True if the order was found and deleted, otherwise None.
         """
-        order = await db.get(Order, id)
-        if not order:
-            return None
-        await db.delete(order)
+        return True if await OrderDAO.delete_orders(db, [id]) else None
+
+    @staticmethod
+    async def delete_orders(db: AsyncSession, ids: list[int]):
+        """Delete many orders by id with one statement.
+        Their items are removed by the database through ON DELETE CASCADE
+        and never loaded.
+        Args:
+            db (AsyncSession): The database session.
+            ids (list[int]): The order ids.
+        Returns:
+            list[int]: The ids of the orders that were found and deleted.
+        """
+        result = await db.execute(
+            delete(Order)
+            .where(Order.id == any_(literal(sorted(set(ids)), ARRAY(Integer))))
+            .returning(Order.id)
+        )
+        deleted = sorted(result.scalars())
+        if not deleted:
+            await db.rollback()
+            return []
+        await bus.publish(db, orders=deleted)
         await db.commit()
-        return True
+        return deleted
@@ -1,10 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
-from app.orders.schemas import OrderCreateSchema, OrderSchema, OrderPatchResponseSchema
+from app import bus
+from app.config import settings
+from app.metrics import TimedRoute
+from app.database import get_db, get_read_db, is_pinned, replicas
+from app.etag import is_not_modified, make_etag
+from app.fields import list_adapter, parse_fields, sparse_model, with_items
+from app.serialization import FastJSONResponse
+from app.orders.schemas import (
+    ExpandedOrderSchema,
+    OrderBatchResultSchema,
+    OrderBulkDeleteResult,
+    OrderCreateSchema,
+    OrderLookupResult,
+    OrderPatchResponseSchema,
+    OrderSchema,
+)
 from app.orders.dao import OrderDAO
 
-router = APIRouter(prefix="/orders", tags=["Orders"])
+router = APIRouter(prefix="/orders", tags=["Orders"], route_class=TimedRoute)
 
 
 @router.post("/", response_model=OrderSchema, status_code=201)
@@ -26,36 +42,218 @@ async def create_order(order_data: OrderCreateSchema, db: AsyncSession = Depends
     return new_order
 
 
+@router.post("/batch", response_model=list[OrderBatchResultSchema])
+async def create_orders(
+    orders: list[OrderCreateSchema], db: AsyncSession = Depends(get_db)
+):
+    """
+    Create many orders at once.
+
+    Every order succeeds or fails on its own; a failed order does not abort
+    the rest of the batch.
+
+    Args:
+        orders (list[OrderCreateSchema]): The orders to create.
+
+    Returns:
+        list[OrderBatchResultSchema]: Per order, in the same order, either the
+        created order or the reason it failed.
+
+    Raises:
+        HTTPException: If the batch is larger than ORDERS_BATCH_MAX_SIZE.
+    """
+    if len(orders) > settings.ORDERS_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail="Too many orders in the batch")
+    return await OrderDAO.create_orders(db, orders)
+
+
+@router.post("/bulk-delete", response_model=OrderBulkDeleteResult)
+async def delete_orders(ids: list[int], db: AsyncSession = Depends(get_db)):
+    """
+    Delete many orders at once.
+
+    All of them are removed with one statement, together with their items.
+
+    Args:
+        ids (list[int]): The order ids.
+
+    Returns:
+        OrderBulkDeleteResult: The ids that were deleted and the ids that
+        were not found.
+
+    Raises:
+        HTTPException: If there are more ids than BULK_DELETE_MAX_SIZE.
+    """
+    if len(ids) > settings.BULK_DELETE_MAX_SIZE:
+        raise HTTPException(status_code=413, detail="Too many ids to delete")
+    deleted = await OrderDAO.delete_orders(db, ids)
+    return OrderBulkDeleteResult(
+        deleted=deleted, missing=sorted(set(ids).difference(deleted))
+    )
+
+
+@router.post("/lookup", response_model=OrderLookupResult)
+async def lookup_orders(
+    ids: list[int], fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get many orders by id with one request.
+
+    Args:
+        ids (list[int]): The order ids.
+        fields (Optional[str]): Comma-separated fields to return; `id` is
+            always included.
+
+    Returns:
+        OrderLookupResult: The orders found, in the requested order, and the
+        ids that were not found.
+
+    Raises:
+        HTTPException: If there are more ids than LOOKUP_MAX_IDS, or the
+        fields are malformed.
+    """
+    if len(ids) > settings.LOOKUP_MAX_IDS:
+        raise HTTPException(status_code=413, detail="Too many ids to look up")
+    selected = parse_fields(fields, OrderSchema)
+    orders, missing = await OrderDAO.get_orders_by_ids(db, ids, selected)
+    if selected is not None:
+        result = with_items(OrderLookupResult, sparse_model(OrderSchema, selected))
+        return Response(
+            result(items=orders, missing=missing).model_dump_json(),
+            media_type="application/json",
+        )
+    if settings.FAST_JSON:
+        return FastJSONResponse({"items": orders, "missing": missing})
+    return OrderLookupResult(items=orders, missing=missing)
+
+
 @router.get("/", response_model=list[OrderSchema])
-async def get_orders(db: AsyncSession = Depends(get_db)):
+async def get_orders(
+    expand: Optional[Literal["product"]] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
     """
     Get all orders.
 
+    With FAST_JSON enabled, the order rows are encoded with orjson instead
+    of being validated against OrderSchema one by one.
+
+    Args:
+        expand (Optional[Literal["product"]]): Embed the product name and
+            price in every item.
+        fields (Optional[str]): Comma-separated fields to return; `id` is
+            always included.
+
     Returns:
-        list[OrderSchema]: A list of all orders.
+        list[OrderSchema]: A list of all orders, as ExpandedOrderSchema when
+        expanded.
+
+    Raises:
+        HTTPException: If the fields are malformed.
     """
-    orders = await OrderDAO.get_all_orders(db)
-    return orders
+    selected = parse_fields(fields, OrderSchema)
+    orders = await OrderDAO.get_all_orders(
+        db, expand=expand == "product", fields=selected
+    )
+    schema = ExpandedOrderSchema if expand == "product" else OrderSchema
+    if selected is not None:
+        schema = sparse_model(schema, selected)
+    elif settings.FAST_JSON:
+        return FastJSONResponse(orders)
+    elif schema is OrderSchema:
+        return orders
+    adapter = list_adapter(schema)
+    return Response(
+        adapter.dump_json(adapter.validate_python(orders, from_attributes=True)),
+        media_type="application/json",
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_orders(request: Request):
+    """
+    Export all orders as newline-delimited JSON.
+
+    The orders are read through a server-side cursor and written out chunk by
+    chunk, so memory use does not depend on the number of orders. The session
+    is opened inside the stream because dependencies are closed before the
+    response body is sent; like the other reads, it goes to a replica.
+
+    Returns:
+        StreamingResponse: One OrderSchema object per line.
+    """
+
+    session_maker = replicas.session_maker(is_pinned(request))
+
+    async def lines():
+        async with session_maker() as db:
+            chunks = OrderDAO.stream_orders(db, settings.ORDERS_EXPORT_CHUNK_SIZE)
+            async for orders in chunks:
+                yield "".join(
+                    OrderSchema.model_validate(order).model_dump_json() + "\n"
+                    for order in orders
+                )
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.get("/{id}", response_model=OrderSchema)
-async def get_order_by_id(id: int, db: AsyncSession = Depends(get_db)):
+async def get_order_by_id(
+    id: int,
+    request: Request,
+    response: Response,
+    expand: Optional[Literal["product"]] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
     """
     Get an order by id.
 
+    The response carries an ETag built from the order version, and from the
+    change counter of the products table when products are embedded. If it
+    matches If-None-Match, 304 is returned without loading the order.
+
     Args:
         id (int): The order id.
+        expand (Optional[Literal["product"]]): Embed the product name and
+            price in every item.
+        fields (Optional[str]): Comma-separated fields to return; `id` is
+            always included.
 
     Returns:
-        OrderSchema: The order if found, otherwise raises a 404 HTTPException.
+        OrderSchema: The order if found, as ExpandedOrderSchema when expanded,
+        otherwise raises a 404 HTTPException.
 
     Raises:
-        HTTPException: If the order is not found.
+        HTTPException: If the order is not found or the fields are malformed.
     """
-    order = await OrderDAO.get_order_by_id(db, id)
+    selected = parse_fields(fields, OrderSchema)
+    version = await OrderDAO.get_order_version(db, id)
+    if version is not None:
+        if expand == "product":
+            products_version = await bus.get_version(db, "products")
+            etag = make_etag("order", id, version, "products", products_version)
+        else:
+            etag = make_etag("order", id, version)
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+    order = await OrderDAO.get_order_by_id(
+        db, id, expand=expand == "product", fields=selected
+    )
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    schema = ExpandedOrderSchema if expand == "product" else OrderSchema
+    if selected is not None:
+        schema = sparse_model(schema, selected)
+    elif schema is OrderSchema:
+        return order
+    return Response(
+        schema.model_validate(order).model_dump_json(),
+        media_type="application/json",
+        headers={"ETag": etag} if version is not None else None,
+    )
 
 
 @router.patch("/{id}/{status}", response_model=OrderPatchResponseSchema)
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import List
+from decimal import Decimal
+from typing import List, Optional
 
 
 class OrderItemBaseSchema(BaseModel):
@@ -34,9 +35,40 @@ class OrderSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class OrderItemProductSchema(BaseModel):
+    id: int
+    name: str
+    price: Decimal
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ExpandedOrderItemSchema(OrderItemSchema):
+    product: OrderItemProductSchema
+
+
+class ExpandedOrderSchema(OrderSchema):
+    items: List[ExpandedOrderItemSchema]
+
+
+class OrderLookupResult(BaseModel):
+    items: List[OrderSchema]
+    missing: List[int]
+
+
 class OrderPatchResponseSchema(BaseModel):
     date_created: datetime
     status: str
     id: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class OrderBatchResultSchema(BaseModel):
+    order: Optional[OrderSchema] = None
+    error: Optional[str] = None
+
+
+class OrderBulkDeleteResult(BaseModel):
+    deleted: List[int]
+    missing: List[int]
@@ -0,0 +1,42 @@
+import base64
+import binascii
+from typing import Optional
+from fastapi import HTTPException
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Encode the id of the last row of a page into an opaque cursor.
+
+    Args:
+        last_id (int): The id of the last row returned to the client.
+
+    Returns:
+        str: A url-safe cursor to pass back as the `after` parameter.
+    """
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (Optional[str]): The cursor received from the client.
+
+    Returns:
+        Optional[int]: The id to continue after, or None for the first page.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded).decode().partition(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,49 @@
+"""
+Import products from a CSV or NDJSON file.
+
+Usage:
+    python -m app.products.cli products.csv
+    python -m app.products.cli products.ndjson
+"""
+import argparse
+import asyncio
+import json
+import sys
+from fastapi import HTTPException
+from app.database import async_session_maker
+from app.products.dao import ProductDAO
+
+CHUNK_SIZE = 1 << 20
+
+
+async def read_chunks(path: str):
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            yield chunk
+
+
+async def import_file(path: str, format: str):
+    async with async_session_maker() as db:
+        return await ProductDAO.import_products(db, read_chunks(path), format)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import products into the catalog.")
+    parser.add_argument("path", help="a CSV file with a header line or an NDJSON file")
+    parser.add_argument(
+        "--format",
+        choices=["csv", "ndjson"],
+        help="the file format, guessed from the extension by default",
+    )
+    args = parser.parse_args()
+    format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    try:
+        result = asyncio.run(import_file(args.path, format))
+    except HTTPException as exc:
+        sys.exit(exc.detail)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
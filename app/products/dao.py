@@ -1,7 +1,91 @@
-from sqlalchemy import select
+import re
+import time
+from decimal import Decimal
+from typing import AsyncIterator, Iterable, Optional, Union
+import asyncpg
+from fastapi import HTTPException
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    and_,
+    any_,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, REGCLASS, insert as pg_insert
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.products.models import Product
-from app.products.schemas import ProductCreate, ProductUpdate
+from sqlalchemy.schema import CreateTable
+from app import bus
+from app.cache import TTLCache
+from app.config import settings
+from app.orders.models import Order, OrderItem
+from app.products.importer import IMPORT_COLUMNS, ndjson_to_csv, split_csv_header
+from app.products.models import Product, ProductStockShard
+from app.products.schemas import ProductCreate, ProductPatch, ProductUpdate
+
+shard_total = (
+    select(func.coalesce(func.sum(ProductStockShard.available), 0))
+    .where(ProductStockShard.product_id == Product.id)
+    .scalar_subquery()
+)
+
+# The columns of a product as reported to clients, with the stock of sharded
+# products summed up from their shards.
+product_columns = (
+    Product.id,
+    Product.name,
+    Product.description,
+    Product.price,
+    case((Product.stock_shards > 1, shard_total), else_=Product.available).label(
+        "available"
+    ),
+    Product.stock_shards,
+)
+product_fields = {column.key: column for column in product_columns}
+
+
+def _columns(fields: Optional[tuple[str, ...]]) -> tuple:
+    """Select the product columns among `fields`, or all of them."""
+    if fields is None:
+        return product_columns
+    return tuple(product_fields[name] for name in fields)
+
+
+# While the bus is down, the caches could miss the writes of the other workers.
+product_cache = TTLCache(
+    settings.PRODUCT_CACHE_SIZE, settings.PRODUCT_CACHE_TTL, enabled=bus.synced
+)
+product_page_cache = TTLCache(
+    settings.PRODUCT_PAGE_CACHE_SIZE, settings.PRODUCT_CACHE_TTL, enabled=bus.synced
+)
+
+# Staging table for imports; `line` keeps the upload order so that the last
+# row wins when the same id appears more than once.
+product_import = Table(
+    "product_import",
+    MetaData(),
+    Column("line", Integer, primary_key=True),
+    Column("id", Integer),
+    Column("name", String(100)),
+    Column("description", String(255)),
+    Column("price", Numeric(10, 2)),
+    Column("available", Integer),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
 
 
 class ProductDAO:
@@ -22,63 +106,288 @@ class ProductDAO:
             description=product_data.description,
             price=product_data.price,
             available=product_data.available,
+            stock_shards=product_data.stock_shards,
         )
         db.add(new_product)
+        if product_data.stock_shards > 1:
+            await db.flush()
+            await ProductDAO._set_stock(
+                db, new_product.id, product_data.available, product_data.stock_shards
+            )
+            await bus.publish(db, products=[])
+            await db.commit()
+            ProductDAO.invalidate([])
+            return await ProductDAO.get_product_by_id(db, new_product.id)
+        await bus.publish(db, products=[])
         await db.commit()
+        ProductDAO.invalidate([])
         await db.refresh(new_product)
         return new_product
 
     @staticmethod
-    async def get_all_products(db: AsyncSession):
+    async def get_products_page(
+        db: AsyncSession,
+        limit: int,
+        after_id: Optional[int] = None,
+        in_stock: bool = False,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        name_prefix: Optional[str] = None,
+        version: Optional[int] = None,
+        fields: Optional[tuple[str, ...]] = None,
+    ):
         """
-        Get all products.
+        Get one page of products ordered by id (keyset pagination).
+
+        Pages are cached per `version`, so that a page read under a newer
+        version of the products table is never served from an older entry,
+        even before the invalidation event of another worker arrives.
 
         Args:
             db (AsyncSession): The database session.
+            limit (int): The maximum number of products on the page.
+            after_id (Optional[int]): Only return products with a greater id.
+            in_stock (bool): Only return products that are available.
+            min_price (Optional[Decimal]): The lowest price to include.
+            max_price (Optional[Decimal]): The highest price to include.
+            name_prefix (Optional[str]): Only return products whose name starts with it.
+            version (Optional[int]): The version of the products table read
+                before the page, see `bus.get_version`.
+            fields (Optional[tuple[str, ...]]): Only load these columns; they
+                must include `id`.
 
         Returns:
-            List[Product]: A list of all products.
+            tuple[List[Row], bool]: The products on the page and whether more follow.
         """
+        key = (
+            version,
+            limit,
+            after_id,
+            in_stock,
+            min_price,
+            max_price,
+            name_prefix,
+            fields,
+        )
+        page = product_page_cache.get(key)
+        if page is not None:
+            return page
+        generation = product_page_cache.generation
+
+        query = select(*_columns(fields)).order_by(Product.id).limit(limit + 1)
+        if after_id is not None:
+            query = query.where(Product.id > after_id)
+        if in_stock:
+            query = query.where(
+                or_(
+                    Product.available > 0,
+                    and_(Product.stock_shards > 1, shard_total > 0),
+                )
+            )
+        if min_price is not None:
+            query = query.where(Product.price >= min_price)
+        if max_price is not None:
+            query = query.where(Product.price <= max_price)
+        if name_prefix:
+            escaped = re.sub(r"([/%_])", r"/\1", name_prefix)
+            query = query.where(Product.name.like(f"{escaped}%", escape="/"))
 
-        result = await db.execute(select(Product))
-        return result.scalars().all()
+        result = await db.execute(query)
+        products = result.all()
+        page = products[:limit], len(products) > limit
+        product_page_cache.set(key, page, generation)
+        return page
 
     @staticmethod
-    async def get_product_by_id(db: AsyncSession, id: int):
+    async def get_product_by_id(
+        db: AsyncSession, id: int, fields: Optional[tuple[str, ...]] = None
+    ):
         """
         Get a product by id.
 
         Args:
             db (AsyncSession): The database session.
             id (int): The product id.
+            fields (Optional[tuple[str, ...]]): Only load these columns, unless
+                the whole product is cached already.
 
         Returns:
-            Product: The product if found, otherwise None.
+            Row: The product if found, otherwise None.
         """
 
-        return await db.get(Product, id)
+        product = product_cache.get(id)
+        if product is None:
+            generation = product_cache.generation
+            result = await db.execute(select(*_columns(fields)).where(Product.id == id))
+            product = result.first()
+            # A lagging replica could put back a row that was just invalidated.
+            if product is not None and fields is None and not db.info.get("replica"):
+                product_cache.set(id, product, generation)
+        return product
 
     @staticmethod
-    async def update_product(db: AsyncSession, id: int, product_update: ProductUpdate):
+    async def get_products_by_ids(
+        db: AsyncSession, ids: list[int], fields: Optional[tuple[str, ...]] = None
+    ):
+        """
+        Get many products by id with at most one query.
+
+        Cached products are taken from the cache; the rest are loaded with
+        one `WHERE id = ANY(...)` query.
+
+        Args:
+            db (AsyncSession): The database session.
+            ids (list[int]): The product ids.
+            fields (Optional[tuple[str, ...]]): Only load these columns; they
+                must include `id`.
+
+        Returns:
+            tuple[List[Row], List[int]]: The products found, in the order of
+            `ids` and without repeats, and the ids that were not found.
+        """
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        for id in ids:
+            product = product_cache.get(id)
+            if product is not None:
+                found[id] = product
+        wanted = [id for id in ids if id not in found]
+        if wanted:
+            generation = product_cache.generation
+            result = await db.execute(
+                select(*_columns(fields)).where(
+                    Product.id == any_(literal(wanted, ARRAY(Integer)))
+                )
+            )
+            for product in result:
+                found[product.id] = product
+                if fields is None and not db.info.get("replica"):
+                    product_cache.set(product.id, product, generation)
+        return (
+            [found[id] for id in ids if id in found],
+            [id for id in ids if id not in found],
+        )
+
+    @staticmethod
+    async def update_product(
+        db: AsyncSession, id: int, product_update: Union[ProductUpdate, ProductPatch]
+    ):
         """
         Update a product by id.
 
+        Only the fields set in `product_update` are written, with one
+        UPDATE ... RETURNING statement. Changing `stock_shards`, or the stock
+        of a sharded product, then also moves the stock between the product
+        row and its shards; `available` always sets the total stock.
+
         Args:
             db (AsyncSession): The database session.
             id (int): The product id.
-            product_update (ProductUpdate): The product data to update the product with.
+            product_update (Union[ProductUpdate, ProductPatch]): The product data
+                to update the product with.
 
         Returns:
-            Product: The updated product if found, otherwise None.
+            Row: The updated product if found, otherwise None.
         """
-        product = await db.get(Product, id)
-        if not product:
+        values = product_update.model_dump(exclude_unset=True)
+        available = values.pop("available", None)
+        shards = values.pop("stock_shards", None)
+        if not values and available is None and shards is None:
+            # Nothing to change: no write, so caches and ETags stay valid.
+            return await ProductDAO.get_product_by_id(db, id)
+        if available is not None:
+            # The stock of a sharded product is rewritten below instead.
+            values["available"] = case(
+                (Product.stock_shards == 1, available), else_=Product.available
+            )
+        if not values:
+            # Leaves the row as it is, but still locks and returns it.
+            values["stock_shards"] = Product.stock_shards
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == id)
+            .values(**values)
+            .returning(*product_columns)
+        )
+        product = result.first()
+        if product is None:
+            await db.rollback()
             return None
-        for field, value in product_update.model_dump(exclude_unset=True).items():
-            setattr(product, field, value)
+
+        if shards is None:
+            shards = product.stock_shards
+        if shards == product.stock_shards and (shards == 1 or available is None):
+            await bus.publish(db, products=[id])
+            await db.commit()
+            ProductDAO.invalidate([id])
+            return product
+
+        if available is None:
+            available = product.available
+            if product.stock_shards > 1:
+                stock = await db.execute(
+                    select(ProductStockShard.available)
+                    .where(ProductStockShard.product_id == id)
+                    .with_for_update(key_share=True)
+                )
+                available = sum(stock.scalars())
+        await ProductDAO._set_stock(db, id, available, shards)
+        await bus.publish(db, products=[id])
         await db.commit()
-        await db.refresh(product)
-        return product
+        ProductDAO.invalidate([id])
+        return await ProductDAO.get_product_by_id(db, id)
+
+    @staticmethod
+    def invalidate(ids: Optional[Iterable[int]] = None):
+        """
+        Drop cached products after they were written.
+
+        Cached listing pages are always dropped, since any write can change them.
+
+        Args:
+            ids (Optional[Iterable[int]]): The ids of the written products, or
+                None to drop every cached product.
+        """
+        if ids is None:
+            product_cache.clear()
+        else:
+            for id in ids:
+                product_cache.pop(id)
+        product_page_cache.clear()
+
+    @staticmethod
+    async def _set_stock(db: AsyncSession, id: int, available: int, shards: int):
+        """
+        Store the stock of a product, spread evenly over `shards` shard rows.
+
+        Args:
+            db (AsyncSession): The database session.
+            id (int): The product id.
+            available (int): The total stock of the product.
+            shards (int): The number of shards, 1 to keep the stock on the product row.
+        """
+        await db.execute(
+            delete(ProductStockShard).where(ProductStockShard.product_id == id)
+        )
+        if shards > 1:
+            per_shard, extra = divmod(available, shards)
+            await db.execute(
+                insert(ProductStockShard),
+                [
+                    {
+                        "product_id": id,
+                        "shard": shard,
+                        "available": per_shard + (shard < extra),
+                    }
+                    for shard in range(shards)
+                ],
+            )
+            available = 0
+        await db.execute(
+            update(Product)
+            .where(Product.id == id)
+            .values(available=available, stock_shards=shards)
+        )
 
     @staticmethod
     async def delete_product(db: AsyncSession, id: int):
@@ -93,9 +402,169 @@ class ProductDAO:
             bool: True if the product was found and deleted, otherwise None.
         """
 
-        product = await db.get(Product, id)
-        if not product:
-            return None
-        await db.delete(product)
+        return True if await ProductDAO.delete_products(db, [id]) else None
+
+    @staticmethod
+    async def delete_products(db: AsyncSession, ids: list[int]):
+        """
+        Delete many products by id with one statement.
+
+        Their order items and stock shards are removed by the database through
+        ON DELETE CASCADE and never loaded. The orders that lose items get
+        their version bumped in the same statement.
+
+        Args:
+            db (AsyncSession): The database session.
+            ids (list[int]): The product ids.
+
+        Returns:
+            list[int]: The ids of the products that were found and deleted.
+        """
+        deleted = (
+            delete(Product)
+            .where(Product.id == any_(literal(sorted(set(ids)), ARRAY(Integer))))
+            .returning(Product.id)
+            .cte("deleted")
+        )
+        # Every part of the statement sees the order items as they were before it.
+        touched = (
+            update(Order)
+            .where(
+                Order.id.in_(
+                    select(OrderItem.order_id).where(
+                        OrderItem.product_id.in_(select(deleted.c.id))
+                    )
+                )
+            )
+            .values(version=Order.version + 1)
+            .returning(Order.id)
+            .cte("touched")
+        )
+        result = await db.execute(
+            select(
+                select(func.array_agg(deleted.c.id)).scalar_subquery(),
+                select(func.array_agg(touched.c.id)).scalar_subquery(),
+            )
+        )
+        deleted_ids, order_ids = result.one()
+        if not deleted_ids:
+            await db.rollback()
+            return []
+        await bus.publish(db, products=deleted_ids, orders=order_ids or [])
+        await db.commit()
+        ProductDAO.invalidate(deleted_ids)
+        return sorted(deleted_ids)
+
+    @staticmethod
+    async def import_products(
+        db: AsyncSession, chunks: AsyncIterator[bytes], format: str
+    ):
+        """
+        Insert or update products from a streamed CSV or NDJSON upload.
+
+        The upload is copied into a temporary staging table with the COPY
+        protocol as it arrives, then upserted into products by id with one
+        statement. Rows without an id are inserted as new products. The stock
+        of sharded products is left untouched.
+
+        Args:
+            db (AsyncSession): The database session.
+            chunks (AsyncIterator[bytes]): The raw upload.
+            format (str): Either "csv" (with a header line) or "ndjson".
+
+        Returns:
+            dict: The number of rows read, inserted and updated, and the seconds taken.
+
+        Raises:
+            HTTPException: If the upload is malformed.
+        """
+        started = time.perf_counter()
+        await db.execute(CreateTable(product_import))
+        connection = await (await db.connection()).get_raw_connection()
+        try:
+            if format == "csv":
+                columns, records = await split_csv_header(chunks)
+            else:
+                columns, records = list(IMPORT_COLUMNS), ndjson_to_csv(chunks)
+            status = await connection.driver_connection.copy_to_table(
+                product_import.name,
+                source=records,
+                columns=columns,
+                format="csv",
+                force_null=["id"] if "id" in columns else None,
+            )
+
+            latest = (
+                select(product_import)
+                .distinct(func.coalesce(product_import.c.id, -product_import.c.line))
+                .order_by(
+                    func.coalesce(product_import.c.id, -product_import.c.line),
+                    product_import.c.line.desc(),
+                )
+                .subquery()
+            )
+            sequence = cast(func.pg_get_serial_sequence("products", "id"), REGCLASS)
+            # Move the sequence past every explicit id first, so the ids it
+            # hands out below can't collide with them or with existing rows.
+            await db.execute(
+                select(
+                    func.setval(
+                        sequence,
+                        func.greatest(
+                            select(func.max(product_import.c.id)).scalar_subquery(),
+                            select(func.max(Product.id)).scalar_subquery(),
+                            func.pg_sequence_last_value(sequence),
+                        ),
+                    )
+                )
+            )
+            upsert = pg_insert(Product).from_select(
+                list(IMPORT_COLUMNS),
+                select(
+                    func.coalesce(latest.c.id, func.nextval(sequence)),
+                    latest.c.name,
+                    latest.c.description,
+                    latest.c.price,
+                    latest.c.available,
+                ),
+            )
+            upserted = (
+                upsert.on_conflict_do_update(
+                    index_elements=[Product.id],
+                    set_={
+                        "name": upsert.excluded.name,
+                        "description": upsert.excluded.description,
+                        "price": upsert.excluded.price,
+                        "available": case(
+                            (Product.stock_shards > 1, Product.available),
+                            else_=upsert.excluded.available,
+                        ),
+                    },
+                )
+                .returning(literal_column("xmax = 0").label("inserted"))
+                .cte("upserted")
+            )
+            inserted, updated = (
+                await db.execute(
+                    select(
+                        func.count().filter(upserted.c.inserted),
+                        func.count().filter(~upserted.c.inserted),
+                    )
+                )
+            ).one()
+        except (ValueError, asyncpg.PostgresError, DBAPIError) as exc:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail=f"Invalid import: {exc}")
+        await bus.publish(db, products=None)
         await db.commit()
-        return True
+        ProductDAO.invalidate()
+
+        return {
+            "rows": int(status.split()[-1]),
+            "inserted": inserted,
+            "updated": updated,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+
+bus.subscribe("products", ProductDAO.invalidate)
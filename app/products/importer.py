@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from typing import AsyncIterator
+
+IMPORT_COLUMNS = ("id", "name", "description", "price", "available")
+REQUIRED_COLUMNS = {"name", "description", "price", "available"}
+
+
+async def split_csv_header(
+    chunks: AsyncIterator[bytes],
+) -> tuple[list[str], AsyncIterator[bytes]]:
+    """
+    Read the header line of a streamed CSV upload.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The raw upload.
+
+    Returns:
+        tuple[list[str], AsyncIterator[bytes]]: The column names and the rest of
+        the upload, starting right after the header line.
+
+    Raises:
+        ValueError: If the header is missing or names unknown columns.
+    """
+    chunks = chunks.__aiter__()
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" in buffer:
+            break
+    header, _, rest = buffer.partition(b"\n")
+    columns = [column.strip() for column in header.decode().strip().split(",")]
+    _check_columns(columns)
+
+    async def body():
+        if rest:
+            yield rest
+        async for chunk in chunks:
+            yield chunk
+
+    return columns, body()
+
+
+async def ndjson_to_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Convert a streamed NDJSON upload to CSV records in IMPORT_COLUMNS order.
+
+    Only the last incomplete line of the upload is buffered.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The raw upload, one product object per line.
+
+    Yields:
+        bytes: CSV records for the complete lines received so far.
+
+    Raises:
+        ValueError: If a line is not a JSON object with the expected keys, or
+        has a null value other than the id.
+    """
+    buffer = b""
+    number = 1
+    async for chunk in chunks:
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        if lines:
+            yield _csv_records(lines, number)
+            number += len(lines)
+    if buffer.strip():
+        yield _csv_records([buffer], number)
+
+
+def _csv_records(lines: list[bytes], number: int) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output, quoting=csv.QUOTE_NONNUMERIC)
+    for number, line in enumerate(lines, number):
+        if not line.strip():
+            continue
+        try:
+            product = json.loads(line, parse_float=Decimal)
+        except ValueError as exc:
+            raise ValueError(f"Line {number}: {exc}") from None
+        if not isinstance(product, dict):
+            raise ValueError(f"Line {number}: expected a JSON object")
+        _check_columns(product)
+        # A quoted empty field would be read as an empty string, not NULL.
+        nulls = sorted(column for column in REQUIRED_COLUMNS if product[column] is None)
+        if nulls:
+            raise ValueError(f"Line {number}: {', '.join(nulls)} must not be null")
+        writer.writerow([product.get(column) for column in IMPORT_COLUMNS])
+    return output.getvalue().encode()
+
+
+def _check_columns(columns):
+    unknown = set(columns) - set(IMPORT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    missing = REQUIRED_COLUMNS - set(columns)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
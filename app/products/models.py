@@ -1,21 +1,55 @@
 from decimal import Decimal
 from app.database import Base
 from sqlalchemy.orm import relationship, mapped_column, Mapped
-from sqlalchemy import Integer, Numeric, String
+from sqlalchemy import ForeignKey, Index, Integer, Numeric, String, text
 
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index(
+            "ix_products_in_stock",
+            "id",
+            postgresql_where=text("available > 0 OR stock_shards > 1"),
+        ),
+        Index("ix_products_price", "price"),
+        Index(
+            "ix_products_name_pattern",
+            "name",
+            postgresql_ops={"name": "varchar_pattern_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(100))
     description: Mapped[str] = mapped_column(String(255))
     price: Mapped[Decimal] = mapped_column(Numeric(10, 2))
     available: Mapped[int] = mapped_column(Integer)
+    stock_shards: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
 
     order_items: Mapped[list["OrderItem"]] = relationship(
-        "OrderItem", back_populates="product", cascade="all, delete-orphan"
+        "OrderItem",
+        back_populates="product",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+
+class ProductStockShard(Base):
+    """
+    One slice of the stock of a product with `stock_shards` > 1.
+
+    The stock of a sharded product lives entirely in its shard rows and
+    `Product.available` stays 0, so checkouts never lock the product row.
+    """
+
+    __tablename__ = "product_stock_shards"
+
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
     )
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True)
+    available: Mapped[int] = mapped_column(Integer)
 
 
 from app.orders.models import OrderItem
@@ -1,11 +1,31 @@
-from fastapi import APIRouter, HTTPException
-from app.database import get_db
+from decimal import Decimal
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from app import bus
+from app.config import settings
+from app.metrics import TimedRoute
+from app.database import get_db, get_read_db
+from app.etag import is_not_modified, make_etag
+from app.fields import parse_fields, sparse_model, with_items
+from app.pagination import decode_cursor, encode_cursor
+from app.serialization import FastJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, status
-from app.products.schemas import ProductCreate, ProductResponse, ProductUpdate
+from app.products.schemas import (
+    ProductBulkDeleteResult,
+    ProductCreate,
+    ProductImportResult,
+    ProductLookupResult,
+    ProductPage,
+    ProductPatch,
+    ProductResponse,
+    ProductUpdate,
+)
 from app.products.dao import ProductDAO
 
-router = APIRouter(prefix="/products", tags=["Products"])
+router = APIRouter(prefix="/products", tags=["Products"], route_class=TimedRoute)
+
+IMPORT_FORMATS = {"text/csv": "csv", "application/x-ndjson": "ndjson"}
 
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
@@ -26,36 +46,197 @@ async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_
     return new_product
 
 
-@router.get("/", response_model=list[ProductResponse])
-async def get_products(db: AsyncSession = Depends(get_db)):
+@router.post("/import", response_model=ProductImportResult)
+async def import_products(request: Request, db: AsyncSession = Depends(get_db)):
     """
-    Get all products.
+    Insert or update many products from a CSV or NDJSON request body.
+
+    The body is streamed into the database with the COPY protocol and never
+    held in memory as a whole. CSV bodies need a header line; the columns are
+    `id` (optional, rows with an existing id are updated), `name`,
+    `description`, `price` and `available`.
 
     Returns:
-        list[ProductResponse]: A list of all products.
+        ProductImportResult: The number of rows read, inserted and updated,
+        and the seconds taken.
+
+    Raises:
+        HTTPException: If the content type is not supported or the body is malformed.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=415, detail="Expected text/csv or application/x-ndjson"
+        )
+    return await ProductDAO.import_products(
+        db, request.stream(), IMPORT_FORMATS[content_type]
+    )
+
+
+@router.post("/bulk-delete", response_model=ProductBulkDeleteResult)
+async def delete_products(ids: list[int], db: AsyncSession = Depends(get_db)):
+    """
+    Delete many products at once.
+
+    All of them are removed with one statement, together with their order
+    items and stock shards.
+
+    Args:
+        ids (list[int]): The product ids.
+
+    Returns:
+        ProductBulkDeleteResult: The ids that were deleted and the ids that
+        were not found.
+
+    Raises:
+        HTTPException: If there are more ids than BULK_DELETE_MAX_SIZE.
     """
-    products = await ProductDAO.get_all_products(db)
-    return products
+    if len(ids) > settings.BULK_DELETE_MAX_SIZE:
+        raise HTTPException(status_code=413, detail="Too many ids to delete")
+    deleted = await ProductDAO.delete_products(db, ids)
+    return ProductBulkDeleteResult(
+        deleted=deleted, missing=sorted(set(ids).difference(deleted))
+    )
+
+
+@router.get("/", response_model=ProductPage)
+async def get_products(
+    request: Request,
+    response: Response,
+    limit: int = Query(
+        settings.PRODUCTS_PAGE_DEFAULT_LIMIT, ge=1, le=settings.PRODUCTS_PAGE_MAX_LIMIT
+    ),
+    after: Optional[str] = None,
+    in_stock: bool = False,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    name_prefix: Optional[str] = Query(None, min_length=1, max_length=100),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Get a page of products ordered by id.
+
+    The response carries an ETag built from the change counter of the
+    products table. If it matches If-None-Match, 304 is returned without
+    loading any product. With FAST_JSON enabled, the rows are encoded with
+    orjson instead of being validated against ProductResponse one by one.
+
+    Args:
+        limit (int): The maximum number of products on the page.
+        after (Optional[str]): The `next_cursor` of the previous page.
+        in_stock (bool): Only return products that are available.
+        min_price (Optional[Decimal]): The lowest price to include.
+        max_price (Optional[Decimal]): The highest price to include.
+        name_prefix (Optional[str]): Only return products whose name starts with it.
+        fields (Optional[str]): Comma-separated fields to return; `id` is
+            always included.
+
+    Returns:
+        ProductPage: The products on the page and the cursor of the next page, if any.
+
+    Raises:
+        HTTPException: If the cursor or the fields are malformed.
+    """
+    selected = parse_fields(fields, ProductResponse)
+    version = await bus.get_version(db, "products")
+    etag = make_etag("products", version)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    products, has_more = await ProductDAO.get_products_page(
+        db,
+        limit,
+        version=version,
+        after_id=decode_cursor(after),
+        in_stock=in_stock,
+        min_price=min_price,
+        max_price=max_price,
+        name_prefix=name_prefix,
+        fields=selected,
+    )
+    next_cursor = encode_cursor(products[-1].id) if has_more else None
+    if selected is not None:
+        page = with_items(ProductPage, sparse_model(ProductResponse, selected))
+        return Response(
+            page(items=products, next_cursor=next_cursor).model_dump_json(),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+    if settings.FAST_JSON:
+        return FastJSONResponse(
+            {"items": products, "next_cursor": next_cursor},
+            headers={"ETag": etag},
+        )
+    return ProductPage(items=products, next_cursor=next_cursor)
+
+
+@router.post("/lookup", response_model=ProductLookupResult)
+async def lookup_products(
+    ids: list[int], fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get many products by id with one request.
+
+    Args:
+        ids (list[int]): The product ids.
+        fields (Optional[str]): Comma-separated fields to return; `id` is
+            always included.
+
+    Returns:
+        ProductLookupResult: The products found, in the requested order, and
+        the ids that were not found.
+
+    Raises:
+        HTTPException: If there are more ids than LOOKUP_MAX_IDS, or the
+        fields are malformed.
+    """
+    if len(ids) > settings.LOOKUP_MAX_IDS:
+        raise HTTPException(status_code=413, detail="Too many ids to look up")
+    selected = parse_fields(fields, ProductResponse)
+    products, missing = await ProductDAO.get_products_by_ids(db, ids, selected)
+    if selected is not None:
+        result = with_items(ProductLookupResult, sparse_model(ProductResponse, selected))
+        return Response(
+            result(items=products, missing=missing).model_dump_json(),
+            media_type="application/json",
+        )
+    if settings.FAST_JSON:
+        return FastJSONResponse({"items": products, "missing": missing})
+    return ProductLookupResult(items=products, missing=missing)
 
 
 @router.get("/{id}", response_model=ProductResponse)
-async def get_product(id: int, db: AsyncSession = Depends(get_db)):
+async def get_product(
+    id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)
+):
     """
     Get a product by id.
 
     Args:
         id (int): The product id.
+        fields (Optional[str]): Comma-separated fields to return; `id` is
+            always included.
 
     Returns:
         ProductResponse: The product if found, otherwise raises a 404 HTTPException.
 
     Raises:
-        HTTPException: If the product is not found.
+        HTTPException: If the product is not found or the fields are malformed.
     """
 
-    product = await ProductDAO.get_product_by_id(db, id)
+    selected = parse_fields(fields, ProductResponse)
+    product = await ProductDAO.get_product_by_id(db, id, selected)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    if selected is not None:
+        return Response(
+            sparse_model(ProductResponse, selected)
+            .model_validate(product)
+            .model_dump_json(),
+            media_type="application/json",
+        )
     return product
 
 
@@ -82,6 +263,29 @@ async def update_product(
     return product
 
 
+@router.patch("/{id}", response_model=ProductResponse)
+async def patch_product(
+    id: int, product_patch: ProductPatch, db: AsyncSession = Depends(get_db)
+):
+    """
+    Update only the given fields of a product by id.
+
+    Args:
+        id (int): The product id.
+        product_patch (ProductPatch): The fields to change; omitted ones are kept.
+
+    Returns:
+        ProductResponse: The updated product.
+
+    Raises:
+        HTTPException: If the product is not found.
+    """
+    product = await ProductDAO.update_product(db, id, product_patch)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_product(id: int, db: AsyncSession = Depends(get_db)):
     """
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from decimal import Decimal
+from typing import Optional
+from app.config import settings
 
 
 class ProductSchema(BaseModel):
@@ -17,6 +19,7 @@ class ProductCreate(BaseModel):
     description: str
     price: Decimal
     available: int
+    stock_shards: int = Field(1, ge=1, le=settings.PRODUCT_MAX_STOCK_SHARDS)
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -26,15 +29,57 @@ class ProductUpdate(BaseModel):
     description: str
     price: Decimal
     available: int
+    stock_shards: int = Field(1, ge=1, le=settings.PRODUCT_MAX_STOCK_SHARDS)
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class ProductPatch(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[Decimal] = None
+    available: Optional[int] = None
+    stock_shards: Optional[int] = Field(None, ge=1, le=settings.PRODUCT_MAX_STOCK_SHARDS)
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("*")
+    @classmethod
+    def not_null(cls, value):
+        # Omitted fields are left unchanged; none of them may be cleared.
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+
 class ProductResponse(BaseModel):
     id: int
     name: str
     description: str
     price: Decimal
     available: int
+    stock_shards: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class ProductPage(BaseModel):
+    items: list[ProductResponse]
+    next_cursor: Optional[str] = None
+
+
+class ProductLookupResult(BaseModel):
+    items: list[ProductResponse]
+    missing: list[int]
+
+
+class ProductImportResult(BaseModel):
+    rows: int
+    inserted: int
+    updated: int
+    seconds: float
+
+
+class ProductBulkDeleteResult(BaseModel):
+    deleted: list[int]
+    missing: list[int]
@@ -0,0 +1,211 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+from app.config import settings
+
+FORMATS = ("pstats", "collapsed")
+# The number of functions listed in the text report of a pstats profile.
+REPORT_LINES = 60
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread from a background thread.
+
+    Unlike cProfile it does not slow down the calls of the sampled thread,
+    and it records whole stacks, in the collapsed format that flame graph
+    tools read.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def enable(self):
+        self._thread.start()
+
+    def disable(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """
+        Get the samples in the collapsed stack format.
+
+        Returns:
+            str: One `outermost;...;innermost count` line per distinct stack.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    """
+    The profile of one request, taken with cProfile or the stack sampler.
+
+    Both only see the thread of the event loop, so the calls of requests
+    served at the same time show up in it too.
+    """
+
+    def __init__(self, format: str):
+        self.format = format
+        if format == "pstats":
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = StackSampler(
+                threading.get_ident(), settings.PROFILING_SAMPLER_INTERVAL
+            )
+
+    def report(self) -> str:
+        """
+        Get the profile as text.
+
+        Returns:
+            str: The functions with the most cumulative time for pstats, the
+            collapsed stacks otherwise.
+        """
+        if self.format == "collapsed":
+            return self.profiler.collapsed()
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+        return stream.getvalue()
+
+    def save(self, scope) -> Path:
+        """
+        Store the profile in PROFILING_DIR.
+
+        Args:
+            scope: The ASGI scope of the profiled request, used to name the file.
+
+        Returns:
+            Path: The written file, a `.prof` file that `pstats` loads, or a
+            `.collapsed` file.
+        """
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        route = scope.get("route")
+        path = route.path if route is not None else scope["path"]
+        name = "-".join(
+            (
+                str(time.time_ns() // 1000),
+                str(os.getpid()),
+                scope["method"],
+                re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root",
+            )
+        )
+        if self.format == "pstats":
+            file = directory / f"{name}.prof"
+            self.profiler.dump_stats(file)
+        else:
+            file = directory / f"{name}.collapsed"
+            file.write_text(self.profiler.collapsed())
+        return file
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that profiles single requests.
+
+    A request whose X-Profile header holds PROFILING_SECRET is answered with
+    its profile instead of its response; X-Profile-Format picks `pstats` or
+    `collapsed`. Besides, PROFILING_SAMPLE_RATE of the other requests are
+    profiled in the background and stored in PROFILING_DIR. One request is
+    profiled at a time.
+    """
+
+    active = False
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        secret = headers.get("x-profile")
+        if secret is not None and settings.PROFILING_SECRET and hmac.compare_digest(
+            secret.encode(), settings.PROFILING_SECRET.encode()
+        ):
+            await self._profile(scope, receive, send, headers)
+        elif (
+            settings.PROFILING_DIR
+            and not ProfilingMiddleware.active
+            and random.random() < settings.PROFILING_SAMPLE_RATE
+        ):
+            await self._sample(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _run(self, profile: Profile, scope, receive, send):
+        ProfilingMiddleware.active = True
+        profile.profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.profiler.disable()
+            ProfilingMiddleware.active = False
+
+    async def _profile(self, scope, receive, send, headers: Headers):
+        format = headers.get("x-profile-format", settings.PROFILING_FORMAT)
+        response: Optional[PlainTextResponse] = None
+        if format not in FORMATS:
+            response = PlainTextResponse(
+                "X-Profile-Format must be pstats or collapsed", 400
+            )
+        elif ProfilingMiddleware.active:
+            response = PlainTextResponse("Another request is being profiled", 409)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        status = 500
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profile = Profile(format)
+        await self._run(profile, scope, receive, discard)
+        headers = {"X-Profiled-Status": str(status)}
+        if settings.PROFILING_DIR:
+            file = await asyncio.to_thread(profile.save, scope)
+            headers["X-Profile-File"] = file.name
+        await PlainTextResponse(profile.report(), headers=headers)(scope, receive, send)
+
+    async def _sample(self, scope, receive, send):
+        profile = Profile(settings.PROFILING_FORMAT)
+        try:
+            await self._run(profile, scope, receive, send)
+        finally:
+            await asyncio.to_thread(profile.save, scope)
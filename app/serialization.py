@@ -0,0 +1,44 @@
+from decimal import Decimal
+import orjson
+from fastapi.responses import Response
+
+
+def _default(value):
+    # Pydantic writes Decimal fields as JSON strings, e.g. "10.00".
+    if isinstance(value, Decimal):
+        return str(value)
+    # Named tuples and SQLAlchemy rows become objects keyed by their fields.
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """
+    Encode plain dicts, lists and scalars to JSON with orjson.
+
+    The output matches the one of the Pydantic response models: Decimal
+    becomes a string, datetime an ISO 8601 string, and named tuples and
+    rows an object.
+
+    Args:
+        content: The data to encode, already shaped like the response model.
+
+    Returns:
+        bytes: The encoded JSON.
+    """
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(Response):
+    """
+    A JSON response rendered with orjson from plain data.
+
+    Returning it from a route skips the validation against the response
+    model, so the content must already have the shape of that model.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,237 @@
+import asyncio
+import datetime
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app import metrics
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Plans are captured in a read-only transaction that is rolled back, and
+# given up after this long.
+EXPLAIN_TIMEOUT_MS = 30000
+# Only these are run again by EXPLAIN ANALYZE; other statements get the plan
+# without being executed, so that nothing is written or locked twice.
+ANALYZABLE = re.compile(
+    r"^\s*SELECT\b(?!.*\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE|KEY\s+SHARE)\b)", re.I | re.S
+)
+# Everything in an analyzable SELECT that may be followed by parentheses: SQL
+# keywords and functions without side effects. A call of anything else, such
+# as setval(), nextval() or pg_notify(), keeps the statement from running.
+READ_ONLY_CALLS = frozenset(
+    """
+    all and any array array_agg as avg between case cast coalesce count else
+    exists filter from greatest in join lateral least like lower max min not
+    nullif on or over select sum then unnest upper using values when where with
+    """.split()
+)
+
+
+def analyzable(statement: str) -> bool:
+    """
+    Tell whether a statement may be run again by EXPLAIN ANALYZE.
+
+    Args:
+        statement (str): The SQL statement.
+
+    Returns:
+        bool: True for a SELECT that locks no rows and calls only functions
+        without side effects.
+    """
+    if not ANALYZABLE.match(statement):
+        return False
+    calls = re.findall(r"(\w+)\s*\(", re.sub(r"'(?:[^']|'')*'", "''", statement))
+    return all(name.lower() in READ_ONLY_CALLS for name in calls)
+
+
+entries: deque = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+# The plans of the statements seen most recently, as many as there are entries.
+plans: OrderedDict[str, Optional[str]] = OrderedDict()
+_explaining: set[asyncio.Task] = set()
+
+
+def normalize(statement: str) -> str:
+    """
+    Reduce a statement to its shape, so that runs with other parameters match.
+
+    Args:
+        statement (str): The SQL statement as sent to the driver.
+
+    Returns:
+        str: The statement with its whitespace collapsed and each run of
+        placeholders, such as an expanded IN list, replaced by one `?`.
+    """
+    statement = re.sub(r"\s+", " ", statement).strip()
+    return re.sub(r"\$\d+(?:\s*,\s*\$\d+)*", "?", statement)
+
+
+def redact(value: Any) -> Any:
+    """
+    Replace a bound parameter with its type, so that no data reaches the log.
+
+    Args:
+        value (Any): The parameter, or the tuple or list of parameters.
+
+    Returns:
+        Any: The redacted parameters; None stays None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, tuple):
+        return [redact(item) for item in value]
+    if isinstance(value, (list, dict, str, bytes)):
+        return f"<{type(value).__name__} of {len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def record(
+    statement: str, parameters: Any, seconds: float, route: Optional[str]
+) -> Optional[dict]:
+    """
+    Log a slow statement and keep it in the ring buffer.
+
+    Args:
+        statement (str): The SQL statement.
+        parameters (Any): Its bound parameters.
+        seconds (float): How long it ran.
+        route (Optional[str]): The route of the request that sent it.
+
+    Returns:
+        Optional[dict]: The entry, or None if its statement was seen before;
+        the plan of a new statement is still to be captured.
+    """
+    normalized = normalize(statement)
+    fingerprint = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+    parameters = redact(parameters)
+    logger.warning(
+        "Slow query (%.3f s) from %s: %s %s",
+        seconds,
+        route or "-",
+        normalized,
+        parameters,
+    )
+    entries.append(
+        {
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "seconds": round(seconds, 6),
+            "route": route,
+            "fingerprint": fingerprint,
+            "statement": normalized,
+            "parameters": parameters,
+        }
+    )
+    if fingerprint in plans:
+        plans.move_to_end(fingerprint)
+        return None
+    plans[fingerprint] = None
+    if len(plans) > settings.SLOW_QUERY_LOG_SIZE:
+        plans.popitem(last=False)
+    return entries[-1]
+
+
+async def explain(engine: AsyncEngine, fingerprint: str, statement: str, parameters: Any):
+    """
+    Capture the plan of a slow statement and keep it for its fingerprint.
+
+    With SLOW_QUERY_EXPLAIN_ANALYZE, an analyzable statement is run again
+    under EXPLAIN ANALYZE; if that fails, its plan is captured without it.
+
+    Args:
+        engine (AsyncEngine): The engine the statement ran on.
+        fingerprint (str): The fingerprint of the normalized statement.
+        statement (str): The SQL statement.
+        parameters (Any): Its bound parameters.
+    """
+    attempts = ["COSTS"]
+    if settings.SLOW_QUERY_EXPLAIN_ANALYZE and analyzable(statement):
+        attempts.insert(0, "ANALYZE, BUFFERS")
+    plan = "EXPLAIN failed"
+    for options in attempts:
+        try:
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(slow_query_log=False)
+                await conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+                await conn.exec_driver_sql(
+                    f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}"
+                )
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN ({options}) {statement}", parameters
+                )
+                plan = "\n".join(row[0] for row in result)
+                await conn.rollback()
+            break
+        except Exception:
+            logger.warning(
+                "Could not explain slow query %s with %s",
+                fingerprint,
+                options,
+                exc_info=True,
+            )
+    # Dropped meanwhile by newer statements; it is captured again when seen.
+    if fingerprint in plans:
+        plans[fingerprint] = plan
+
+
+def watch_engine(engine: AsyncEngine):
+    """
+    Record the statements of an engine that run longer than SLOW_QUERY_THRESHOLD.
+
+    Args:
+        engine (AsyncEngine): The engine to watch.
+    """
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - context._slow_query_started
+        # The statements that capture plans are not logged themselves.
+        if seconds < settings.SLOW_QUERY_THRESHOLD or not context.execution_options.get(
+            "slow_query_log", True
+        ):
+            return
+        request = metrics.current.get()
+        entry = record(
+            statement, parameters, seconds, request.route if request is not None else None
+        )
+        if entry is None or not settings.SLOW_QUERY_EXPLAIN or executemany:
+            return
+        if len(_explaining) >= settings.SLOW_QUERY_EXPLAIN_CONCURRENCY:
+            # No connection is spared now; explained when it is slow again.
+            plans.pop(entry["fingerprint"], None)
+        else:
+            task = asyncio.get_running_loop().create_task(
+                explain(engine, entry["fingerprint"], statement, parameters)
+            )
+            _explaining.add(task)
+            task.add_done_callback(_explaining.discard)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_execute)
+
+
+def report(limit: int) -> dict:
+    """
+    Get the latest slow statements of this worker.
+
+    Args:
+        limit (int): The most entries to return.
+
+    Returns:
+        dict: The entries, newest first, and the captured plans of their
+        statements by fingerprint; a plan is None while it is captured.
+    """
+    latest = list(entries)[::-1][:limit]
+    return {
+        "threshold": settings.SLOW_QUERY_THRESHOLD,
+        "entries": latest,
+        "plans": {
+            entry["fingerprint"]: plans.get(entry["fingerprint"]) for entry in latest
+        },
+    }
@@ -1,7 +1,9 @@
 import datetime
 import json
+from typing import Optional
+import pytest
 import pytest_asyncio
-from sqlalchemy import insert
+from sqlalchemy import event, insert
 from app.config import settings
 from app.database import Base, async_session_maker, engine
 from app.orders.models import Order, OrderItem
@@ -10,6 +12,12 @@ from httpx import ASGITransport, AsyncClient
 from main import app as fastapi_app
 
 
+def pytest_collection_modifyitems(items):
+    # The API tests build on the seed data and on each other (the product
+    # they create is ordered by id), so they run first, right after seeding.
+    items.sort(key=lambda item: item.path.name != "test_api.py")
+
+
 @pytest_asyncio.fixture(scope="session", autouse=True)
 async def prepare_database():
     assert settings.MODE == "TEST"
@@ -45,3 +53,87 @@ async def ac():
         transport=ASGITransport(app=fastapi_app), base_url="http://test/"
     ) as client:
         yield client
+
+
+@pytest.fixture
+def create_product(ac: AsyncClient):
+    """
+    Give tests a product factory, as in `await create_product(available=5)`.
+
+    The fields that are not given get placeholder values; the factory returns
+    the id of the new product.
+    """
+
+    async def create(**fields) -> int:
+        product = {
+            "name": "Product",
+            "description": "x",
+            "price": "1.00",
+            "available": 10,
+        }
+        response = await ac.post("/products/", json={**product, **fields})
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+
+    return create
+
+
+@pytest.fixture
+def create_order(ac: AsyncClient, create_product):
+    """
+    Give tests an order factory, as in `await create_order(product, quantity=2)`.
+
+    The order gets one item per given product, or a new product if none is
+    given; the factory returns the id of the new order.
+    """
+
+    async def create(*products: int, quantity: int = 1, status: str = "RECEIVED") -> int:
+        items = [
+            {"product_id": product, "quantity": quantity}
+            for product in products or [await create_product()]
+        ]
+        response = await ac.post("/orders/", json={"status": status, "items": items})
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+
+    return create
+
+
+@pytest.fixture
+def admin(monkeypatch) -> dict:
+    """Set ADMIN_SECRET and give tests the headers of an admin request."""
+    monkeypatch.setattr(settings, "ADMIN_SECRET", "admin-secret")
+    return {"Authorization": "Bearer admin-secret"}
+
+
+class Statements(list):
+    """
+    Records the SQL statements sent through the engine inside a `with` block.
+
+    With `budget`, the block fails when it sends more statements than that.
+    """
+
+    def __init__(self, budget: Optional[int] = None):
+        super().__init__()
+        self.budget = budget
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self.record)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        event.remove(engine.sync_engine, "before_cursor_execute", self.record)
+        if exc_type is None and self.budget is not None:
+            assert len(self) <= self.budget, (
+                f"{len(self)} statements sent, the budget is {self.budget}:\n"
+                + "\n".join(self)
+            )
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.append(statement)
+
+
+@pytest.fixture
+def statements():
+    """Give tests the `Statements` recorder, as in `with statements(3) as sent:`."""
+    return Statements
@@ -0,0 +1,26 @@
+from httpx import AsyncClient
+import pytest
+from app.config import settings
+
+ENDPOINTS = [
+    "/admin/cache",
+    "/admin/pool",
+    "/admin/replicas",
+    "/admin/slow-queries",
+    "/metrics",
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", ENDPOINTS)
+async def test_admin_endpoints_need_the_secret(
+    ac: AsyncClient, monkeypatch, admin, url: str
+):
+    assert (await ac.get(url, headers=admin)).status_code == 200
+    for headers in ({}, {"Authorization": "Bearer wrong"}, {"Authorization": "secret"}):
+        response = await ac.get(url, headers=headers)
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+    monkeypatch.setattr(settings, "ADMIN_SECRET", None)
+    assert (await ac.get(url, headers=admin)).status_code == 404
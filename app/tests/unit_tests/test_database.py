@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.config import settings
+from app.database import DATABASE_URL, InstrumentedPool, engine_params
+
+
+def test_pool_size_per_worker():
+    sized = settings.model_copy(
+        update={"DB_MAX_CONNECTIONS": 100, "WEB_CONCURRENCY": 4, "DB_MAX_OVERFLOW": 5}
+    )
+    assert sized.DB_POOL_SIZE_PER_WORKER == 20
+    assert sized.model_copy(update={"DB_POOL_SIZE": 7}).DB_POOL_SIZE_PER_WORKER == 7
+
+
+def test_pgbouncer_disables_prepared_statement_caches(monkeypatch):
+    monkeypatch.setattr(settings, "DB_PGBOUNCER", True)
+    connect_args = engine_params()["connect_args"]
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    name = connect_args["prepared_statement_name_func"]
+    assert name() != name()
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_count_waits_and_timeouts():
+    engine = create_async_engine(
+        DATABASE_URL,
+        poolclass=InstrumentedPool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+        connect_args=engine_params()["connect_args"],
+    )
+    try:
+        async with engine.connect():
+            with pytest.raises(TimeoutError):
+                async with engine.connect():
+                    pass
+            stats = engine.pool.stats()
+        assert stats["checked_out"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["checkouts"] == 2
+        assert stats["wait_ms_max"] >= 100
+    finally:
+        await engine.dispose()
@@ -0,0 +1,94 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from httpx import AsyncClient
+import pytest
+from app import metrics
+from app.config import settings
+
+
+def sample(page: str, name: str, **labels) -> float:
+    selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{name}{{{re.escape(selector)}}} (\S+)$", page, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_per_route(ac: AsyncClient, create_product, monkeypatch, admin):
+    product_id = await create_product()
+    monkeypatch.setattr(settings, "METRICS_SERVER_TIMING", True)
+    before = (await ac.get("/metrics", headers=admin)).text
+    route = {"method": "GET", "route": "/products/{id}"}
+
+    response = await ac.get(f"/products/{product_id}", params={"fields": "name"})
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert re.match(
+        r'db;dur=[\d.]+;desc="1 statements", pool;dur=[\d.]+, '
+        r"serialize;dur=[\d.]+, total;dur=[\d.]+$",
+        timing,
+    )
+    assert (await ac.get("/products/-1")).status_code == 404
+
+    after = (await ac.get("/metrics", headers=admin)).text
+    assert "# TYPE http_request_duration_seconds histogram" in after
+    count = "http_request_duration_seconds_count"
+    assert sample(after, count, **route) - sample(before, count, **route) == 2
+    inf = sample(after, "http_request_duration_seconds_bucket", **route, le="+Inf")
+    assert inf == sample(after, count, **route)
+    statements = "http_request_db_statements_total"
+    assert sample(after, statements, **route) - sample(before, statements, **route) == 2
+    for status in (200, 404):
+        total = "http_requests_total"
+        labels = {**route, "status": status}
+        assert sample(after, total, **labels) - sample(before, total, **labels) == 1
+
+    monkeypatch.setattr(settings, "METRICS_SERVER_TIMING", False)
+    assert "Server-Timing" not in (await ac.get(f"/products/{product_id}")).headers
+
+
+def worker_snapshot(count: int) -> str:
+    buckets = [0] * len(metrics.BUCKETS)
+    buckets[0] = count
+    return json.dumps(
+        {
+            "routes": [["GET", "/other", buckets, count, 0.001 * count, 2 * count, 0, 0]],
+            "responses": [["GET", "/other", 200, count]],
+        }
+    )
+
+
+def test_metrics_add_up_workers(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "METRICS_DIR", str(tmp_path))
+    own = metrics.snapshot()
+    (tmp_path / f"{os.getppid()}-1.json").write_text(worker_snapshot(3))
+
+    merged = metrics.collect()
+    assert len(merged["routes"]) == len(own["routes"]) + 1
+    page = metrics.render(merged)
+    labels = {"method": "GET", "route": "/other"}
+    assert sample(page, "http_request_duration_seconds_bucket", **labels, le=0.005) == 3
+    assert sample(page, "http_request_duration_seconds_bucket", **labels, le=10.0) == 3
+    assert sample(page, "http_request_db_statements_total", **labels) == 6
+    assert sample(page, "http_requests_total", **labels, status=200) == 3
+    # This worker stored its own snapshot next to the other one.
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_metrics_keep_exited_workers(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "METRICS_DIR", str(tmp_path))
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    (tmp_path / f"{process.pid}-1.json").write_text(worker_snapshot(3))
+    # An earlier worker that had the pid of this one.
+    (tmp_path / f"{os.getpid()}-0.json").write_text(worker_snapshot(4))
+
+    labels = {"method": "GET", "route": "/other", "status": 200}
+    for _ in range(2):
+        page = metrics.render(metrics.collect())
+        assert sample(page, "http_requests_total", **labels) == 7
+        # Their totals were moved to one file, next to this worker's snapshot.
+        names = {path.name for path in tmp_path.glob("*.json")}
+        assert names == {metrics.EXITED, metrics._own_snapshot().name}
@@ -0,0 +1,43 @@
+from httpx import AsyncClient
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_create_orders_batch(ac: AsyncClient, create_product):
+    plain = await create_product(available=3)
+    sharded = await create_product(available=5, stock_shards=4)
+
+    def order(*items: tuple[int, int]):
+        return {
+            "status": "RECEIVED",
+            "items": [{"product_id": id, "quantity": quantity} for id, quantity in items],
+        }
+
+    response = await ac.post(
+        "/orders/batch",
+        json=[
+            order((plain, 2), (sharded, 3)),
+            order((plain, 2)),
+            order((-1, 1)),
+            order((plain, 1), (sharded, 2)),
+            order((sharded, 1)),
+        ],
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["error"] for result in results] == [
+        None,
+        "Not enough products in stock",
+        "Product not found",
+        None,
+        "Not enough products in stock",
+    ]
+    assert [(i["product_id"], i["quantity"]) for i in results[3]["order"]["items"]] == [
+        (plain, 1),
+        (sharded, 2),
+    ]
+    assert (await ac.get(f"/products/{plain}")).json()["available"] == 0
+    assert (await ac.get(f"/products/{sharded}")).json()["available"] == 0
+
+    order_id = results[0]["order"]["id"]
+    assert (await ac.get(f"/orders/{order_id}")).json() == results[0]["order"]
@@ -0,0 +1,63 @@
+from httpx import AsyncClient
+import pytest
+from sqlalchemy import func, select
+from app.config import settings
+from app.database import async_session_maker
+from app.orders.models import OrderItem
+
+
+async def count_items(**where: int) -> int:
+    async with async_session_maker() as session:
+        return await session.scalar(
+            select(func.count()).select_from(OrderItem).filter_by(**where)
+        )
+
+
+@pytest.mark.asyncio
+async def test_delete_products_cascades_in_one_statement(
+    ac: AsyncClient, create_product, create_order, statements
+):
+    kept, doomed, other = [await create_product() for _ in range(3)]
+    order = await create_order(kept, doomed)
+    etag = (await ac.get(f"/orders/{order}")).headers["ETag"]
+
+    with statements() as sent:
+        response = await ac.post(
+            "/products/bulk-delete", json=[doomed, other, -1, doomed]
+        )
+    assert response.status_code == 200
+    assert response.json() == {"deleted": sorted([doomed, other]), "missing": [-1]}
+    assert sum("DELETE FROM" in statement for statement in sent) == 1
+
+    assert await count_items(product_id=doomed) == 0
+    assert (await ac.get(f"/products/{doomed}")).status_code == 404
+    # The order lost an item, so its cached copies must be refetched.
+    response = await ac.get(f"/orders/{order}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [item["product_id"] for item in response.json()["items"]] == [kept]
+
+    assert (await ac.delete(f"/products/{kept}")).status_code == 204
+    assert (await ac.delete(f"/products/{kept}")).status_code == 404
+    assert await count_items(order_id=order) == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_orders_cascades(ac: AsyncClient, create_product, create_order):
+    product = await create_product()
+    orders = [await create_order(product) for _ in range(3)]
+
+    response = await ac.post("/orders/bulk-delete", json=orders[:2] + [-1])
+    assert response.status_code == 200
+    assert response.json() == {"deleted": orders[:2], "missing": [-1]}
+    assert await count_items(product_id=product) == 1
+    assert (await ac.get(f"/orders/{orders[0]}")).status_code == 404
+
+    assert (await ac.delete(f"/orders/{orders[2]}")).status_code == 204
+    assert await count_items(product_id=product) == 0
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_limit(ac: AsyncClient):
+    too_many = list(range(settings.BULK_DELETE_MAX_SIZE + 1))
+    assert (await ac.post("/products/bulk-delete", json=too_many)).status_code == 413
+    assert (await ac.post("/orders/bulk-delete", json=too_many)).status_code == 413
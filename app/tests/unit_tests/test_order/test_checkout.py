@@ -0,0 +1,50 @@
+from httpx import AsyncClient
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_create_order_subtracts_stock(ac: AsyncClient, create_product):
+    first = await create_product(available=5)
+    second = await create_product(available=5)
+
+    response = await ac.post(
+        "/orders/",
+        json={
+            "status": "RECEIVED",
+            "items": [
+                {"product_id": first, "quantity": 2},
+                {"product_id": second, "quantity": 1},
+                {"product_id": first, "quantity": 3},
+            ],
+        },
+    )
+    assert response.status_code == 201
+    items = response.json()["items"]
+    assert [(i["product_id"], i["quantity"]) for i in items] == [
+        (first, 2),
+        (second, 1),
+        (first, 3),
+    ]
+    assert (await ac.get(f"/products/{first}")).json()["available"] == 0
+    assert (await ac.get(f"/products/{second}")).json()["available"] == 4
+
+
+@pytest.mark.asyncio
+async def test_failed_order_writes_nothing(ac: AsyncClient, create_product):
+    product = await create_product(available=1)
+    orders_before = len((await ac.get("/orders/")).json())
+
+    response = await ac.post(
+        "/orders/",
+        json={"status": "RECEIVED", "items": [{"product_id": product, "quantity": 2}]},
+    )
+    assert response.status_code == 400
+
+    response = await ac.post(
+        "/orders/",
+        json={"status": "RECEIVED", "items": [{"product_id": -1, "quantity": 1}]},
+    )
+    assert response.status_code == 410
+
+    assert len((await ac.get("/orders/")).json()) == orders_before
+    assert (await ac.get(f"/products/{product}")).json()["available"] == 1
@@ -0,0 +1,71 @@
+from httpx import AsyncClient
+import pytest
+from app.config import settings
+
+
+async def count_statements(ac: AsyncClient, statements, url: str) -> int:
+    with statements() as sent:
+        assert (await ac.get(url)).status_code == 200
+    return len(sent)
+
+
+async def create_products(create_product, count: int) -> list[int]:
+    return [
+        await create_product(name=f"Expanded {n}", price="2.50") for n in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_expand_order_products(ac: AsyncClient, create_product, create_order):
+    order = await create_order(*await create_products(create_product, 2))
+    plain = (await ac.get(f"/orders/{order}")).json()
+    assert all("product" not in item for item in plain["items"])
+
+    response = await ac.get(f"/orders/{order}", params={"expand": "product"})
+    expanded = response.json()
+    assert [item["product"] for item in expanded["items"]] == [
+        {"id": item["product_id"], "name": f"Expanded {n}", "price": "2.50"}
+        for n, item in enumerate(plain["items"])
+    ]
+    assert response.headers["ETag"] != (await ac.get(f"/orders/{order}")).headers["ETag"]
+
+    # Renaming a product changes the expanded order, but not the plain one.
+    etag = response.headers["ETag"]
+    product = expanded["items"][0]["product_id"]
+    await ac.patch(f"/products/{product}", json={"name": "Renamed"})
+    response = await ac.get(
+        f"/orders/{order}", params={"expand": "product"}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["items"][0]["product"]["name"] == "Renamed"
+
+    assert (
+        await ac.get(f"/orders/{order}", params={"expand": "items"})
+    ).status_code == 422
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("joined_max", [0, 1000])
+async def test_expand_query_count_is_constant(
+    ac: AsyncClient,
+    create_product,
+    create_order,
+    statements,
+    monkeypatch,
+    joined_max: int,
+):
+    monkeypatch.setattr(settings, "ORDERS_EXPAND_JOINED_MAX", joined_max)
+    small = await create_order(*await create_products(create_product, 1))
+    large = await create_order(*await create_products(create_product, 20))
+
+    one_order = await count_statements(ac, statements, f"/orders/{small}?expand=product")
+    assert (
+        await count_statements(ac, statements, f"/orders/{large}?expand=product")
+        == one_order
+    )
+
+    all_orders = await count_statements(ac, statements, "/orders/?expand=product")
+    await create_order(*await create_products(create_product, 20))
+    assert await count_statements(ac, statements, "/orders/?expand=product") == all_orders
+    # Products are joined into the items query, or loaded with one more.
+    assert all_orders == (3 if joined_max == 0 else 2)
@@ -0,0 +1,28 @@
+import json
+from httpx import AsyncClient
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_export_orders(ac: AsyncClient, create_product):
+    product_id = await create_product()
+    created = []
+    for quantity in (1, 2, 3):
+        response = await ac.post(
+            "/orders/",
+            json={
+                "status": "RECEIVED",
+                "items": [{"product_id": product_id, "quantity": quantity}],
+            },
+        )
+        created.append(response.json())
+
+    response = await ac.get("/orders/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [order["id"] for order in exported] == sorted(o["id"] for o in exported)
+    by_id = {order["id"]: order for order in exported}
+    for order in created:
+        assert by_id[order["id"]] == order
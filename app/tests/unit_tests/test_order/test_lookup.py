@@ -0,0 +1,43 @@
+from httpx import AsyncClient
+import pytest
+from app.config import settings
+from app.products.dao import ProductDAO
+
+
+@pytest.mark.asyncio
+async def test_lookup_products(ac: AsyncClient, create_product):
+    first, second, third = [await create_product(available=n) for n in range(3)]
+    ProductDAO.invalidate()
+    # A cached product is served from the cache, the others in one query.
+    cached = (await ac.get(f"/products/{second}")).json()
+
+    response = await ac.post("/products/lookup", json=[third, -1, second, first, third])
+    assert response.status_code == 200
+    result = response.json()
+    assert [item["id"] for item in result["items"]] == [third, second, first]
+    assert result["items"][1] == cached
+    assert result["missing"] == [-1]
+    assert result["items"][0] == (await ac.get(f"/products/{third}")).json()
+
+
+@pytest.mark.asyncio
+async def test_lookup_orders(ac: AsyncClient, create_order):
+    first, second = await create_order(), await create_order()
+    response = await ac.post("/orders/lookup", json=[second, -1, first])
+    assert response.status_code == 200
+    result = response.json()
+    assert result["items"] == [
+        (await ac.get(f"/orders/{second}")).json(),
+        (await ac.get(f"/orders/{first}")).json(),
+    ]
+    assert result["missing"] == [-1]
+
+    response = await ac.post("/orders/lookup", json=[-1])
+    assert response.json() == {"items": [], "missing": [-1]}
+
+
+@pytest.mark.asyncio
+async def test_lookup_limit(ac: AsyncClient):
+    too_many = list(range(settings.LOOKUP_MAX_IDS + 1))
+    assert (await ac.post("/products/lookup", json=too_many)).status_code == 413
+    assert (await ac.post("/orders/lookup", json=too_many)).status_code == 413
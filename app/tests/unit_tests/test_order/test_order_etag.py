@@ -0,0 +1,21 @@
+from httpx import AsyncClient
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_order_etag(ac: AsyncClient, create_order):
+    url = f"/orders/{await create_order()}"
+    response = await ac.get(url)
+    etag = response.headers["etag"]
+
+    response = await ac.get(url, headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    await ac.patch(f"{url}/SHIPPED")
+    response = await ac.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["status"] == "SHIPPED"
+    assert response.headers["etag"] != etag
+
+    assert (await ac.get("/orders/0", headers={"If-None-Match": "*"})).status_code == 404
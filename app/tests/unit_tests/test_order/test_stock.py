@@ -0,0 +1,35 @@
+import asyncio
+from httpx import AsyncClient
+import pytest
+
+ORDERS = 40
+CONCURRENCY = 20
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("stock_shards", [1, 16])
+async def test_parallel_orders_never_oversell(
+    ac: AsyncClient, create_product, stock_shards: int
+):
+    stock = ORDERS // 2
+    hot = await create_product(available=stock, stock_shards=stock_shards)
+    other = await create_product(available=ORDERS)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def place(n: int) -> int:
+        # Alternate the item order so that the lock order matters.
+        items = [{"product_id": hot, "quantity": 1}, {"product_id": other, "quantity": 1}]
+        if n % 2:
+            items.reverse()
+        async with semaphore:
+            response = await ac.post(
+                "/orders/", json={"status": "RECEIVED", "items": items}
+            )
+        return response.status_code
+
+    codes = await asyncio.gather(*(place(n) for n in range(ORDERS)))
+
+    assert codes.count(201) == stock
+    assert codes.count(400) == ORDERS - stock
+    assert (await ac.get(f"/products/{hot}")).json()["available"] == 0
+    assert (await ac.get(f"/products/{other}")).json()["available"] == ORDERS - stock
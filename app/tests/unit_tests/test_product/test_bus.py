@@ -0,0 +1,89 @@
+import asyncio
+from httpx import AsyncClient
+import pytest
+from sqlalchemy import func, select, update
+from app import bus
+from app.bus import InvalidationListener
+from app.config import settings
+from app.database import async_session_maker
+from app.products.dao import product_cache
+from app.products.models import Product
+
+
+async def wait_for(condition, timeout: float = 5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met in time")
+
+
+async def write_from_another_worker(product_id: int, available: int):
+    async with async_session_maker() as session:
+        await session.execute(
+            update(Product).where(Product.id == product_id).values(available=available)
+        )
+        await bus.publish(session, products=[product_id])
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_invalidation_bus(ac: AsyncClient, create_product):
+    # A foreign origin makes the events published by this process look like
+    # they were written by another worker.
+    listener = InvalidationListener(origin="another worker")
+    await listener.start()
+    try:
+        await wait_for(listener.connected.is_set)
+        product_id = await create_product()
+        await ac.get(f"/products/{product_id}")
+        assert product_id in product_cache
+
+        await write_from_another_worker(product_id, 42)
+        await wait_for(lambda: product_id not in product_cache)
+        assert (await ac.get(f"/products/{product_id}")).json()["available"] == 42
+
+        async with async_session_maker() as session:
+            await session.execute(
+                select(func.pg_terminate_backend(listener.connection.get_server_pid()))
+            )
+        await wait_for(lambda: listener.reconnects == 1 and listener.connected.is_set())
+        assert product_id not in product_cache
+
+        await ac.get(f"/products/{product_id}")
+        await write_from_another_worker(product_id, 43)
+        await wait_for(lambda: product_id not in product_cache)
+        assert (await ac.get(f"/products/{product_id}")).json()["available"] == 43
+    finally:
+        await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bypassed_until_the_bus_connects(
+    ac: AsyncClient, create_product, monkeypatch
+):
+    monkeypatch.setattr(settings, "CACHE_BUS_RECONNECT_DELAY", 60)
+    # Nothing listens on port 1, so the listener never connects.
+    listener = InvalidationListener("postgresql://postgres@127.0.0.1:1/mobile_db")
+    await listener.start()
+    try:
+        product_id = await create_product()
+        assert not bus.synced()
+        assert (await ac.get(f"/products/{product_id}")).status_code == 200
+        assert product_id not in product_cache
+    finally:
+        await listener.stop()
+    assert bus.synced()
+    await ac.get(f"/products/{product_id}")
+    assert product_id in product_cache
+
+
+def test_bus_applies_foreign_events_only():
+    received = []
+    bus.subscribe("test_table", received.append)
+    try:
+        bus.apply('{"origin": "elsewhere", "changes": {"test_table": null}}')
+        bus.apply('{"origin": "%s", "changes": {"test_table": [1]}}' % bus.ORIGIN)
+    finally:
+        del bus.handlers["test_table"]
+    assert received == [None]
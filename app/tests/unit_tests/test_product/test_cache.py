@@ -0,0 +1,57 @@
+import time
+from httpx import AsyncClient
+import pytest
+from app.cache import TTLCache
+from app.products.dao import product_cache
+
+
+def test_ttl_cache_evicts_and_expires():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+    generation = cache.generation
+    cache.pop("a")
+    cache.set("a", "stale", generation)
+    assert cache.get("a") is None
+
+    cache.ttl = 0
+    cache.set("d", 4)
+    time.sleep(0.001)
+    assert cache.get("d") is None
+    assert cache.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_product_cache_invalidation(ac: AsyncClient, create_product, admin):
+    product_id = await create_product(name="Cached", available=5)
+
+    hits = product_cache.hits
+    assert (await ac.get(f"/products/{product_id}")).json()["available"] == 5
+    assert (await ac.get(f"/products/{product_id}")).json()["available"] == 5
+    assert product_cache.hits == hits + 1
+
+    response = await ac.post(
+        "/orders/",
+        json={"status": "RECEIVED", "items": [{"product_id": product_id, "quantity": 2}]},
+    )
+    assert response.status_code == 201
+    assert (await ac.get(f"/products/{product_id}")).json()["available"] == 3
+
+    await ac.put(
+        f"/products/{product_id}",
+        json={"name": "Cached", "description": "cache", "price": "4.00", "available": 7},
+    )
+    assert (await ac.get(f"/products/{product_id}")).json()["available"] == 7
+    page = (await ac.get("/products/", params={"name_prefix": "Cached"})).json()
+    assert [item["price"] for item in page["items"]] == ["4.00"]
+
+    await ac.delete(f"/products/{product_id}")
+    assert (await ac.get(f"/products/{product_id}")).status_code == 404
+
+    stats = (await ac.get("/admin/cache", headers=admin)).json()
+    assert stats["products"]["hits"] >= 1
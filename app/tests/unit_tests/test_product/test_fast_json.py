@@ -0,0 +1,49 @@
+import datetime
+from decimal import Decimal
+import json
+from httpx import AsyncClient
+from app.config import settings
+from app.orders.schemas import OrderSchema
+from app.products.schemas import ProductResponse
+from app.serialization import dumps
+
+
+def test_dumps_matches_pydantic():
+    product = {
+        "id": 1,
+        "name": "Ябл\"око",
+        "description": "",
+        "price": Decimal("1234567.50"),
+        "available": 0,
+        "stock_shards": 1,
+    }
+    assert dumps(product) == ProductResponse(**product).model_dump_json().encode()
+    for date_created in (
+        datetime.datetime(2024, 2, 29, 23, 59, 59, 123456),
+        datetime.datetime(2024, 1, 1),
+    ):
+        order = {"id": 1, "date_created": date_created, "status": "RECEIVED", "items": []}
+        assert dumps(order) == OrderSchema(**order).model_dump_json().encode()
+
+
+async def test_fast_json_parity(ac: AsyncClient, monkeypatch):
+    responses = {}
+    for enabled in (False, True):
+        monkeypatch.setattr(settings, "FAST_JSON", enabled)
+        responses[enabled] = (
+            await ac.get("/products/", params={"limit": 500}),
+            await ac.get("/orders/"),
+        )
+    (products, orders), (fast_products, fast_orders) = responses[False], responses[True]
+
+    assert fast_products.content == products.content
+    assert fast_products.headers["etag"] == products.headers["etag"]
+    assert fast_products.headers["content-type"] == products.headers["content-type"]
+
+    def by_id(orders):
+        orders = sorted(json.loads(orders.content), key=lambda order: order["id"])
+        for order in orders:
+            order["items"].sort(key=lambda item: item["id"])
+        return orders
+
+    assert by_id(fast_orders) == by_id(orders)
@@ -0,0 +1,55 @@
+from httpx import AsyncClient
+import pytest
+from app.fields import sparse_model
+from app.products.dao import ProductDAO
+from app.products.schemas import ProductResponse
+
+
+@pytest.mark.asyncio
+async def test_product_fields(ac: AsyncClient, create_product, statements):
+    product_id = await create_product(name="Sparse", available=4)
+    ProductDAO.invalidate()
+    fields = {"fields": "name,available"}
+    expected = {"id": product_id, "name": "Sparse", "available": 4}
+
+    with statements() as sent:
+        response = await ac.get(f"/products/{product_id}", params=fields)
+    assert response.json() == expected
+    assert "description" not in sent[-1]
+
+    response = await ac.get("/products/", params={**fields, "name_prefix": "Sparse"})
+    assert response.json() == {"items": [expected], "next_cursor": None}
+    assert response.headers["ETag"]
+
+    response = await ac.post("/products/lookup", params=fields, json=[product_id, -1])
+    assert response.json() == {"items": [expected], "missing": [-1]}
+
+    response = await ac.get(f"/products/{product_id}", params={"fields": "name,secret"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: secret"
+
+
+@pytest.mark.asyncio
+async def test_order_fields(ac: AsyncClient, create_order, statements):
+    order_id = await create_order(status="SHIPPED")
+    with statements() as sent:
+        response = await ac.get(f"/orders/{order_id}", params={"fields": "status"})
+    assert response.json() == {"id": order_id, "status": "SHIPPED"}
+    # The items are not loaded at all.
+    assert not any("order_items" in statement for statement in sent)
+
+    response = await ac.get("/orders/", params={"fields": "items", "expand": "product"})
+    orders = response.json()
+    assert set(orders[0]) == {"id", "items"}
+    assert all("product" in item for order in orders for item in order["items"])
+
+    response = await ac.post(
+        "/orders/lookup", params={"fields": "date_created"}, json=[order_id]
+    )
+    assert list(response.json()["items"][0]) == ["id", "date_created"]
+
+
+def test_sparse_models_are_cached():
+    model = sparse_model(ProductResponse, ("id", "name"))
+    assert sparse_model(ProductResponse, ("id", "name")) is model
+    assert list(model.model_fields) == ["id", "name"]
@@ -0,0 +1,107 @@
+from httpx import AsyncClient
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_import_products_csv(ac: AsyncClient):
+    body = (
+        "name,description,price,available\n"
+        'Fig,"dried, sweet",4.50,7\n'
+        "Date,dried,6.00,0\n"
+    )
+    response = await ac.post(
+        "/products/import", content=body, headers={"content-type": "text/csv"}
+    )
+    assert response.status_code == 200
+    assert response.json()["rows"] == 2
+    assert response.json()["inserted"] == 2
+
+    page = (await ac.get("/products/", params={"name_prefix": "Fig"})).json()
+    assert page["items"][0]["description"] == "dried, sweet"
+
+
+@pytest.mark.asyncio
+async def test_import_products_ndjson_upserts(ac: AsyncClient, create_product):
+    product_id = await create_product(name="Lime")
+    body = (
+        f'{{"id": {product_id}, "name": "Lime", "description": "first", '
+        '"price": 2, "available": 2}\n'
+        f'{{"id": {product_id}, "name": "Lime", "description": "new", '
+        '"price": "2.50", "available": 3}\n'
+        '{"name": "Lemon", "description": "new", "price": 1.25, "available": 4}\n'
+        f'{{"id": {product_id + 1000}, "name": "Kumquat", "description": "new", '
+        '"price": 3, "available": 5}\n'
+    )
+    response = await ac.post(
+        "/products/import", content=body, headers={"content-type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.json()["rows"] == 4
+    assert (response.json()["inserted"], response.json()["updated"]) == (2, 1)
+
+    product = (await ac.get(f"/products/{product_id}")).json()
+    assert (product["description"], product["price"], product["available"]) == (
+        "new",
+        "2.50",
+        3,
+    )
+
+    # Imported ids must not be handed out again by the sequence.
+    created = await ac.post(
+        "/products/",
+        json={"name": "Yuzu", "description": "new", "price": "1.00", "available": 1},
+    )
+    assert created.json()["id"] > product_id + 1000
+
+
+@pytest.mark.asyncio
+async def test_import_products_skips_explicit_ids(ac: AsyncClient, create_product):
+    # The id the sequence would hand out next is also given explicitly.
+    next_id = await create_product(name="Quince") + 1
+    body = (
+        '{"name": "Medlar", "description": "new", "price": 1, "available": 1}\n'
+        f'{{"id": {next_id}, "name": "Loquat", "description": "new", '
+        '"price": 1, "available": 1}\n'
+    )
+    response = await ac.post(
+        "/products/import", content=body, headers={"content-type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert (response.json()["inserted"], response.json()["updated"]) == (2, 0)
+
+    assert (await ac.get(f"/products/{next_id}")).json()["name"] == "Loquat"
+    page = (await ac.get("/products/", params={"name_prefix": "Medlar"})).json()
+    assert page["items"][0]["id"] > next_id
+
+
+@pytest.mark.asyncio
+async def test_import_products_rejects_bad_input(ac: AsyncClient):
+    response = await ac.post(
+        "/products/import",
+        content="name,colour\nFig,purple\n",
+        headers={"content-type": "text/csv"},
+    )
+    assert response.status_code == 400
+
+    response = await ac.post(
+        "/products/import",
+        content='{"name": "Fig"}\n',
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 400
+
+    response = await ac.post(
+        "/products/import",
+        content=(
+            '{"name": "Fig", "description": "x", "price": 1, "available": 1}\n'
+            '{"name": null, "description": "x", "price": 1, "available": 1}\n'
+        ),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid import: Line 2: name must not be null"
+
+    response = await ac.post(
+        "/products/import", content="{}", headers={"content-type": "application/json"}
+    )
+    assert response.status_code == 415
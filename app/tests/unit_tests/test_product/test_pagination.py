@@ -0,0 +1,57 @@
+from httpx import AsyncClient
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_get_products_pages(ac: AsyncClient, create_product):
+    ids = [await create_product(name=name) for name in ("Pear", "Plum", "Peach")]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["after"] = cursor
+        response = await ac.get("/products/", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= 2
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == sorted(seen)
+    assert set(ids) <= set(seen)
+
+
+@pytest.mark.asyncio
+async def test_get_products_filters(ac: AsyncClient, create_product):
+    ids = [
+        await create_product(name=name, price=price, available=available)
+        for name, price, available in (
+            ("Kiwi_1", "5.00", 2),
+            ("Kiwi%2", "15.00", 0),
+            ("Kiwi_3", "25.00", 4),
+        )
+    ]
+
+    response = await ac.get("/products/", params={"name_prefix": "Kiwi_"})
+    assert [item["id"] for item in response.json()["items"]] == [ids[0], ids[2]]
+
+    response = await ac.get(
+        "/products/", params={"name_prefix": "Kiwi", "in_stock": True}
+    )
+    assert [item["id"] for item in response.json()["items"]] == [ids[0], ids[2]]
+
+    response = await ac.get(
+        "/products/",
+        params={"name_prefix": "Kiwi", "min_price": "10", "max_price": "20"},
+    )
+    assert [item["id"] for item in response.json()["items"]] == [ids[1]]
+
+
+@pytest.mark.asyncio
+async def test_get_products_invalid_cursor(ac: AsyncClient):
+    response = await ac.get("/products/", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,76 @@
+from httpx import AsyncClient
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_patch_product_updates_given_fields(
+    ac: AsyncClient, create_product, statements
+):
+    payload = {
+        "name": "Patched",
+        "description": "before",
+        "price": "5.00",
+        "available": 3,
+    }
+    product_id = await create_product(**payload)
+
+    with statements() as sent:
+        response = await ac.patch(f"/products/{product_id}", json={"price": "4.50"})
+    assert response.status_code == 200
+    assert response.json() == {
+        **payload,
+        "id": product_id,
+        "price": "4.50",
+        "stock_shards": 1,
+    }
+    # The update itself, and the change counter bump with its notification.
+    assert [statement.split()[0] for statement in sent] == ["UPDATE", "WITH"]
+    assert (await ac.get(f"/products/{product_id}")).json()["price"] == "4.50"
+
+    # An empty patch writes nothing, so the cached pages stay valid.
+    etag = (await ac.get("/products/")).headers["ETag"]
+    with statements() as sent:
+        response = await ac.patch(f"/products/{product_id}", json={})
+    assert response.json() == {
+        **payload,
+        "id": product_id,
+        "price": "4.50",
+        "stock_shards": 1,
+    }
+    assert not any(statement.split()[0] in ("UPDATE", "WITH") for statement in sent)
+    assert (await ac.get("/products/")).headers["ETag"] == etag
+
+    response = await ac.patch(f"/products/{product_id}", json={"name": None})
+    assert response.status_code == 422
+    response = await ac.patch("/products/-1", json={"name": "Ghost"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_patch_sharded_product(ac: AsyncClient, create_product):
+    product_id = await create_product(name="Patched shards", available=8, stock_shards=4)
+
+    response = await ac.patch(f"/products/{product_id}", json={"description": "y"})
+    assert response.json()["available"] == 8
+    assert response.json()["stock_shards"] == 4
+
+    response = await ac.patch(f"/products/{product_id}", json={"available": 12})
+    assert response.json()["available"] == 12
+    assert response.json()["stock_shards"] == 4
+
+    response = await ac.patch(f"/products/{product_id}", json={"stock_shards": 1})
+    assert response.json()["available"] == 12
+    assert response.json()["stock_shards"] == 1
+
+
+@pytest.mark.asyncio
+async def test_update_order_status_in_one_statement(
+    ac: AsyncClient, create_order, statements
+):
+    order_id = await create_order()
+    with statements() as sent:
+        response = await ac.patch(f"/orders/{order_id}/SHIPPED")
+    assert response.status_code == 200
+    assert response.json()["status"] == "SHIPPED"
+    assert [statement.split()[0] for statement in sent] == ["UPDATE", "WITH"]
+    assert (await ac.patch("/orders/-1/SHIPPED")).status_code == 411
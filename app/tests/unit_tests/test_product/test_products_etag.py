@@ -0,0 +1,24 @@
+from httpx import AsyncClient
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_products_etag(ac: AsyncClient, create_product, statements):
+    response = await ac.get("/products/", params={"limit": 5})
+    etag = response.headers["etag"]
+
+    with statements() as sent:
+        response = await ac.get(
+            "/products/", params={"limit": 5}, headers={"If-None-Match": etag}
+        )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+    assert len(sent) == 1 and "change_counters" in sent[0]
+
+    await create_product(name="Tagged")
+    response = await ac.get(
+        "/products/", params={"limit": 5}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,56 @@
+from httpx import AsyncClient
+import pytest
+
+
+async def available(ac: AsyncClient, product_id: int) -> int:
+    return (await ac.get(f"/products/{product_id}")).json()["available"]
+
+
+@pytest.mark.asyncio
+async def test_sharded_product_stock(ac: AsyncClient, create_product, create_order):
+    product_id = await create_product(name="Flash", available=10, stock_shards=4)
+    response = await ac.get(f"/products/{product_id}")
+    assert response.json()["available"] == 10
+    assert response.json()["stock_shards"] == 4
+
+    # The shards hold 3, 3, 2 and 2, so 5 has to be taken from several shards.
+    await create_order(product_id, quantity=5)
+    assert await available(ac, product_id) == 5
+    response = await ac.post(
+        "/orders/",
+        json={"status": "RECEIVED", "items": [{"product_id": product_id, "quantity": 6}]},
+    )
+    assert response.status_code == 400
+    await create_order(product_id, quantity=1)
+    assert await available(ac, product_id) == 4
+
+    page = await ac.get("/products/", params={"name_prefix": "Flash", "in_stock": True})
+    assert [item["id"] for item in page.json()["items"]] == [product_id]
+
+
+@pytest.mark.asyncio
+async def test_update_sharded_product(ac: AsyncClient, create_product, create_order):
+    payload = {
+        "name": "Resharded",
+        "description": "sale",
+        "price": "1.00",
+        "available": 7,
+    }
+    product_id = await create_product(**payload)
+
+    response = await ac.put(
+        f"/products/{product_id}", json={**payload, "stock_shards": 16}
+    )
+    assert response.json()["available"] == 7
+    assert response.json()["stock_shards"] == 16
+
+    response = await ac.put(f"/products/{product_id}", json={**payload, "available": 40})
+    assert response.json()["available"] == 40
+    assert response.json()["stock_shards"] == 16
+    await create_order(product_id, quantity=40)
+
+    response = await ac.put(
+        f"/products/{product_id}", json={**payload, "available": 3, "stock_shards": 1}
+    )
+    assert response.json()["available"] == 3
+    assert response.json()["stock_shards"] == 1
@@ -0,0 +1,76 @@
+from pathlib import Path
+import pstats
+import re
+from httpx import ASGITransport, AsyncClient
+import pytest
+import pytest_asyncio
+from app.config import settings
+from app.profiling import ProfilingMiddleware
+from main import app as fastapi_app
+
+
+@pytest_asyncio.fixture
+async def profiled(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILING_SECRET", "s3cret")
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    async with AsyncClient(
+        transport=ASGITransport(app=ProfilingMiddleware(fastapi_app)),
+        base_url="http://test/",
+    ) as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_profile_request(
+    ac: AsyncClient, profiled: AsyncClient, create_product, tmp_path
+):
+    product = await create_product()
+    order = {"status": "RECEIVED", "items": [{"product_id": product, "quantity": 1}]}
+    order = (await ac.post("/orders/", json=order)).json()["id"]
+    response = await profiled.get(f"/orders/{order}", headers={"X-Profile": "wrong"})
+    assert response.json()["id"] == order
+    assert not list(tmp_path.iterdir())
+
+    response = await profiled.get(f"/orders/{order}", headers={"X-Profile": "s3cret"})
+    assert response.status_code == 200
+    assert response.headers["X-Profiled-Status"] == "200"
+    assert "get_order_by_id" in response.text
+    stats = pstats.Stats(str(tmp_path / response.headers["X-Profile-File"]))
+    functions = {
+        (Path(file).parent.name, Path(file).name, name) for file, _, name in stats.stats
+    }
+    # The router, the DAO and the serialization of the response.
+    for function in (
+        ("orders", "router.py", "get_order_by_id"),
+        ("orders", "dao.py", "get_order_by_id"),
+        ("fastapi", "routing.py", "serialize_response"),
+    ):
+        assert function in functions
+
+    response = await profiled.get(
+        "/orders/", headers={"X-Profile": "s3cret", "X-Profile-Format": "collapsed"}
+    )
+    assert response.headers["X-Profile-File"].endswith(".collapsed")
+    assert all(re.match(r"^\S.* \d+$", line) for line in response.text.splitlines())
+
+    response = await profiled.get(
+        f"/orders/{order}", headers={"X-Profile": "s3cret", "X-Profile-Format": "html"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_sampled_profiles(
+    ac: AsyncClient, profiled: AsyncClient, create_product, monkeypatch, tmp_path
+):
+    product = await create_product()
+    monkeypatch.setattr(settings, "PROFILING_SAMPLE_RATE", 1.0)
+    response = await profiled.get(f"/products/{product}")
+    assert response.json()["id"] == product
+    [profile] = tmp_path.iterdir()
+    assert profile.name.endswith("-GET-products_id.prof")
+    assert pstats.Stats(str(profile)).total_calls > 0
+
+    monkeypatch.setattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+    await profiled.get(f"/products/{product}")
+    assert len(list(tmp_path.iterdir())) == 1
@@ -0,0 +1,180 @@
+"""
+Statement budgets of the endpoints.
+
+Every endpoint runs twice, once with a small and once with a large payload:
+more order items, more listed, looked up or deleted rows. Both times it has
+to stay within the budget declared for it in BUDGETS, and the large payload
+has to send exactly as many statements as the small one, so that a query
+per item or per row fails here instead of in production.
+"""
+import json
+from httpx import AsyncClient
+import pytest
+from app.products.dao import ProductDAO
+
+SMALL, LARGE = 1, 25
+
+
+async def create_products(create_product, count: int) -> list[int]:
+    return [await create_product() for _ in range(count)]
+
+
+# Each request builder creates what a payload of `size` needs and returns
+# the arguments of the request whose statements are counted.
+
+
+async def post_order(ac: AsyncClient, create_product, create_order, size: int):
+    products = await create_products(create_product, size)
+    items = [{"product_id": product, "quantity": 1} for product in products]
+    return "POST", "/orders/", {"json": {"status": "RECEIVED", "items": items}}
+
+
+async def post_order_batch(ac: AsyncClient, create_product, create_order, size: int):
+    products = await create_products(create_product, size)
+    orders = [
+        {"status": "RECEIVED", "items": [{"product_id": product, "quantity": 1}]}
+        for product in products
+    ]
+    return "POST", "/orders/batch", {"json": orders}
+
+
+async def get_orders(ac: AsyncClient, create_product, create_order, size: int):
+    await create_order(*await create_products(create_product, size))
+    return "GET", "/orders/", {}
+
+
+async def get_orders_expanded(ac: AsyncClient, create_product, create_order, size: int):
+    await create_order(*await create_products(create_product, size))
+    return "GET", "/orders/", {"params": {"expand": "product"}}
+
+
+async def get_order(ac: AsyncClient, create_product, create_order, size: int):
+    order = await create_order(*await create_products(create_product, size))
+    return "GET", f"/orders/{order}", {}
+
+
+async def get_order_expanded(ac: AsyncClient, create_product, create_order, size: int):
+    order = await create_order(*await create_products(create_product, size))
+    return "GET", f"/orders/{order}", {"params": {"expand": "product"}}
+
+
+async def lookup_orders(ac: AsyncClient, create_product, create_order, size: int):
+    orders = [
+        await create_order(*await create_products(create_product, 2)) for _ in range(size)
+    ]
+    return "POST", "/orders/lookup", {"json": orders}
+
+
+async def patch_order_status(ac: AsyncClient, create_product, create_order, size: int):
+    order = await create_order(*await create_products(create_product, size))
+    return "PATCH", f"/orders/{order}/SENT", {}
+
+
+async def delete_order(ac: AsyncClient, create_product, create_order, size: int):
+    order = await create_order(*await create_products(create_product, size))
+    return "DELETE", f"/orders/{order}", {}
+
+
+async def bulk_delete_orders(ac: AsyncClient, create_product, create_order, size: int):
+    orders = [
+        await create_order(*await create_products(create_product, 2)) for _ in range(size)
+    ]
+    return "POST", "/orders/bulk-delete", {"json": orders}
+
+
+async def get_products(ac: AsyncClient, create_product, create_order, size: int):
+    await create_products(create_product, size)
+    ProductDAO.invalidate()
+    return "GET", "/products/", {"params": {"limit": size}}
+
+
+async def get_product(ac: AsyncClient, create_product, create_order, size: int):
+    [product] = await create_products(create_product, 1)
+    ProductDAO.invalidate()
+    return "GET", f"/products/{product}", {}
+
+
+async def lookup_products(ac: AsyncClient, create_product, create_order, size: int):
+    products = await create_products(create_product, size)
+    ProductDAO.invalidate()
+    return "POST", "/products/lookup", {"json": products}
+
+
+async def post_product(ac: AsyncClient, create_product, create_order, size: int):
+    product = {"name": "Budget", "description": "x", "price": "1.50", "available": 1}
+    return "POST", "/products/", {"json": product}
+
+
+async def import_products(ac: AsyncClient, create_product, create_order, size: int):
+    rows = "".join(
+        json.dumps(
+            {"name": f"Imported {n}", "description": "x", "price": "2.00", "available": 1}
+        )
+        + "\n"
+        for n in range(size)
+    )
+    headers = {"Content-Type": "application/x-ndjson"}
+    return "POST", "/products/import", {"content": rows, "headers": headers}
+
+
+async def put_product(ac: AsyncClient, create_product, create_order, size: int):
+    [product] = await create_products(create_product, 1)
+    update = {"name": "Budget", "description": "y", "price": "2.50", "available": 3}
+    return "PUT", f"/products/{product}", {"json": update}
+
+
+async def patch_product(ac: AsyncClient, create_product, create_order, size: int):
+    [product] = await create_products(create_product, 1)
+    return "PATCH", f"/products/{product}", {"json": {"price": "2.50"}}
+
+
+async def delete_product(ac: AsyncClient, create_product, create_order, size: int):
+    [product] = await create_products(create_product, 1)
+    return "DELETE", f"/products/{product}", {}
+
+
+async def bulk_delete_products(ac: AsyncClient, create_product, create_order, size: int):
+    products = await create_products(create_product, size)
+    await create_order(*products)
+    return "POST", "/products/bulk-delete", {"json": products}
+
+
+# The most statements each endpoint may send, whatever the payload.
+BUDGETS = {
+    "POST /orders/": (4, post_order),
+    "POST /orders/batch": (6, post_order_batch),
+    "GET /orders/": (2, get_orders),
+    # Past ORDERS_EXPAND_JOINED_MAX orders, the products take one more query.
+    "GET /orders/?expand=product": (3, get_orders_expanded),
+    "GET /orders/{id}": (3, get_order),
+    "GET /orders/{id}?expand=product": (4, get_order_expanded),
+    "POST /orders/lookup": (2, lookup_orders),
+    "PATCH /orders/{id}/{status}": (2, patch_order_status),
+    "DELETE /orders/{id}": (2, delete_order),
+    "POST /orders/bulk-delete": (2, bulk_delete_orders),
+    "GET /products/": (2, get_products),
+    "GET /products/{id}": (1, get_product),
+    "POST /products/lookup": (1, lookup_products),
+    "POST /products/": (3, post_product),
+    "POST /products/import": (4, import_products),
+    "PUT /products/{id}": (2, put_product),
+    "PATCH /products/{id}": (2, patch_product),
+    "DELETE /products/{id}": (2, delete_product),
+    "POST /products/bulk-delete": (2, bulk_delete_products),
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("endpoint", list(BUDGETS))
+async def test_statement_budget(
+    ac: AsyncClient, create_product, create_order, statements, endpoint: str
+):
+    budget, build = BUDGETS[endpoint]
+    counts = []
+    for size in (SMALL, LARGE):
+        method, url, kwargs = await build(ac, create_product, create_order, size)
+        with statements(budget) as sent:
+            response = await ac.request(method, url, **kwargs)
+        assert response.status_code < 300, response.text
+        counts.append(len(sent))
+    assert counts[0] == counts[1], f"{endpoint} sends more statements for more rows"
@@ -0,0 +1,211 @@
+"""
+Query plan regression suite.
+
+Every hot DAO call runs against a realistic volume of rows, seeded inside a
+transaction that is rolled back at the end. The statements it sends are
+captured and explained, and the test fails if the plan of any of them scans
+a large table sequentially. Statements without a WHERE clause read whole
+tables on purpose (listing all orders, the export) and are not checked.
+"""
+from decimal import Decimal
+import re
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import engine
+from app.orders.dao import OrderDAO
+from app.orders.schemas import OrderCreateSchema
+from app.products.dao import ProductDAO
+from app.products.schemas import ProductUpdate
+
+PRODUCTS = 50000
+SHARDED_PRODUCTS = 100
+ORDERS = 50000
+ITEMS_PER_ORDER = 3
+TABLES = ("products", "product_stock_shards", "orders", "order_items")
+# Tables with fewer rows may be scanned, that is what the planner should do.
+LARGE_TABLE_ROWS = 10000
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def seeded():
+    async with engine.connect() as conn:
+        await conn.begin()
+        first_product = await conn.scalar(
+            text(
+                "WITH new AS ("
+                "INSERT INTO products (name, description, price, available) "
+                "SELECT 'plan ' || n, 'seeded', (n % 1000) + 0.99, n % 10 "
+                "FROM generate_series(1, :count) AS n RETURNING id"
+                ") SELECT min(id) FROM new"
+            ),
+            {"count": PRODUCTS},
+        )
+        last_sharded = first_product + SHARDED_PRODUCTS - 1
+        await conn.execute(
+            text(
+                "UPDATE products SET stock_shards = 16, available = 0 "
+                "WHERE id BETWEEN :first_product AND :last_sharded"
+            ),
+            {"first_product": first_product, "last_sharded": last_sharded},
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO product_stock_shards (product_id, shard, available) "
+                "SELECT p, s, 10 FROM "
+                "generate_series(:first_product, CAST(:last_sharded AS integer)) AS p "
+                "CROSS JOIN generate_series(0, 15) AS s"
+            ),
+            {"first_product": first_product, "last_sharded": last_sharded},
+        )
+        first_order = await conn.scalar(
+            text(
+                "WITH new AS ("
+                "INSERT INTO orders (date_created, status) "
+                "SELECT now() - n * interval '1 minute', 'RECEIVED' "
+                "FROM generate_series(1, :count) AS n RETURNING id"
+                ") SELECT min(id) FROM new"
+            ),
+            {"count": ORDERS},
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO order_items (order_id, product_id, quantity) "
+                "SELECT o.id, :first_product + (o.id::bigint * 7919 + k) % :products, 1 "
+                "FROM orders AS o CROSS JOIN generate_series(1, :items) AS k "
+                "WHERE o.id >= :first_order"
+            ),
+            {
+                "first_product": first_product,
+                "products": PRODUCTS,
+                "items": ITEMS_PER_ORDER,
+                "first_order": first_order,
+            },
+        )
+        for table in TABLES:
+            await conn.execute(text(f"ANALYZE {table}"))
+        large = await conn.scalars(
+            text(
+                "SELECT relname FROM pg_class "
+                "WHERE relname = ANY(:tables) AND reltuples >= :rows"
+            ),
+            {"tables": list(TABLES), "rows": LARGE_TABLE_ROWS},
+        )
+        try:
+            yield conn, set(large), first_product, first_order
+        finally:
+            await conn.rollback()
+            ProductDAO.invalidate()
+
+
+@pytest_asyncio.fixture(loop_scope="module")
+async def db(seeded):
+    conn = seeded[0]
+    savepoint = await conn.begin_nested()
+    # DAO commits only release a savepoint inside this one.
+    session = AsyncSession(
+        bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False
+    )
+    try:
+        yield session
+    finally:
+        await session.close()
+        await savepoint.rollback()
+        ProductDAO.invalidate()
+
+
+def hot_calls(first_product: int, first_order: int):
+    product, order = first_product + 123, first_order + 456
+    return {
+        "get_product_by_id": lambda db: ProductDAO.get_product_by_id(db, product),
+        "get_products_page": lambda db: ProductDAO.get_products_page(
+            db, 50, after_id=product
+        ),
+        "get_products_page in_stock": lambda db: ProductDAO.get_products_page(
+            db, 50, after_id=product, in_stock=True
+        ),
+        "get_products_page prices": lambda db: ProductDAO.get_products_page(
+            db, 50, min_price=Decimal("10.5"), max_price=Decimal("11")
+        ),
+        "get_products_page name_prefix": lambda db: ProductDAO.get_products_page(
+            db, 50, name_prefix="plan 4999"
+        ),
+        "get_products_by_ids": lambda db: ProductDAO.get_products_by_ids(
+            db, [product + n for n in range(0, 500, 7)]
+        ),
+        "update_product": lambda db: ProductDAO.update_product(
+            db,
+            product,
+            ProductUpdate(name="plan", description="updated", price="1.00", available=5),
+        ),
+        "delete_product": lambda db: ProductDAO.delete_product(db, product),
+        "create_order": lambda db: OrderDAO.create_order(
+            db,
+            OrderCreateSchema(
+                status="RECEIVED",
+                items=[{"product_id": product + 1, "quantity": 1}],
+            ),
+        ),
+        "create_orders": lambda db: OrderDAO.create_orders(
+            db,
+            [
+                OrderCreateSchema(
+                    status="RECEIVED",
+                    items=[{"product_id": product + n, "quantity": 1}],
+                )
+                for n in range(1, 5)
+            ],
+        ),
+        "get_order_by_id": lambda db: OrderDAO.get_order_by_id(db, order),
+        "get_order_by_id expand": lambda db: OrderDAO.get_order_by_id(
+            db, order, expand=True
+        ),
+        "get_orders_by_ids": lambda db: OrderDAO.get_orders_by_ids(
+            db, [order + n for n in range(0, 500, 7)]
+        ),
+        "get_order_version": lambda db: OrderDAO.get_order_version(db, order),
+        "update_order_status": lambda db: OrderDAO.update_order_status(db, order, "SENT"),
+        "delete_order": lambda db: OrderDAO.delete_order(db, order),
+        "stream_orders": lambda db: OrderDAO.stream_orders(db, 100).__anext__(),
+    }
+
+
+def seq_scans(plan: dict) -> set[str]:
+    """Collect the tables that a plan scans sequentially."""
+    scans = set()
+    if plan["Node Type"] == "Seq Scan":
+        scans.add(plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        scans |= seq_scans(child)
+    return scans
+
+
+@pytest.mark.asyncio(loop_scope="module")
+@pytest.mark.parametrize("call", list(hot_calls(0, 0)))
+async def test_hot_queries_use_indexes(seeded, db: AsyncSession, call: str):
+    conn, large_tables, first_product, first_order = seeded
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(("EXPLAIN", "SAVEPOINT", "RELEASE")):
+            # Explaining the first parameter set stands for all of an executemany.
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(conn.sync_connection, "before_cursor_execute", record)
+    try:
+        await hot_calls(first_product, first_order)[call](db)
+    finally:
+        event.remove(conn.sync_connection, "before_cursor_execute", record)
+
+    checked = 0
+    for statement, parameters in statements:
+        if not re.search(r"\bWHERE\b", statement) or statement.startswith("INSERT"):
+            continue
+        plan = await conn.exec_driver_sql(
+            "EXPLAIN (FORMAT JSON) " + statement, tuple(parameters)
+        )
+        scans = seq_scans(plan.scalar()[0]["Plan"]) & large_tables
+        assert not scans, f"{call} scans {scans} sequentially:\n{statement}"
+        checked += 1
+    assert checked
@@ -0,0 +1,94 @@
+import asyncio
+from httpx import AsyncClient
+import pytest
+from app import slow_queries
+from app.config import settings
+from app.products.dao import ProductDAO
+
+
+@pytest.mark.asyncio
+async def test_slow_queries(ac: AsyncClient, create_product, monkeypatch, admin):
+    product = await create_product()
+    order = {"status": "RECEIVED", "items": [{"product_id": product, "quantity": 1}]}
+    order = (await ac.post("/orders/", json=order)).json()["id"]
+    slow_queries.entries.clear()
+    slow_queries.plans.clear()
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_ANALYZE", True)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_CONCURRENCY", 100)
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 0.0)
+
+    assert (await ac.get(f"/orders/{order}")).status_code == 200
+    assert (await ac.get(f"/orders/{order}")).status_code == 200
+    assert (await ac.patch(f"/orders/{order}/SENT")).status_code == 200
+    await asyncio.gather(*slow_queries._explaining)
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 0.5)
+
+    response = await ac.get("/admin/slow-queries", params={"limit": 100}, headers=admin)
+    report = response.json()
+    entries = report["entries"]
+    assert {entry["route"] for entry in entries} == {
+        "GET /orders/{id}",
+        "PATCH /orders/{id}/{status}",
+    }
+    assert not any(entry["statement"].startswith(("SET", "EXPLAIN")) for entry in entries)
+    # Both reads of the order were logged, but their plans captured once.
+    items = [entry for entry in entries if "FROM order_items" in entry["statement"]]
+    assert len(items) == 2 and items[0]["fingerprint"] == items[1]["fingerprint"]
+    assert set(report["plans"]) == {entry["fingerprint"] for entry in entries}
+    assert str(order) not in str([entry["parameters"] for entry in entries])
+    assert items[0]["parameters"] == ["<int>"]
+
+    plan = report["plans"][items[0]["fingerprint"]]
+    assert "actual time" in plan and "Buffers" in plan
+    [update] = [
+        entry for entry in entries if entry["statement"].startswith("UPDATE orders")
+    ]
+    # The update is explained without being run again.
+    plan = report["plans"][update["fingerprint"]]
+    assert "Update on orders" in plan and "actual time" not in plan
+    assert (await ac.get(f"/orders/{order}")).json()["status"] == "SENT"
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_not_run_again_by_default(
+    ac: AsyncClient, create_product, monkeypatch
+):
+    product = await create_product()
+    ProductDAO.invalidate()
+    slow_queries.plans.clear()
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 0.0)
+    assert (await ac.get(f"/products/{product}")).status_code == 200
+    await asyncio.gather(*slow_queries._explaining)
+    [plan] = slow_queries.plans.values()
+    assert "Index Scan" in plan and "actual time" not in plan
+
+    # Without a free connection the plan is left for the next time.
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_CONCURRENCY", 0)
+    ProductDAO.invalidate()
+    slow_queries.plans.clear()
+    assert (await ac.get(f"/products/{product}")).status_code == 200
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 0.5)
+    assert not slow_queries.plans and not slow_queries._explaining
+
+
+def test_analyzable():
+    assert slow_queries.analyzable(
+        "SELECT count(*) FROM products WHERE products.id = ANY($1::INTEGER[])"
+    )
+    assert not slow_queries.analyzable("SELECT * FROM products FOR UPDATE")
+    assert not slow_queries.analyzable("UPDATE products SET available = 0")
+    for call in ("setval('products_id_seq', 10)", "nextval($1)", "pg_notify($1, $2)"):
+        assert not slow_queries.analyzable(f"SELECT {call}")
+
+
+def test_slow_query_plans_are_bounded(monkeypatch):
+    slow_queries.plans.clear()
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG_SIZE", 2)
+    assert slow_queries.record("SELECT 1", None, 1.0, None) is not None
+    assert slow_queries.record("SELECT 2", None, 1.0, None) is not None
+    assert slow_queries.record("SELECT 1", None, 1.0, None) is None
+    # The least recently seen statement makes room for the new one.
+    assert slow_queries.record("SELECT 3", None, 1.0, None) is not None
+    fingerprints = [entry["fingerprint"] for entry in slow_queries.entries]
+    assert list(slow_queries.plans) == [fingerprints[-2], fingerprints[-1]]
+    assert slow_queries.record("SELECT 2", None, 1.0, None) is not None
@@ -0,0 +1,83 @@
+"""
+Stale reads across gunicorn workers after a product write, with and without
+the invalidation bus.
+
+Starts `WORKERS` gunicorn workers against the test database, warms their
+product caches, then repeatedly updates one product and counts how many
+reads, spread over the workers by opening a new connection per request,
+still return the old stock.
+
+Usage:
+    MODE=TEST python -m benchmarks.cache_bus
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+from benchmarks.common import reset_database, seed_products
+
+WORKERS = 4
+PORT = 8765
+UPDATES = 20
+READS = 50
+
+
+def start_server(bus_enabled: bool) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "main:app",
+            "--workers", str(WORKERS),
+            "--worker-class", "uvicorn.workers.UvicornWorker",
+            "--bind", f"127.0.0.1:{PORT}",
+        ],
+        env={**os.environ, "CACHE_BUS_ENABLED": str(bus_enabled)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/admin/cache")
+            return server
+        except httpx.ConnectError:
+            time.sleep(0.1)
+    raise RuntimeError("gunicorn did not start")
+
+
+async def run(bus_enabled: bool) -> dict:
+    await reset_database()
+    await seed_products(1)
+    server = start_server(bus_enabled)
+    try:
+        limits = httpx.Limits(max_keepalive_connections=0)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{PORT}", limits=limits
+        ) as ac:
+            for _ in range(WORKERS * 10):
+                await ac.get("/products/1")
+            stale = 0
+            for available in range(1, UPDATES + 1):
+                product = (await ac.get("/products/1")).json()
+                product["available"] = available
+                await ac.put("/products/1", json=product)
+                for _ in range(READS):
+                    if (await ac.get("/products/1")).json()["available"] != available:
+                        stale += 1
+            return {"reads": UPDATES * READS, "stale reads": stale}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main():
+    results = {
+        "without bus": await run(bus_enabled=False),
+        "with bus": await run(bus_enabled=True),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Deleting a product that was sold in many orders: the ORM-loaded cascade the
+mappings used before (every order item loaded and deleted one by one)
+against the single DELETE relying on ON DELETE CASCADE. Also times bulk
+deletes of orders.
+
+Usage:
+    MODE=TEST python -m benchmarks.cascade_delete
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+from sqlalchemy import select
+from app.database import async_session_maker
+from app.orders.dao import OrderDAO
+from app.orders.models import OrderItem
+from app.products.dao import ProductDAO
+from app.products.models import Product
+from benchmarks.common import count_statements, reset_database, seed_orders, seed_products
+
+ORDERS = 100000
+BULK = 10000
+
+
+async def orm_loaded(id: int):
+    async with async_session_maker() as db:
+        items = await db.scalars(select(OrderItem).where(OrderItem.product_id == id))
+        for item in items:
+            await db.delete(item)
+        await db.delete(await db.get(Product, id))
+        await db.commit()
+
+
+async def passive(id: int):
+    async with async_session_maker() as db:
+        await ProductDAO.delete_product(db, id)
+
+
+async def bulk_orders(ids: list[int]):
+    async with async_session_maker() as db:
+        await OrderDAO.delete_orders(db, ids)
+
+
+async def run(call, *args) -> dict:
+    tracemalloc.start()
+    with count_statements() as statements:
+        started = time.perf_counter()
+        await call(*args)
+        elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "ms": round(elapsed * 1000, 1),
+        "peak_mib": round(peak / 2**20, 1),
+        "statements": len(statements),
+    }
+
+
+async def main():
+    await reset_database()
+    await seed_products(3)
+    # Every order has one item of each of the products 1, 2 and 3.
+    await seed_orders(ORDERS)
+    results = {
+        f"delete product with {ORDERS} items, ORM-loaded cascade": await run(
+            orm_loaded, 1
+        ),
+        f"delete product with {ORDERS} items, ON DELETE CASCADE": await run(passive, 2),
+        f"delete {BULK} orders with one statement": await run(
+            bulk_orders, list(range(1, BULK + 1))
+        ),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
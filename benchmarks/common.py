@@ -0,0 +1,126 @@
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable
+from sqlalchemy import event, text
+from app.config import settings
+from app.database import Base, engine
+from app.products.dao import ProductDAO
+
+
+async def reset_database():
+    """
+    Recreate every table in the test database and drop the product caches.
+
+    Benchmarks seed large volumes of rows, so they refuse to run against
+    anything but the test database.
+    """
+    assert settings.MODE == "TEST", "run benchmarks with MODE=TEST"
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    ProductDAO.invalidate()
+
+
+async def seed_products(count: int, available: int = 100):
+    """
+    Insert `count` generated products with one set-based statement.
+
+    Args:
+        count (int): The number of products to insert.
+        available (int): The stock of every product.
+    """
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO products (name, description, price, available) "
+                "SELECT 'product ' || n, 'generated', (n % 1000) + 0.99, :available "
+                "FROM generate_series(1, :count) AS n"
+            ),
+            {"count": count, "available": available},
+        )
+        await conn.execute(text("ANALYZE products"))
+    ProductDAO.invalidate()
+
+
+async def measure(call: Callable[[], Awaitable], repeat: int) -> dict:
+    """
+    Await `call` `repeat` times and summarize the latency in milliseconds.
+
+    Returns:
+        dict: The p50, p95, p99 and mean latency.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings)
+
+
+def summarize(timings: list[float]) -> dict:
+    """
+    Summarize latencies in milliseconds.
+
+    Returns:
+        dict: The p50, p95, p99 and mean latency.
+    """
+    timings = sorted(timings)
+    return {
+        "p50": round(timings[len(timings) // 2], 3),
+        "p95": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "p99": round(timings[int(len(timings) * 0.99) - 1], 3),
+        "mean": round(statistics.fmean(timings), 3),
+    }
+
+
+async def seed_orders(count: int, items_per_order: int = 3):
+    """
+    Insert `count` generated orders with `items_per_order` items each.
+
+    The items reference the first products, so seed at least
+    `items_per_order` products beforehand.
+
+    Args:
+        count (int): The number of orders to insert.
+        items_per_order (int): The number of items of every order.
+    """
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO orders (date_created, status) "
+                "SELECT now() - n * interval '1 minute', 'RECEIVED' "
+                "FROM generate_series(1, :count) AS n"
+            ),
+            {"count": count},
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO order_items (order_id, product_id, quantity) "
+                "SELECT o.id, p.n, 1 FROM orders AS o "
+                "CROSS JOIN generate_series(1, :items) AS p(n)"
+            ),
+            {"items": items_per_order},
+        )
+        await conn.execute(text("ANALYZE orders"))
+        await conn.execute(text("ANALYZE order_items"))
+
+
+@contextmanager
+def count_statements():
+    """
+    Collect the SQL statements sent by the engine inside the block.
+
+    Yields:
+        list[str]: The statements, filled in as they are executed.
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
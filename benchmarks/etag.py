@@ -0,0 +1,49 @@
+"""
+Latency of full responses versus 304 Not Modified for polled endpoints.
+
+Usage:
+    MODE=TEST python -m benchmarks.etag
+"""
+import asyncio
+import json
+from httpx import ASGITransport, AsyncClient
+from app.products.dao import product_page_cache
+from benchmarks.common import measure, reset_database, seed_orders, seed_products
+from main import app
+
+PAGE_SIZE = 500
+
+
+async def main():
+    await reset_database()
+    await seed_products(10000)
+    await seed_orders(1, items_per_order=50)
+    # Measure the database and serialization work, not the page cache.
+    product_page_cache.maxsize = 0
+
+    results = {}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/"
+    ) as ac:
+        for url, params in (("/products/", {"limit": PAGE_SIZE}), ("/orders/1", {})):
+            etag = (await ac.get(url, params=params)).headers["etag"]
+
+            async def full():
+                assert (await ac.get(url, params=params)).status_code == 200
+
+            async def not_modified():
+                response = await ac.get(
+                    url, params=params, headers={"If-None-Match": etag}
+                )
+                assert response.status_code == 304
+
+            results[f"GET {url}"] = {
+                "200": await measure(full, repeat=300),
+                "304": await measure(not_modified, repeat=300),
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
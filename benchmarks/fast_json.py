@@ -0,0 +1,66 @@
+"""
+CPU time per 10k rows of `GET /products/` and `GET /orders/` with the
+Pydantic response models and with the orjson fast path (FAST_JSON).
+
+Usage:
+    MODE=TEST python -m benchmarks.fast_json
+"""
+import asyncio
+import json
+import time
+from httpx import ASGITransport, AsyncClient
+from app.config import settings
+from app.pagination import encode_cursor
+from app.products.dao import product_page_cache
+from benchmarks.common import reset_database, seed_orders, seed_products
+from main import app
+
+ROWS = 10000
+PAGE_SIZE = 500
+REPEAT = 5
+
+
+async def cpu_ms(call) -> float:
+    best = None
+    for _ in range(REPEAT):
+        started = time.process_time()
+        await call()
+        elapsed = (time.process_time() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 1)
+
+
+async def main():
+    await reset_database()
+    await seed_products(ROWS)
+    await seed_orders(ROWS, items_per_order=3)
+    product_page_cache.maxsize = 0
+
+    results = {}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/"
+    ) as ac:
+
+        # The responses are not parsed, so that the client adds little CPU time.
+        async def products():
+            for page in range(ROWS // PAGE_SIZE):
+                params = {"limit": PAGE_SIZE}
+                if page:
+                    params["after"] = encode_cursor(page * PAGE_SIZE)
+                assert (await ac.get("/products/", params=params)).status_code == 200
+
+        async def orders():
+            assert (await ac.get("/orders/")).status_code == 200
+
+        for label, enabled in (("pydantic", False), ("orjson", True)):
+            settings.FAST_JSON = enabled
+            results[label] = {
+                "GET /products/ (20 pages), CPU ms": await cpu_ms(products),
+                "GET /orders/ (3 items each), CPU ms": await cpu_ms(orders),
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
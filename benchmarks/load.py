@@ -0,0 +1,408 @@
+"""
+Throughput and latency of every product and order endpoint under load.
+
+Seeds the test database, then sends `--requests` requests to each endpoint
+from `--concurrency` concurrent clients, one endpoint after the other: the
+reads first, then the writes, and the deletes last, on rows that the other
+endpoints do not touch. The requests are generated from a fixed seed, so
+every run sends the same ones.
+
+The app runs with its production connection pool against the test database,
+either behind httpx's ASGITransport in a child process (`--server asgi`, the
+default) or as a real server under uvicorn or gunicorn with `--workers`
+workers. With ASGITransport the client shares a process and CPU with the
+app, so only compare results of the same mode.
+
+Prints the requests per second and the p50/p95/p99 latency in milliseconds
+per endpoint as JSON. With a baseline stored by `--save-baseline`, the run
+fails when an endpoint answers with errors, or its p95 grew or its
+throughput dropped by more than `--tolerance`.
+
+Usage:
+    MODE=TEST python -m benchmarks.load --save-baseline
+    MODE=TEST python -m benchmarks.load
+    MODE=TEST python -m benchmarks.load --server gunicorn --workers 4 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+import httpx
+from app.config import settings
+from benchmarks.common import reset_database, seed_orders, seed_products, summarize
+
+PORT = 8766
+SEED = 42
+BASELINE = Path(__file__).with_name("load_baseline.json")
+# Rows that reads and updates pick from. The deletes take theirs from the
+# rows seeded after these, so that every endpoint finds what it asks for.
+READ_PRODUCTS = 5000
+READ_ORDERS = 2000
+# Ids per request of the lookups and bulk deletes, orders per batch.
+BATCH = 10
+
+Builder = Callable[[random.Random, int], tuple]
+
+
+def scenarios(requests: int) -> dict[str, Builder]:
+    """
+    Get the request builder of every endpoint, in the order they run.
+
+    A builder returns the method, URL and httpx arguments of the request
+    with the given index; the deletes use the index to pick their rows.
+
+    Args:
+        requests (int): The number of requests per endpoint.
+
+    Returns:
+        dict[str, Builder]: The builders by endpoint.
+    """
+
+    def product(rng: random.Random) -> int:
+        return rng.randint(1, READ_PRODUCTS)
+
+    def order(rng: random.Random) -> int:
+        return rng.randint(1, READ_ORDERS)
+
+    def doomed(read: int, n: int) -> int:
+        return read + 1 + n
+
+    def doomed_batch(read: int, n: int) -> list[int]:
+        first = read + 1 + requests + n * BATCH
+        return list(range(first, first + BATCH))
+
+    def new_product(n: int) -> dict:
+        return {
+            "name": f"load {n}",
+            "description": "load",
+            "price": "9.99",
+            "available": 100,
+        }
+
+    def new_order(rng: random.Random, items: int) -> dict:
+        return {
+            "status": "RECEIVED",
+            "items": [{"product_id": product(rng), "quantity": 1} for _ in range(items)],
+        }
+
+    def ndjson(n: int) -> str:
+        return "".join(
+            json.dumps({**new_product(n), "name": f"import {n} {row}"}) + "\n"
+            for row in range(BATCH)
+        )
+
+    return {
+        "GET /products/": lambda rng, n: ("GET", "/products/", {"params": {"limit": 50}}),
+        "GET /products/?in_stock": lambda rng, n: (
+            "GET",
+            "/products/",
+            {"params": {"limit": 50, "in_stock": True, "min_price": 500}},
+        ),
+        "GET /products/{id}": lambda rng, n: ("GET", f"/products/{product(rng)}", {}),
+        "POST /products/lookup": lambda rng, n: (
+            "POST",
+            "/products/lookup",
+            {"json": [product(rng) for _ in range(BATCH)]},
+        ),
+        "GET /orders/": lambda rng, n: ("GET", "/orders/", {}),
+        "GET /orders/export": lambda rng, n: ("GET", "/orders/export", {}),
+        "GET /orders/{id}": lambda rng, n: ("GET", f"/orders/{order(rng)}", {}),
+        "GET /orders/{id}?expand=product": lambda rng, n: (
+            "GET",
+            f"/orders/{order(rng)}",
+            {"params": {"expand": "product"}},
+        ),
+        "POST /orders/lookup": lambda rng, n: (
+            "POST",
+            "/orders/lookup",
+            {"json": [order(rng) for _ in range(BATCH)]},
+        ),
+        "POST /products/": lambda rng, n: (
+            "POST",
+            "/products/",
+            {"json": new_product(n)},
+        ),
+        "POST /products/import": lambda rng, n: (
+            "POST",
+            "/products/import",
+            {"content": ndjson(n), "headers": {"content-type": "application/x-ndjson"}},
+        ),
+        "PUT /products/{id}": lambda rng, n: (
+            "PUT",
+            f"/products/{product(rng)}",
+            {"json": new_product(n)},
+        ),
+        "PATCH /products/{id}": lambda rng, n: (
+            "PATCH",
+            f"/products/{product(rng)}",
+            {"json": {"price": f"{rng.randint(1, 999)}.99"}},
+        ),
+        "POST /orders/": lambda rng, n: ("POST", "/orders/", {"json": new_order(rng, 2)}),
+        "POST /orders/batch": lambda rng, n: (
+            "POST",
+            "/orders/batch",
+            {"json": [new_order(rng, 1) for _ in range(BATCH)]},
+        ),
+        "PATCH /orders/{id}/{status}": lambda rng, n: (
+            "PATCH",
+            f"/orders/{order(rng)}/{rng.choice(['SENT', 'DELIVERED'])}",
+            {},
+        ),
+        "DELETE /products/{id}": lambda rng, n: (
+            "DELETE",
+            f"/products/{doomed(READ_PRODUCTS, n)}",
+            {},
+        ),
+        "POST /products/bulk-delete": lambda rng, n: (
+            "POST",
+            "/products/bulk-delete",
+            {"json": doomed_batch(READ_PRODUCTS, n)},
+        ),
+        "DELETE /orders/{id}": lambda rng, n: (
+            "DELETE",
+            f"/orders/{doomed(READ_ORDERS, n)}",
+            {},
+        ),
+        "POST /orders/bulk-delete": lambda rng, n: (
+            "POST",
+            "/orders/bulk-delete",
+            {"json": doomed_batch(READ_ORDERS, n)},
+        ),
+    }
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient, name: str, build: Builder, requests: int, concurrency: int
+) -> dict:
+    """
+    Send the requests of one endpoint from `concurrency` clients at once.
+
+    Returns:
+        dict: The number of requests and errors, the requests per second and
+        the latency percentiles.
+    """
+    rng = random.Random(f"{SEED} {name}")
+    pending = iter([build(rng, n) for n in range(requests)])
+    timings = []
+    errors = 0
+
+    async def user():
+        nonlocal errors
+        for method, url, kwargs in pending:
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": round(requests / elapsed, 1),
+        **summarize(timings),
+    }
+
+
+async def run_all(client: httpx.AsyncClient, options: argparse.Namespace) -> dict:
+    """Run every endpoint, after warming up the connections and the caches."""
+    for n in range(options.concurrency):
+        await client.get(f"/products/{n % READ_PRODUCTS + 1}")
+        await client.get(f"/orders/{n % READ_ORDERS + 1}")
+    results = {}
+    for name, build in scenarios(options.requests).items():
+        if options.endpoint and name not in options.endpoint:
+            continue
+        results[name] = await run_endpoint(
+            client, name, build, options.requests, options.concurrency
+        )
+        print(name, results[name], file=sys.stderr)
+    return results
+
+
+def server_env(workers: int) -> dict:
+    """
+    Get the environment of the app: the pooled engine of MODE=DEV, but
+    connected to the seeded test database.
+    """
+    return {
+        **os.environ,
+        "MODE": "DEV",
+        "DB_HOST": settings.TEST_DB_HOST,
+        "DB_PORT": str(settings.TEST_DB_PORT),
+        "DB_USER": settings.TEST_DB_USER,
+        "DB_PASS": settings.TEST_DB_PASS,
+        "DB_NAME": settings.TEST_DB_NAME,
+        "WEB_CONCURRENCY": str(workers),
+    }
+
+
+def start_server(options: argparse.Namespace) -> subprocess.Popen:
+    if options.server == "gunicorn":
+        command = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "main:app",
+            "--workers",
+            str(options.workers),
+            "--worker-class",
+            "uvicorn.workers.UvicornWorker",
+            "--bind",
+            f"127.0.0.1:{PORT}",
+        ]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT)]
+    server = subprocess.Popen(
+        command,
+        env=server_env(options.workers if options.server == "gunicorn" else 1),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/admin/pool")
+            return server
+        except httpx.ConnectError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"{options.server} did not start")
+
+
+async def run_in_process(options: argparse.Namespace) -> dict:
+    """Drive the app through ASGITransport; runs in the child process."""
+    from main import app
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=None
+    ) as client:
+        return await run_all(client, options)
+
+
+async def run(options: argparse.Namespace) -> dict:
+    await reset_database()
+    await seed_products(READ_PRODUCTS + options.requests * (1 + BATCH))
+    await seed_orders(READ_ORDERS + options.requests * (1 + BATCH))
+
+    if options.server == "asgi":
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.load", "--in-process", *sys.argv[1:]],
+            env=server_env(1),
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout
+        endpoints = json.loads(output)
+    else:
+        server = start_server(options)
+        try:
+            limits = httpx.Limits(max_connections=options.concurrency)
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=None
+            ) as client:
+                endpoints = await run_all(client, options)
+        finally:
+            server.terminate()
+            server.wait()
+
+    return {
+        "config": {
+            "server": options.server,
+            "workers": options.workers if options.server == "gunicorn" else 1,
+            "concurrency": options.concurrency,
+            "requests": options.requests,
+        },
+        "endpoints": endpoints,
+    }
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare a run with the baseline.
+
+    Args:
+        results (dict): The results of this run.
+        baseline (dict): The results stored with --save-baseline.
+        tolerance (float): The share by which p95 may grow and throughput drop.
+
+    Returns:
+        list[str]: A description of every regression; empty if there is none.
+    """
+    if results["config"] != baseline["config"]:
+        return [
+            f"the baseline was run with {baseline['config']}, not {results['config']}"
+        ]
+    found = []
+    for name, result in results["endpoints"].items():
+        if result["errors"]:
+            found.append(
+                f"{name}: {result['errors']} of {result['requests']} requests failed"
+            )
+        expected = baseline["endpoints"].get(name)
+        if expected is None:
+            continue
+        if result["p95"] > expected["p95"] * (1 + tolerance):
+            found.append(f"{name}: p95 {result['p95']} ms, baseline {expected['p95']} ms")
+        if result["throughput"] < expected["throughput"] * (1 - tolerance):
+            found.append(
+                f"{name}: {result['throughput']} requests/s, "
+                f"baseline {expected['throughput']} requests/s"
+            )
+    return found
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--server", choices=["asgi", "uvicorn", "gunicorn"], default="asgi"
+    )
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="per endpoint")
+    parser.add_argument(
+        "--endpoint", action="append", help="run only this endpoint, may be repeated"
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--output", type=Path, help="also write the results to this file")
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    if options.in_process:
+        print(json.dumps(asyncio.run(run_in_process(options))))
+        return
+
+    results = asyncio.run(run(options))
+    print(json.dumps(results, indent=2))
+    if options.output:
+        options.output.write_text(json.dumps(results, indent=2) + "\n")
+    if options.save_baseline:
+        options.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        return
+    if not options.baseline.exists():
+        print(f"No baseline at {options.baseline}, nothing to compare", file=sys.stderr)
+        return
+    found = regressions(
+        results, json.loads(options.baseline.read_text()), options.tolerance
+    )
+    for regression in found:
+        print(f"Regression: {regression}", file=sys.stderr)
+    if found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Fetching the products of an order and a dashboard's orders: one request per
+id against one lookup request for all of them.
+
+The client talks to the app in process, so the numbers leave out the
+network latency that every extra round trip adds in production.
+
+Usage:
+    MODE=TEST python -m benchmarks.lookup
+"""
+import asyncio
+import json
+from httpx import ASGITransport, AsyncClient
+from app.products.dao import product_cache
+from benchmarks.common import measure, reset_database, seed_orders, seed_products
+from main import app
+
+IDS = 50
+
+
+async def main():
+    await reset_database()
+    await seed_products(10000)
+    await seed_orders(1000)
+    # Measure the database work, not the product cache.
+    product_cache.maxsize = 0
+    ids = list(range(1, IDS + 1))
+
+    results = {}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/"
+    ) as ac:
+        for prefix in ("/products", "/orders"):
+
+            async def one_by_one():
+                for id in ids:
+                    assert (await ac.get(f"{prefix}/{id}")).status_code == 200
+
+            async def lookup():
+                assert (await ac.post(f"{prefix}/lookup", json=ids)).status_code == 200
+
+            results[f"{IDS} {prefix[1:]}"] = {
+                "one request per id": await measure(one_by_one, repeat=30),
+                "one lookup request": await measure(lookup, repeat=30),
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+"""
+Latency added by the metrics middleware, on a cached product read that
+does not touch the database and on an order read that does.
+
+Usage:
+    MODE=TEST python -m benchmarks.metrics_overhead
+"""
+import asyncio
+import json
+from httpx import ASGITransport, AsyncClient
+from app.metrics import MetricsMiddleware
+from benchmarks.common import measure, reset_database, seed_orders, seed_products
+from main import app
+
+REPEAT = 2000
+
+
+async def main():
+    await reset_database()
+    await seed_products(10)
+    await seed_orders(10)
+
+    results = {}
+    # The router alone stands for the app without the middleware.
+    for label, asgi in (
+        ("with metrics", MetricsMiddleware(app.router)),
+        ("without metrics", app.router),
+    ):
+        async with AsyncClient(
+            transport=ASGITransport(app=asgi), base_url="http://test/"
+        ) as ac:
+            for url in ("/products/1", "/orders/1"):
+
+                async def get():
+                    assert (await ac.get(url)).status_code == 200
+
+                await measure(get, repeat=100)
+                results.setdefault(f"GET {url}", {})[label] = await measure(get, REPEAT)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""
+Ingestion throughput in orders per second: `POST /orders/batch` compared
+with one `POST /orders/` per order.
+
+Usage:
+    MODE=TEST python -m benchmarks.orders_batch
+"""
+import asyncio
+import json
+import random
+import time
+from httpx import ASGITransport, AsyncClient
+from benchmarks.common import reset_database, seed_products
+from main import app
+
+PRODUCTS = 100
+SINGLE_ORDERS = 500
+BATCHES = 10
+BATCH_SIZE = 1000
+
+
+def random_order() -> dict:
+    return {
+        "status": "RECEIVED",
+        "items": [
+            {"product_id": product_id, "quantity": 1}
+            for product_id in random.sample(range(1, PRODUCTS + 1), 2)
+        ],
+    }
+
+
+async def main():
+    await reset_database()
+    await seed_products(PRODUCTS, available=1_000_000)
+
+    results = {}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/", timeout=None
+    ) as ac:
+        started = time.perf_counter()
+        for _ in range(SINGLE_ORDERS):
+            response = await ac.post("/orders/", json=random_order())
+            assert response.status_code == 201
+        elapsed = time.perf_counter() - started
+        results["POST /orders/"] = {"orders_per_second": round(SINGLE_ORDERS / elapsed)}
+
+        started = time.perf_counter()
+        for _ in range(BATCHES):
+            batch = [random_order() for _ in range(BATCH_SIZE)]
+            response = await ac.post("/orders/batch", json=batch)
+            assert all(result["order"] for result in response.json())
+        elapsed = time.perf_counter() - started
+        results["POST /orders/batch"] = {
+            "orders_per_second": round(BATCHES * BATCH_SIZE / elapsed)
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""
+Statements and latency of `POST /orders/` for a growing number of items.
+
+Usage:
+    MODE=TEST python -m benchmarks.orders_checkout
+"""
+import asyncio
+import json
+from httpx import ASGITransport, AsyncClient
+from benchmarks.common import count_statements, measure, reset_database, seed_products
+from main import app
+
+ITEM_COUNTS = (1, 10, 500)
+
+
+async def main():
+    await reset_database()
+    await seed_products(max(ITEM_COUNTS), available=1_000_000)
+
+    results = {}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/"
+    ) as ac:
+        for count in ITEM_COUNTS:
+            payload = {
+                "status": "RECEIVED",
+                "items": [
+                    {"product_id": id, "quantity": 1} for id in range(1, count + 1)
+                ],
+            }
+
+            async def checkout():
+                response = await ac.post("/orders/", json=payload)
+                assert response.status_code == 201
+
+            with count_statements() as statements:
+                await checkout()
+            results[f"{count} items"] = {
+                "statements": len(statements),
+                "latency_ms": await measure(checkout, repeat=50),
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Throughput of concurrent two-item checkouts that contend for a hot product.
+
+Twice as many orders as the hot product has in stock are placed at once,
+half of them listing its items in reverse, so that the row locks are
+taken in both orders. Run with 1 and 16 stock shards.
+
+Usage:
+    MODE=TEST python -m benchmarks.orders_contention
+"""
+import asyncio
+import json
+import time
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.database import DATABASE_URL, get_db
+from benchmarks.common import reset_database
+from main import app
+
+ORDERS = 2000
+CONCURRENCY = 20
+SHARDS = (1, 16)
+
+
+async def create_product(ac: AsyncClient, available: int, stock_shards: int = 1) -> int:
+    response = await ac.post(
+        "/products/",
+        json={
+            "name": "hot",
+            "description": "flash sale",
+            "price": "1.00",
+            "available": available,
+            "stock_shards": stock_shards,
+        },
+    )
+    return response.json()["id"]
+
+
+async def place_orders(ac: AsyncClient, stock_shards: int) -> dict:
+    await reset_database()
+    stock = ORDERS // 2
+    hot = await create_product(ac, stock, stock_shards)
+    other = await create_product(ac, ORDERS)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def place(n: int) -> int:
+        items = [{"product_id": hot, "quantity": 1}, {"product_id": other, "quantity": 1}]
+        if n % 2:
+            items.reverse()
+        async with semaphore:
+            response = await ac.post(
+                "/orders/", json={"status": "RECEIVED", "items": items}
+            )
+        return response.status_code
+
+    started = time.perf_counter()
+    codes = await asyncio.gather(*(place(n) for n in range(ORDERS)))
+    elapsed = time.perf_counter() - started
+    assert codes.count(201) == stock, codes
+    return {
+        "orders_per_second": round(ORDERS / elapsed),
+        "placed": codes.count(201),
+        "rejected": codes.count(400),
+    }
+
+
+async def main():
+    # Pooled like production, so that connecting is not what is measured.
+    engine = create_async_engine(DATABASE_URL, pool_size=CONCURRENCY)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_pooled_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = get_pooled_db
+    results = {}
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test/"
+        ) as ac:
+            for stock_shards in SHARDS:
+                results[f"{stock_shards} shards"] = await place_orders(ac, stock_shards)
+    finally:
+        del app.dependency_overrides[get_db]
+        await engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+"""
+Loading orders with embedded products, with the products joined into the
+items query against loaded with one more query by id, for a growing number
+of orders. ORDERS_EXPAND_JOINED_MAX picks between them.
+
+Usage:
+    MODE=TEST python -m benchmarks.orders_expand
+"""
+import asyncio
+import json
+from app.config import settings
+from app.database import async_session_maker
+from app.orders.dao import OrderDAO
+from benchmarks.common import measure, reset_database, seed_orders, seed_products
+
+ORDER_COUNTS = (1, 10, 100, 1000, 10000)
+ITEMS_PER_ORDER = 5
+
+
+async def main():
+    results = {}
+    for orders in ORDER_COUNTS:
+        await reset_database()
+        await seed_products(ITEMS_PER_ORDER)
+        await seed_orders(orders, items_per_order=ITEMS_PER_ORDER)
+        repeat = max(5, 5000 // orders)
+        results[f"{orders} orders"] = {}
+        for strategy, joined_max in (("joined", orders), ("selectin", 0)):
+            settings.ORDERS_EXPAND_JOINED_MAX = joined_max
+
+            async def load():
+                async with async_session_maker() as db:
+                    await OrderDAO.get_all_orders(db, expand=True)
+
+            results[f"{orders} orders"][strategy] = (await measure(load, repeat))["p50"]
+    print(json.dumps({"p50 ms": results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
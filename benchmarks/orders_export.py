@@ -0,0 +1,46 @@
+"""
+Peak Python memory of the `GET /orders/export` stream for a growing order history.
+
+Usage:
+    MODE=TEST python -m benchmarks.orders_export
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+from app.orders.router import export_orders
+from benchmarks.common import reset_database, seed_orders, seed_products
+
+ORDER_COUNTS = (10_000, 50_000, 100_000)
+
+
+async def main():
+    results = {}
+    for count in ORDER_COUNTS:
+        await reset_database()
+        await seed_products(3)
+        await seed_orders(count)
+
+        # Drain the response body directly: httpx's ASGITransport buffers the
+        # whole body and would dominate the measurement.
+        lines = 0
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = await export_orders()
+        async for chunk in response.body_iterator:
+            lines += chunk.count("\n")
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert lines == count
+        results[f"{count} orders"] = {
+            "seconds": round(elapsed, 2),
+            "peak_mib": round(peak / 2**20, 2),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Checkout waits and timeouts of the instrumented connection pool when more
+requests run at once than the pool has connections.
+
+Usage:
+    MODE=TEST python -m benchmarks.pool
+"""
+import asyncio
+import json
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.database import DATABASE_URL, InstrumentedPool, engine_params
+
+CONCURRENCY = 50
+REQUESTS = 1000
+QUERY_SECONDS = 0.005
+
+
+async def run(pool_size: int, max_overflow: int, pool_timeout: float) -> dict:
+    engine = create_async_engine(
+        DATABASE_URL,
+        poolclass=InstrumentedPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        connect_args=engine_params()["connect_args"],
+    )
+    queue = asyncio.Queue()
+    for _ in range(REQUESTS):
+        queue.put_nowait(None)
+
+    async def client():
+        while not queue.empty():
+            queue.get_nowait()
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT pg_sleep(:s)"), {"s": QUERY_SECONDS})
+            except TimeoutError:
+                pass
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - started
+    stats = engine.pool.stats()
+    await engine.dispose()
+    return {
+        "requests/s": round(REQUESTS / elapsed),
+        "wait_ms_mean": round(stats["wait_ms_total"] / stats["checkouts"], 3),
+        "wait_ms_max": stats["wait_ms_max"],
+        "timeouts": stats["timeouts"],
+    }
+
+
+async def main():
+    results = {}
+    for pool_size, max_overflow, pool_timeout in (
+        (5, 0, 0.05),
+        (5, 0, 30),
+        (20, 5, 30),
+        (50, 0, 30),
+    ):
+        label = (
+            f"pool_size={pool_size} max_overflow={max_overflow} timeout={pool_timeout}s"
+        )
+        results[label] = await run(pool_size, max_overflow, pool_timeout)
+    print(json.dumps({"concurrency": CONCURRENCY, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+"""
+Latency of hot product reads with the in-process product cache off and on.
+
+Usage:
+    MODE=TEST python -m benchmarks.products_cache
+"""
+import asyncio
+import json
+import random
+from httpx import ASGITransport, AsyncClient
+from app.products.dao import ProductDAO, product_cache, product_page_cache
+from benchmarks.common import measure, reset_database, seed_products
+from main import app
+
+PRODUCTS = 10000
+HOT_PRODUCTS = 100
+
+
+async def main():
+    await reset_database()
+    await seed_products(PRODUCTS)
+    sizes = product_cache.maxsize, product_page_cache.maxsize
+
+    results = {}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/"
+    ) as ac:
+
+        async def fetch_product():
+            product_id = random.randint(1, HOT_PRODUCTS)
+            assert (await ac.get(f"/products/{product_id}")).status_code == 200
+
+        async def fetch_page():
+            assert (await ac.get("/products/", params={"limit": 50})).status_code == 200
+
+        for label, enabled in (("uncached", False), ("cached", True)):
+            ProductDAO.invalidate()
+            product_cache.maxsize, product_page_cache.maxsize = (
+                sizes if enabled else (0, 0)
+            )
+            await fetch_page()
+            results[label] = {
+                "GET /products/{id}": await measure(fetch_product, repeat=2000),
+                "GET /products/": await measure(fetch_page, repeat=500),
+                "cache": product_cache.stats(),
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+Rows per second of `POST /products/import` compared with one
+`POST /products/` per row.
+
+Usage:
+    MODE=TEST python -m benchmarks.products_import
+"""
+import asyncio
+import json
+import time
+from httpx import ASGITransport, AsyncClient
+from benchmarks.common import reset_database
+from main import app
+
+PER_ROW = 1000
+IMPORTED = 200_000
+CHUNK_ROWS = 5000
+
+
+async def csv_upload():
+    yield b"name,description,price,available\n"
+    for start in range(0, IMPORTED, CHUNK_ROWS):
+        yield "".join(
+            f"product {n},imported,{n % 1000}.99,100\n"
+            for n in range(start, start + CHUNK_ROWS)
+        ).encode()
+
+
+async def main():
+    await reset_database()
+
+    results = {}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/", timeout=None
+    ) as ac:
+        started = time.perf_counter()
+        for n in range(PER_ROW):
+            response = await ac.post(
+                "/products/",
+                json={
+                    "name": f"product {n}",
+                    "description": "created",
+                    "price": "1.99",
+                    "available": 100,
+                },
+            )
+            assert response.status_code == 201
+        elapsed = time.perf_counter() - started
+        results["POST /products/"] = {"rows_per_second": round(PER_ROW / elapsed)}
+
+        response = await ac.post(
+            "/products/import", content=csv_upload(), headers={"content-type": "text/csv"}
+        )
+        report = response.json()
+        assert report["rows"] == IMPORTED
+        results["POST /products/import"] = {
+            **report,
+            "rows_per_second": round(report["rows"] / report["seconds"]),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
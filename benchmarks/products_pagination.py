@@ -0,0 +1,42 @@
+"""
+Latency of `GET /products/` pages at increasing depth.
+
+Usage:
+    MODE=TEST python -m benchmarks.products_pagination
+"""
+import asyncio
+import json
+from httpx import ASGITransport, AsyncClient
+from app.pagination import encode_cursor
+from benchmarks.common import measure, reset_database, seed_products
+from main import app
+
+PAGE_SIZE = 50
+PAGES = (1, 10, 100, 1000, 10000)
+
+
+async def main():
+    await reset_database()
+    await seed_products(PAGE_SIZE * max(PAGES))
+
+    results = {}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/"
+    ) as ac:
+        for page in PAGES:
+            params = {"limit": PAGE_SIZE}
+            if page > 1:
+                params["after"] = encode_cursor((page - 1) * PAGE_SIZE)
+
+            async def fetch():
+                response = await ac.get("/products/", params=params)
+                assert len(response.json()["items"]) == PAGE_SIZE
+
+            await fetch()
+            results[f"page {page}"] = await measure(fetch, repeat=200)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
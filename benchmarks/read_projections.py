@@ -0,0 +1,102 @@
+"""
+Memory of reading 100k orders (with one item each) and 100k products as
+mapped ORM objects versus the column projections the DAOs now return.
+
+Every variant runs in its own process, once for the peak RSS and once
+under tracemalloc for the peak traced memory and the allocated blocks.
+
+Usage:
+    MODE=TEST python -m benchmarks.read_projections
+"""
+import asyncio
+import gc
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app.database import async_session_maker
+from app.orders.dao import OrderDAO
+from app.orders.models import Order
+from app.products.dao import product_columns
+from app.products.models import Product
+from benchmarks.common import reset_database, seed_orders, seed_products
+
+ROWS = 100000
+
+
+async def orm_orders(db):
+    result = await db.execute(select(Order).options(selectinload(Order.items)))
+    return result.unique().scalars().all()
+
+
+async def orm_products(db):
+    return (await db.execute(select(Product))).scalars().all()
+
+
+async def projected_products(db):
+    return (await db.execute(select(*product_columns))).all()
+
+
+VARIANTS = {
+    "orders: ORM": orm_orders,
+    "orders: OrderRow": OrderDAO.get_all_orders,
+    "products: ORM": orm_products,
+    "products: projection": projected_products,
+}
+
+
+async def child(variant: str, trace: bool) -> dict:
+    async with async_session_maker() as db:
+        await db.execute(select(Product.id).limit(1))  # Connect and warm up the driver.
+        gc.collect()
+        if trace:
+            tracemalloc.start()
+            blocks = sys.getallocatedblocks()
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rows = await VARIANTS[variant](db)
+        assert len(rows) == ROWS
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            return {
+                "traced peak MiB": round(peak / 2**20, 1),
+                "live blocks": sys.getallocatedblocks() - blocks,
+            }
+        # ru_maxrss is in KiB on Linux.
+        return {"peak RSS growth MiB": round(
+            (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024, 1
+        )}
+
+
+async def main():
+    await reset_database()
+    await seed_products(ROWS)
+    await seed_orders(ROWS, items_per_order=1)
+
+    results = {}
+    for variant in VARIANTS:
+        results[variant] = {}
+        for trace in (False, True):
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.read_projections",
+                    variant,
+                    str(trace),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results[variant].update(json.loads(output))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print(json.dumps(asyncio.run(child(sys.argv[1], sys.argv[2] == "True"))))
+    else:
+        asyncio.run(main())
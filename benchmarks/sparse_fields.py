@@ -0,0 +1,50 @@
+"""
+Latency and payload size of product pages and order lists with every field
+against `?fields=` for the few fields a mobile client needs.
+
+Usage:
+    MODE=TEST python -m benchmarks.sparse_fields
+"""
+import asyncio
+import json
+from httpx import ASGITransport, AsyncClient
+from app.products.dao import product_page_cache
+from benchmarks.common import measure, reset_database, seed_orders, seed_products
+from main import app
+
+PAGE_SIZE = 500
+
+
+async def main():
+    await reset_database()
+    await seed_products(10000)
+    await seed_orders(2000)
+    # Measure the database and serialization work, not the page cache.
+    product_page_cache.maxsize = 0
+
+    results = {}
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/"
+    ) as ac:
+        for url, params, fields in (
+            ("/products/", {"limit": PAGE_SIZE}, "name,available"),
+            ("/orders/", {}, "status"),
+        ):
+            for label, query in (
+                ("all fields", params),
+                (f"fields={fields}", {**params, "fields": fields}),
+            ):
+                size = len((await ac.get(url, params=query)).content)
+
+                async def get():
+                    assert (await ac.get(url, params=query)).status_code == 200
+
+                results[f"GET {url} {label}"] = {
+                    "bytes": size,
+                    "latency_ms": await measure(get, repeat=100),
+                }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
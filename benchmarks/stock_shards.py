@@ -0,0 +1,81 @@
+"""
+Checkout throughput on a single hot product with 1 and 16 stock shards.
+
+Several processes, each with its own connection pool, place single-item
+orders for the same product as fast as they can.
+
+Usage:
+    MODE=TEST python -m benchmarks.stock_shards
+"""
+import asyncio
+import json
+import multiprocessing
+import time
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.database import DATABASE_URL, async_session_maker
+from app.orders.dao import OrderDAO
+from app.orders.schemas import OrderCreateSchema
+from app.products.dao import ProductDAO
+from app.products.schemas import ProductCreate
+from benchmarks.common import reset_database
+
+PROCESSES = 8
+CONCURRENCY = 8
+SECONDS = 10
+SHARDS = (1, 16)
+
+
+async def place_orders(product_id: int) -> int:
+    engine = create_async_engine(DATABASE_URL, pool_size=CONCURRENCY)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    order = OrderCreateSchema(
+        status="RECEIVED", items=[{"product_id": product_id, "quantity": 1}]
+    )
+    deadline = time.perf_counter() + SECONDS
+
+    async def client():
+        placed = 0
+        while time.perf_counter() < deadline:
+            async with session_maker() as db:
+                await OrderDAO.create_order(db, order)
+            placed += 1
+        return placed
+
+    placed = sum(await asyncio.gather(*(client() for _ in range(CONCURRENCY))))
+    await engine.dispose()
+    return placed
+
+
+def worker(product_id: int) -> int:
+    return asyncio.run(place_orders(product_id))
+
+
+async def create_hot_product(stock_shards: int) -> int:
+    await reset_database()
+    async with async_session_maker() as db:
+        product = await ProductDAO.create_product(
+            db,
+            ProductCreate(
+                name="hot",
+                description="flash sale",
+                price="1.00",
+                available=10_000_000,
+                stock_shards=stock_shards,
+            ),
+        )
+    return product.id
+
+
+def main():
+    results = {}
+    for stock_shards in SHARDS:
+        product_id = asyncio.run(create_hot_product(stock_shards))
+        with multiprocessing.get_context("spawn").Pool(PROCESSES) as pool:
+            placed = sum(pool.map(worker, [product_id] * PROCESSES))
+        results[f"{stock_shards} shards"] = {"orders_per_second": round(placed / SECONDS)}
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
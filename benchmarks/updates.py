@@ -0,0 +1,94 @@
+"""
+Update throughput of products and order statuses under concurrent clients:
+the former load, modify, commit and refresh round trips against the single
+UPDATE ... RETURNING statement.
+
+Every client updates random rows out of many, so the numbers show round
+trips rather than lock waits.
+
+Usage:
+    MODE=TEST python -m benchmarks.updates
+"""
+import asyncio
+import json
+import random
+import time
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app import bus
+from app.database import DATABASE_URL
+from app.orders.dao import OrderDAO
+from app.orders.models import Order
+from app.products.dao import ProductDAO
+from app.products.models import Product
+from app.products.schemas import ProductPatch
+from benchmarks.common import reset_database, seed_orders, seed_products
+
+ROWS = 10000
+CONCURRENCY = (1, 8, 32)
+SECONDS = 5
+
+
+async def product_loaded(db, id: int):
+    product = await db.get(Product, id, with_for_update={"key_share": True})
+    product.price = random.randint(1, 100)
+    await bus.publish(db, products=[id])
+    await db.commit()
+    ProductDAO.invalidate([id])
+    await db.refresh(product)
+
+
+async def product_returning(db, id: int):
+    await ProductDAO.update_product(db, id, ProductPatch(price=random.randint(1, 100)))
+
+
+async def order_loaded(db, id: int):
+    order = await db.get(Order, id)
+    order.status = random.choice(("RECEIVED", "SENT"))
+    order.version = Order.version + 1
+    await bus.publish(db, orders=[id])
+    await db.commit()
+    await db.refresh(order)
+
+
+async def order_returning(db, id: int):
+    await OrderDAO.update_order_status(db, id, random.choice(("RECEIVED", "SENT")))
+
+
+async def run(update, concurrency: int) -> int:
+    engine = create_async_engine(DATABASE_URL, pool_size=concurrency)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    deadline = time.perf_counter() + SECONDS
+
+    async def client():
+        updated = 0
+        while time.perf_counter() < deadline:
+            async with session_maker() as db:
+                await update(db, random.randint(1, ROWS))
+            updated += 1
+        return updated
+
+    updated = sum(await asyncio.gather(*(client() for _ in range(concurrency))))
+    await engine.dispose()
+    return round(updated / SECONDS)
+
+
+async def main():
+    await reset_database()
+    await seed_products(ROWS)
+    await seed_orders(ROWS)
+    results = {}
+    for name, update in (
+        ("product, load + refresh", product_loaded),
+        ("product, UPDATE ... RETURNING", product_returning),
+        ("order status, load + refresh", order_loaded),
+        ("order status, UPDATE ... RETURNING", order_returning),
+    ):
+        results[name] = {
+            f"{concurrency} clients, updates/s": await run(update, concurrency)
+            for concurrency in CONCURRENCY
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
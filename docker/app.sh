@@ -2,4 +2,8 @@
 
 alembic upgrade head
 
-gunicorn main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind=0.0.0.0:8000 
+# Every worker stores its metrics here; start counting from zero.
+export METRICS_DIR=${METRICS_DIR:-/tmp/mobile_task_metrics}
+rm -rf "$METRICS_DIR"
+
+gunicorn main:app --workers ${WEB_CONCURRENCY:-4} --worker-class uvicorn.workers.UvicornWorker --bind=0.0.0.0:8000 
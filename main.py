@@ -1,12 +1,50 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import uvicorn
+from app import metrics
+from app.profiling import ProfilingMiddleware
+from app.bus import InvalidationListener
+from app.config import settings
+from app.database import replicas
+from app.admin.router import metrics_router as MetricsRouter, router as AdminRouter
 from app.orders.router import router as OrderRouter
 from app.products.router import router as ProductRouter
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Keep this worker's caches in sync with the writes of the other workers,
+    watch the health of the read replicas and share this worker's metrics.
+    """
+    listener = None
+    if settings.CACHE_BUS_ENABLED:
+        listener = InvalidationListener()
+        await listener.start()
+        app.state.invalidation_listener = listener
+    await replicas.start()
+    snapshots = None
+    if settings.METRICS_ENABLED and settings.METRICS_DIR:
+        snapshots = asyncio.create_task(metrics.write_snapshots())
+    yield
+    if snapshots:
+        snapshots.cancel()
+        metrics.write_snapshot()
+    await replicas.stop()
+    if listener:
+        await listener.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
 app.include_router(ProductRouter)
 app.include_router(OrderRouter)
+app.include_router(AdminRouter)
+app.include_router(MetricsRouter)
 
 
 if __name__ == "__main__":
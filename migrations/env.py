@@ -8,6 +8,7 @@ sys.path.insert(0, dirname(dirname(dirname(abspath(__file__)))))
 from alembic import context
 from app.config import settings
 from app.database import Base
+from app.models import *
 from app.orders.models import *
 from app.products.models import *
 
@@ -0,0 +1,45 @@
+"""Order items on delete cascade
+
+Revision ID: 0a5d3e9c7b14
+Revises: f2b6c8d4e1a7
+Create Date: 2026-10-18 19:04:11.530268
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a5d3e9c7b14'
+down_revision: Union[str, None] = 'f2b6c8d4e1a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FOREIGN_KEYS = (
+    ('order_items_order_id_fkey', 'order_id', 'orders'),
+    ('order_items_product_id_fkey', 'product_id', 'products'),
+)
+
+
+def _replace_foreign_keys(on_delete: str) -> None:
+    # Added as NOT VALID and committed, so that order_items is only locked
+    # briefly; the rows are checked afterwards outside of that transaction,
+    # which blocks no writes.
+    for name, column, table in FOREIGN_KEYS:
+        op.drop_constraint(name, 'order_items', type_='foreignkey')
+        op.execute(
+            f'ALTER TABLE order_items ADD CONSTRAINT {name} FOREIGN KEY ({column}) '
+            f'REFERENCES {table} (id) {on_delete} NOT VALID'
+        )
+    with op.get_context().autocommit_block():
+        for name, _, _ in FOREIGN_KEYS:
+            op.execute(f'ALTER TABLE order_items VALIDATE CONSTRAINT {name}')
+
+
+def upgrade() -> None:
+    _replace_foreign_keys('ON DELETE CASCADE')
+
+
+def downgrade() -> None:
+    _replace_foreign_keys('')
@@ -0,0 +1,36 @@
+"""Product catalog indexes
+
+Revision ID: 9b1e4c7d2a10
+Revises: 298269a25a5a
+Create Date: 2026-10-18 10:12:41.503214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b1e4c7d2a10'
+down_revision: Union[str, None] = '298269a25a5a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_products_in_stock', 'products', ['id'],
+        postgresql_where=sa.text('available > 0'),
+    )
+    op.create_index('ix_products_price', 'products', ['price'])
+    op.create_index(
+        'ix_products_name_pattern', 'products', ['name'],
+        postgresql_ops={'name': 'varchar_pattern_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_name_pattern', table_name='products')
+    op.drop_index('ix_products_price', table_name='products')
+    op.drop_index('ix_products_in_stock', table_name='products')
@@ -0,0 +1,53 @@
+"""Product stock shards
+
+Revision ID: c4d83f5e9a21
+Revises: 9b1e4c7d2a10
+Create Date: 2026-10-18 13:04:17.228391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d83f5e9a21'
+down_revision: Union[str, None] = '9b1e4c7d2a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'products',
+        sa.Column('stock_shards', sa.Integer(), server_default='1', nullable=False),
+    )
+    op.create_table('product_stock_shards',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('available', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id', 'shard')
+    )
+    op.drop_index('ix_products_in_stock', table_name='products')
+    op.create_index(
+        'ix_products_in_stock', 'products', ['id'],
+        postgresql_where=sa.text('available > 0 OR stock_shards > 1'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_in_stock', table_name='products')
+    op.execute(
+        'UPDATE products SET available = shards.total '
+        'FROM (SELECT product_id, sum(available) AS total '
+        'FROM product_stock_shards GROUP BY product_id) AS shards '
+        'WHERE products.id = shards.product_id'
+    )
+    op.drop_table('product_stock_shards')
+    op.drop_column('products', 'stock_shards')
+    op.create_index(
+        'ix_products_in_stock', 'products', ['id'],
+        postgresql_where=sa.text('available > 0'),
+    )
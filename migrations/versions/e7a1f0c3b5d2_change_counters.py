@@ -0,0 +1,36 @@
+"""Change counters and order versions
+
+Revision ID: e7a1f0c3b5d2
+Revises: c4d83f5e9a21
+Create Date: 2026-10-18 15:41:09.512306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a1f0c3b5d2'
+down_revision: Union[str, None] = 'c4d83f5e9a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('change_counters',
+    sa.Column('table_name', sa.String(length=100), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name', 'shard')
+    )
+    op.add_column(
+        'orders',
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('orders', 'version')
+    op.drop_table('change_counters')
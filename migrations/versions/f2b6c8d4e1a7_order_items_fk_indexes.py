@@ -0,0 +1,43 @@
+"""Order items foreign key indexes
+
+Revision ID: f2b6c8d4e1a7
+Revises: e7a1f0c3b5d2
+Create Date: 2026-10-18 17:26:52.180417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6c8d4e1a7'
+down_revision: Union[str, None] = 'e7a1f0c3b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently, so that order_items stays writable meanwhile.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_order_items_order_id'), 'order_items', ['order_id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            op.f('ix_order_items_product_id'), 'order_items', ['product_id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f('ix_order_items_product_id'), table_name='order_items',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            op.f('ix_order_items_order_id'), table_name='order_items',
+            postgresql_concurrently=True,
+        )